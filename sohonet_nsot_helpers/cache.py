@@ -0,0 +1,333 @@
+''' Tiered cache shared between the worker processes on a node, and optionally between nodes
+
+Values are looked up in an in-process LRU first, then a SQLite database on local disk shared by every
+process on the node, then optionally a Redis tier shared by every node. Hits in a lower tier are copied
+into the tiers above it. Keys are namespaced and values can have a TTL:
+
+    smn = CACHE.namespace('smn')
+    ranges = smn.get_or_compute('ip-ranges', download_ranges, ttl=3600)
+
+get_or_compute is stampede safe, one thread per process and one process across the shared tiers
+computes a missing value while the others wait for it.
+
+CACHE is configured from the environment:
+
+    SOHONET_CACHE_PATH              SQLite database, default ~/.cache/sohonet_nsot_helpers/cache.sqlite,
+                                    'none' for no on-disk tier
+    SOHONET_CACHE_REDIS_URL         redis:// URL of the Redis tier, or local:// for an in-process stand-in
+    SOHONET_CACHE_MEMORY_ENTRIES    size of the in-process LRU, default 1024
+
+Values stored in CACHE must be JSON serializable. LOCAL_CACHE only has the in-process LRU and can hold
+any object, i.e. compiled templates and regexes.
+'''
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+MISSING = object()
+
+
+class LRUCache:
+    ''' In-process tier, holds values as they are without serializing them '''
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        ''' (value, expires) for key, or MISSING '''
+        with self._lock:
+            entry = self._entries.get(key, MISSING)
+            if entry is MISSING:
+                return MISSING
+            if entry[1] is not None and entry[1] <= time.time():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires=None):
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, expires=None):
+        ''' set key only if it isn't already set, returns whether it was '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                return False
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteStore:
+    ''' On-disk tier shared by the processes on a node, in WAL mode with memory-mapped reads '''
+
+    def __init__(self, path=None, mmap_size=256 * 1024 * 1024):
+        self.path = path or os.path.join(os.path.expanduser('~'), '.cache', 'sohonet_nsot_helpers', 'cache.sqlite')
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+
+    def get(self, key):
+        row = self._connection().execute("SELECT value, expires FROM cache WHERE key = ?", (key, )).fetchone()
+        if row is None or row[1] is not None and row[1] <= time.time():
+            return MISSING
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires=None):
+        with self._connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                               (key, json.dumps(value), expires))
+
+    def add(self, key, value, expires=None):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, time.time()))
+            cursor = connection.execute("INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                                        (key, json.dumps(value), expires))
+            return cursor.rowcount == 1
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key, ))
+
+    def prune(self):
+        ''' remove expired entries '''
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(), ))
+
+    def _connection(self):
+        # Connections aren't shared with processes forked after they were opened, i.e. Celery workers
+        connection, pid = getattr(self._local, 'connection', (None, None))
+        if connection is None or pid != os.getpid():
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            self._local.connection = (connection, os.getpid())
+        return connection
+
+
+class RedisStore:
+    ''' Tier on a Redis-compatible server, client is a redis.Redis or anything with the same get, set and
+    delete, i.e. LocalRedis '''
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url):
+        ''' RedisStore for a redis:// URL, or a LocalRedis stand-in for local:// '''
+        if url.startswith('local://'):
+            return cls(LocalRedis())
+        if redis is None:
+            raise ImportError(f"The redis package is needed for the Redis cache tier at {url}")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        data = self.client.get(key)
+        if data is None:
+            return MISSING
+        value, expires = json.loads(data)
+        return value, expires
+
+    def set(self, key, value, expires=None):
+        self.client.set(key, json.dumps([value, expires]), px=_milliseconds_until(expires))
+
+    def add(self, key, value, expires=None):
+        return bool(self.client.set(key, json.dumps([value, expires]), nx=True, px=_milliseconds_until(expires)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+class LocalRedis:
+    ''' In-process stand-in for the subset of a redis.Redis client RedisStore uses '''
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data, expires = self._data.get(key, (None, None))
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            return data
+
+    def set(self, key, value, nx=False, px=None):
+        with self._lock:
+            _, expires = self._data.get(key, (None, None))
+            if nx and key in self._data and (expires is None or expires > time.monotonic()):
+                return None
+            self._data[key] = (value.encode() if isinstance(value, str) else value,
+                               None if px is None else time.monotonic() + px / 1000)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+class InFlight:
+    ''' Futures of the keys a Cache and its namespaces are computing, with the threads computing them '''
+
+    def __init__(self):
+        self.computing = {}
+        self.lock = threading.Lock()
+
+
+class Cache:
+    ''' Namespaced view over a list of tiers, fastest first '''
+
+    def __init__(self, tiers, namespace='', _inflight=None):
+        self.tiers = tiers
+        self.prefix = namespace
+        self._inflight = _inflight or InFlight()
+
+    def namespace(self, name):
+        ''' Cache over the same tiers with keys prefixed by name '''
+        return Cache(self.tiers, f"{self.prefix}{name}:", self._inflight)
+
+    def get(self, key, default=None):
+        ''' value of key from the first tier that has it, copied into the tiers before it '''
+        key = self._key(key)
+        for position, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is MISSING:
+                continue
+            for upper in self.tiers[:position]:
+                upper.set(key, *entry)
+            return entry[0]
+        return default
+
+    def set(self, key, value, ttl=None):
+        ''' store value in every tier, for ttl seconds or until evicted if ttl is None '''
+        key = self._key(key)
+        expires = None if ttl is None else time.time() + ttl
+        for tier in reversed(self.tiers):
+            tier.set(key, value, expires)
+
+    def delete(self, key):
+        key = self._key(key)
+        for tier in reversed(self.tiers):
+            tier.delete(key)
+
+    def get_or_compute(self, key, compute, ttl=None, lock_timeout=60.0):
+        ''' value of key, calling compute() and storing its result if it isn't cached
+
+        Only one thread per process computes a key at a time, and with shared tiers only one process
+        does, the others wait for its result. Nothing is locked while compute() runs, so it can use the
+        cache itself, but calling get_or_compute for the same key from within compute() raises
+        RuntimeError. If compute() raises, the threads waiting on it get the same exception. If the
+        computing process doesn't store a result within lock_timeout seconds the waiting processes
+        compute it themselves.
+        '''
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        inflight = self._inflight
+        with inflight.lock:
+            computing = self._key(key) in inflight.computing
+            if not computing:
+                inflight.computing[self._key(key)] = (Future(), threading.get_ident())
+            future, thread = inflight.computing[self._key(key)]
+        if computing:
+            if thread == threading.get_ident():
+                raise RuntimeError(f"{self._key(key)} is already being computed by this thread")
+            return future.result()
+
+        try:
+            value = self.get(key, MISSING)
+            if value is MISSING:
+                value = self._compute_shared(key, compute, ttl, lock_timeout)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with inflight.lock:
+                inflight.computing.pop(self._key(key), None)
+
+    def _compute_shared(self, key, compute, ttl, lock_timeout):
+        ''' compute and store key, holding its lock in the shared tier if there is one '''
+        shared = self.tiers[-1] if len(self.tiers) > 1 else None
+        lock_key = f"lock:{self._key(key)}"
+        locked = False
+        if shared is not None:
+            deadline = time.monotonic() + lock_timeout
+            wait = 0.01
+            while not locked:
+                locked = shared.add(lock_key, os.getpid(), time.time() + lock_timeout)
+                if locked:
+                    break
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(wait)
+                wait = min(wait * 2, 0.5)
+                value = self.get(key, MISSING)
+                if value is not MISSING:
+                    return value
+
+        try:
+            value = compute()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                shared.delete(lock_key)
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+
+def _milliseconds_until(expires):
+    if expires is None:
+        return None
+    return max(1, int((expires - time.time()) * 1000))
+
+
+def cache_from_environment():
+    ''' Cache with the tiers configured by SOHONET_CACHE_PATH, SOHONET_CACHE_REDIS_URL and
+    SOHONET_CACHE_MEMORY_ENTRIES '''
+    tiers = [LRUCache(int(os.environ.get('SOHONET_CACHE_MEMORY_ENTRIES', 1024)))]
+    path = os.environ.get('SOHONET_CACHE_PATH')
+    if path != 'none':
+        tiers.append(SQLiteStore(path))
+    url = os.environ.get('SOHONET_CACHE_REDIS_URL')
+    if url:
+        tiers.append(RedisStore.from_url(url))
+    return Cache(tiers)
+
+
+CACHE = cache_from_environment()
+LOCAL_CACHE = Cache([LRUCache()])
@@ -0,0 +1,86 @@
+''' Reconcile collected device state with what Nautobot already holds
+
+Both sides are dicts of normalized records keyed by natural key (see sohonet_nsot_helpers.normalize),
+index_device_records prefixes those keys with the device name so a whole fleet can be diffed in one go:
+
+    collected = {}
+    partial = set()
+    for device, driver in drivers.items():
+        records = eos_get_interface_records(driver)
+        if is_partial(records):
+            partial.add(device)
+        collected.update(index_device_records(device, records))
+    existing = index_device_records(...)  # built the same way from Nautobot
+
+    diff = diff_records(collected, existing, partial)
+    for action, batch in diff.batches(batch_size=500):
+        ...  # bulk_create / bulk_update / delete
+
+A record getter whose result was cut short by a deadline returns a PartialResult, records of those
+devices that weren't collected may still exist, so are never deleted, and fields the getter couldn't
+collect are None, so are kept as they are. The same goes for records collected with a fields projection,
+i.e. eos_get_interface_records(driver, fields={'description'}), which are a PartialResult missing the
+fields that were left out.
+'''
+from collections import namedtuple
+
+from sohonet_nsot_helpers.normalize import record_hash
+
+
+class Diff(namedtuple('Diff', ['create', 'update', 'delete'])):
+    ''' Lists of (key, record) tuples to create, update and delete
+
+    update holds the collected record, delete holds the existing record.
+    '''
+    __slots__ = ()
+
+    def batches(self, batch_size=1000):
+        ''' yield ('create' | 'update' | 'delete', [(key, record), ...]) sized for bulk operations '''
+        for action in self._fields:
+            items = getattr(self, action)
+            for start in range(0, len(items), batch_size):
+                yield action, items[start:start + batch_size]
+
+    def __bool__(self):
+        return bool(self.create or self.update or self.delete)
+
+
+def index_device_records(device, records):
+    ''' prefix the natural keys of one device's records with the device name '''
+    return {(device, ) + (key if isinstance(key, tuple) else (key, )): record for key, record in records.items()}
+
+
+def diff_records(collected, existing, partial=()):
+    ''' return the minimal Diff that turns existing into collected
+
+    Values of existing may be records or content hashes from record_hash, i.e. a hash stored alongside
+    the Nautobot object from the previous sync. Records are compared by content: tuple equality when
+    both sides are records, which matches comparing their hashes and is cheaper.
+
+    partial holds the devices whose collected records are incomplete, existing records of those devices
+    are kept even if they weren't collected. None fields of their records weren't collected either, the
+    existing values are kept for those, records compared against a hash are left until a full collection,
+    so fields projections need existing records rather than hashes.
+    '''
+    partial = set(partial)
+    create = []
+    update = []
+    for key, record in collected.items():
+        if key not in existing:
+            create.append((key, record))
+            continue
+        current = existing[key]
+        if key[0] in partial and None in record:
+            if isinstance(current, str):
+                continue
+            record = record._replace(**{field: getattr(current, field)
+                                        for field, value in zip(record._fields, record) if value is None})
+        if isinstance(current, str):
+            changed = current != record_hash(record)
+        else:
+            changed = current != record
+        if changed:
+            update.append((key, record))
+
+    delete = [(key, record) for key, record in existing.items() if key not in collected and key[0] not in partial]
+    return Diff(create, update, delete)
@@ -0,0 +1,216 @@
+''' Targeted re-collection from syslog messages and SNMP traps
+
+Rather than waiting for the next full sweep, EventListener receives syslog and traps on local UDP
+sockets, works out which device and getters an event affects, and queues a re-collection. Bursts of
+events for a device, i.e. a flapping link or a config session with many commits, are debounced and
+coalesced into one re-collection of the union of their getters:
+
+    queue = RecollectionQueue(debounce=10, max_delay=60)
+    listener = EventListener({'10.0.0.1': DeviceInfo('switch1', 'procurve')}, queue)
+    listener.start()
+
+    while True:
+        device, getters = queue.get()
+        ...  # run getters for device and sync the results
+
+Packets can be handed to handle_syslog and handle_trap directly, or sent to the listener's ports.
+'''
+import re
+import socket
+import threading
+import time
+from collections import namedtuple
+
+from sohonet_nsot_helpers.snmp import MIB_OBJECTS, TrapV1, decode_message
+
+DeviceInfo = namedtuple('DeviceInfo', ['name', 'vendor'])
+
+INTERFACES = 'interfaces'
+CONFIG = 'config'
+
+# Getters re-run for each kind of event
+EVENT_GETTERS = {
+    INTERFACES: ['interfaces'],
+    CONFIG: ['interfaces', 'interfaces_ip', 'vlans', 'interfaces_vlans', 'static_routes', 'network_instances'],
+}
+
+VENDOR_GETTERS = {
+    'eos': {
+        'interfaces': 'eos_get_interfaces',
+        'interfaces_ip': 'eos_get_interfaces_ip',
+        'vlans': 'eos_get_vlans',
+        'interfaces_vlans': 'eos_get_interfaces_vlans',
+        'static_routes': 'eos_get_static_routes',
+        'network_instances': 'eos_get_network_instances',
+    },
+    'procurve': {
+        'interfaces': 'procurve_get_interfaces',
+        'interfaces_ip': 'procurve_get_interfaces_ip',
+        'vlans': 'procurve_get_vlans',
+        'interfaces_vlans': 'procurve_get_interfaces_vlans',
+    },
+}
+
+SYSLOG_RULES = [
+    (re.compile(r'%SYS-5-CONFIG_(?:I|E|STARTUP)\b'), CONFIG),
+    (re.compile(r'%(?:LINEPROTO-5-UPDOWN|LINK-3-UPDOWN|ETH-\d-LINK\w*|LAG-\d-\w+)\b'), INTERFACES),
+    # ProCurve, i.e. "ports: port 5 is now off-line" and "mgr: Running Config Change"
+    (re.compile(r'\bports: (?:port|trunk) \S+ is now (?:on|off)-line'), INTERFACES),
+    (re.compile(r'\b(?:mgr|config): .*config(?:uration)? (?:change|saved)', re.IGNORECASE), CONFIG),
+]
+
+TRAP_RULES = {
+    (1, 3, 6, 1, 6, 3, 1, 1, 5, 3): INTERFACES,  # linkDown
+    (1, 3, 6, 1, 6, 3, 1, 1, 5, 4): INTERFACES,  # linkUp
+    (1, 3, 6, 1, 4, 1, 30065, 3, 12, 0, 1): CONFIG,  # aristaConfigManEvent
+    (1, 3, 6, 1, 4, 1, 11, 2, 14, 10, 2, 0, 1): CONFIG,  # hpicfConfigChange, ProCurve running config change
+}
+V1_GENERIC_TRAPS = {2: (1, 3, 6, 1, 6, 3, 1, 1, 5, 3), 3: (1, 3, 6, 1, 6, 3, 1, 1, 5, 4)}
+
+SYSLOG_REGEX = re.compile(r'^<(\d{1,3})>(?:\d+ )?(?:\w{3} +\d+ [\d:]+|\S+T\S+) (\S+) (.*)$', re.DOTALL)
+
+
+class RecollectionQueue:
+    ''' Debounced, coalesced queue of (device, getters) re-collections
+
+    A device is due debounce seconds after its last event, or max_delay seconds after its first one if
+    events keep arriving. Getters from all events in between are merged.
+    '''
+
+    def __init__(self, debounce=10.0, max_delay=60.0, clock=time.monotonic):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.clock = clock
+        self._pending = {}
+        self._condition = threading.Condition()
+
+    def add(self, device, getters):
+        now = self.clock()
+        with self._condition:
+            first, _, queued = self._pending.get(device, (now, now, set()))
+            queued.update(getters)
+            self._pending[device] = (first, now, queued)
+            self._condition.notify()
+
+    def due(self):
+        ''' return and remove [(device, sorted getters)] that are due now '''
+        now = self.clock()
+        with self._condition:
+            ready = [device for device in self._pending if self._due_at(device) <= now]
+            return [(device, sorted(self._pending.pop(device)[2])) for device in ready]
+
+    def get(self, timeout=None):
+        ''' block until a re-collection is due and return (device, getters), or None on timeout '''
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._condition:
+            while True:
+                now = self.clock()
+                if self._pending:
+                    device = min(self._pending, key=self._due_at)
+                    if self._due_at(device) <= now:
+                        return device, sorted(self._pending.pop(device)[2])
+                    wait = self._due_at(device) - now
+                else:
+                    wait = None
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._condition.wait(wait)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _due_at(self, device):
+        first, last, _ = self._pending[device]
+        return min(last + self.debounce, first + self.max_delay)
+
+
+class EventListener:
+    ''' Receive syslog and SNMP traps and queue re-collections for the devices they come from
+
+    devices maps source addresses and hostnames to DeviceInfo. Events from unknown sources or that
+    don't match a rule are counted in ignored and otherwise dropped.
+    '''
+
+    def __init__(self, devices, queue, host='0.0.0.0', syslog_port=514, trap_port=162, community='public'):
+        self.devices = devices
+        self.queue = queue
+        self.host = host
+        self.syslog_port = syslog_port
+        self.trap_port = trap_port
+        self.community = community
+        self.ignored = 0
+        self._stop = threading.Event()
+        self._sockets = []
+
+    def start(self):
+        ''' bind the sockets and receive in background threads, ports of 0 are replaced with the bound port '''
+        for handler, attribute in [(self.handle_syslog, 'syslog_port'), (self.handle_trap, 'trap_port')]:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.host, getattr(self, attribute)))
+            sock.settimeout(0.5)
+            setattr(self, attribute, sock.getsockname()[1])
+            self._sockets.append(sock)
+            threading.Thread(target=self._receive, args=(sock, handler), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+
+    def handle_syslog(self, data, address):
+        ''' queue a re-collection for a syslog message, returns (device, getters) or None if ignored '''
+        match = SYSLOG_REGEX.match(data.decode('utf-8', errors='replace').strip())
+        if not match:
+            return self._ignore()
+        hostname, message = match.group(2), match.group(3)
+        for regex, kind in SYSLOG_RULES:
+            if regex.search(message):
+                return self._queue(self.devices.get(hostname) or self.devices.get(address[0]), kind)
+        return self._ignore()
+
+    def handle_trap(self, data, address):
+        ''' queue a re-collection for an SNMP v1 or v2c trap, returns (device, getters) or None if ignored '''
+        try:
+            trap = decode_message(data)
+        except ValueError:
+            return self._ignore()
+        if trap.community != self.community.encode():
+            return self._ignore()
+
+        if isinstance(trap, TrapV1):
+            trap_oid = V1_GENERIC_TRAPS.get(trap.generic_trap, trap.enterprise + (0, trap.specific_trap))
+            source = trap.agent_address
+        else:
+            trap_oid = next((value for oid, (_, value) in trap.varbinds if oid == MIB_OBJECTS['snmpTrapOID'] + (0, )),
+                            None)
+            source = address[0]
+        kind = TRAP_RULES.get(trap_oid)
+        if kind is None:
+            return self._ignore()
+        return self._queue(self.devices.get(source) or self.devices.get(address[0]), kind)
+
+    def _queue(self, device, kind):
+        if device is None:
+            return self._ignore()
+        vendor_getters = VENDOR_GETTERS.get(device.vendor, {})
+        getters = [vendor_getters[getter] for getter in EVENT_GETTERS[kind] if getter in vendor_getters]
+        self.queue.add(device.name, getters)
+        return device.name, getters
+
+    def _ignore(self):
+        self.ignored += 1
+        return None
+
+    def _receive(self, sock, handler):
+        while not self._stop.is_set():
+            try:
+                data, address = sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            handler(data, address)
+
@@ -0,0 +1,141 @@
+''' Interface name translation shared by the napalm helpers and Jinja filters
+
+Each translation parses a name once and memoizes the interned result, so fleet-wide joins on interface
+names are dict lookups rather than repeated regex work. InterfaceNameIndex holds the per device mappings
+between normalized names, names used in config, SNMP ifName/ifIndex and ifAlias.
+'''
+import re
+import sys
+from functools import lru_cache
+
+
+@lru_cache(maxsize=65536)
+def split_interface_name(interface_name):
+    ''' split an interface name into type and number, i.e. Ethernet3.100 -> (Ethernet, 3.100) '''
+    intftype = re.sub(r'(\D+)([\d|\.|/]+)', r'\1', interface_name)
+    intfnum = re.sub(r'(\D+)([\d|\.|/]+)', r'\2', interface_name)
+    return sys.intern(intftype), intfnum
+
+
+@lru_cache(maxsize=65536)
+def netiron_config_name(interface_name):
+    ''' Convert Netiron normalized interface names to names used in config
+
+    NORMALIZED                      CONFIG
+
+    GigabitEthernet1        ->      ethernet 1
+    GigabitEthernet1/24     ->      ethernet 1/24
+    10GigabitEthernet2/22   ->      ethernet 2/22
+    Ve1732                  ->      ve 1732
+    Loopback1               ->      loopback 1
+    Ethernetmgmt1           ->      management 1
+
+    '''
+    match = re.match(r'\d*(\D+)(\d+[\d|/]*)', interface_name)
+    if match:
+        if 'mgmt' in match.group(1):
+            return sys.intern(f"management {match.group(2)}")
+        elif 'Ethernet' in match.group(1):
+            return sys.intern(f"ethernet {match.group(2)}")
+        elif 'Ve' in match.group(1):
+            return sys.intern(f"ve {match.group(2)}")
+        elif 'Loopback' in match.group(1):
+            return sys.intern(f"loopback {match.group(2)}")
+
+    return interface_name
+
+
+@lru_cache(maxsize=65536)
+def strip_trunk_suffix(port):
+    ''' ProCurve port names carry the trunk they belong to, i.e. 4-Trk1 -> 4 '''
+    return sys.intern(port.split('-', 1)[0])
+
+
+def is_peer_interface(interface):
+    ''' EOS MLAG peer interfaces, i.e. PeerEthernet1 and PeerPort-Channel1 '''
+    return 'Peer' in interface
+
+
+def eos_vlan_member_name(interface, vid):
+    ''' Interface name for a member of an EOS VLAN, or None for MLAG peer interfaces
+
+    Arista reports 'Cpu' as a member if there is a virtual interface for the VLAN, this is VlanXX.
+    '''
+    if interface == 'Cpu':
+        return sys.intern(f"Vlan{vid}")
+    if is_peer_interface(interface):
+        return None
+    return interface
+
+
+CONFIG_NAMES = {
+    'netiron': netiron_config_name,
+}
+
+
+class InterfaceNameIndex:
+    ''' Per device lookups between normalized interface names and their config, ifName, ifIndex and
+    ifAlias forms. The normalized name is the canonical key.
+    '''
+
+    def __init__(self, vendor):
+        self.vendor = vendor
+        self._config_name = {}
+        self._if_name = {}
+        self._if_index = {}
+        self._by_name = {}
+        self._by_if_index = {}
+        self._by_alias = {}
+
+    @classmethod
+    def from_if_names(cls, vendor, if_names, if_aliases=None):
+        ''' build an index from an {ifName: ifIndex} map, and optionally an {ifIndex: ifAlias} map '''
+        index = cls(vendor)
+        for if_name, if_index in if_names.items():
+            index.add(if_name, if_name=if_name, if_index=if_index)
+        index.add_aliases(if_aliases or {})
+        return index
+
+    def add_aliases(self, if_aliases):
+        ''' add an {ifIndex: ifAlias} map, aliases are only used when a name isn't otherwise known '''
+        for if_index, alias in if_aliases.items():
+            normalized = self._by_if_index.get(if_index)
+            if normalized is not None:
+                # The first interface with an alias wins, as the helpers have always done
+                self._by_alias.setdefault(alias, normalized)
+
+    def add(self, normalized, if_name=None, if_index=None):
+        ''' add an interface by normalized name, its config name is derived for the index vendor '''
+        normalized = sys.intern(normalized)
+        config_name = CONFIG_NAMES.get(self.vendor, sys.intern)(normalized)
+        self._config_name[normalized] = config_name
+        self._by_name[normalized] = normalized
+        self._by_name.setdefault(config_name, normalized)
+        if if_name is not None:
+            if_name = sys.intern(if_name)
+            self._if_name[normalized] = if_name
+            self._by_name.setdefault(if_name, normalized)
+        if if_index is not None:
+            self._if_index[normalized] = if_index
+            self._by_if_index[if_index] = normalized
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def normalized(self, name):
+        ''' normalized name for a normalized, config or ifName name, falling back to ifAlias '''
+        if name in self._by_name:
+            return self._by_name[name]
+        return self._by_alias.get(name)
+
+    def config_name(self, name):
+        return self._config_name.get(self.normalized(name))
+
+    def if_name(self, name):
+        return self._if_name.get(self.normalized(name))
+
+    def if_index(self, name):
+        return self._if_index.get(self.normalized(name))
+
+    def by_if_index(self, if_index):
+        return self._by_if_index.get(if_index)
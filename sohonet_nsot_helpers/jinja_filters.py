@@ -1,15 +1,21 @@
 # Sohonet custom Jinja2 Filters
-from passlib.hash import cisco_type7
-import base64
-from netutils.vlan import vlanlist_to_config
 import requests
 import ipaddress
-import re
 import math
 
+from sohonet_nsot_helpers.cache import CACHE, LOCAL_CACHE
+from sohonet_nsot_helpers.interface_names import netiron_config_name
+from sohonet_nsot_helpers.port_ranges import compress, compress_interfaces, first_config_line, intervals_to_config
+from sohonet_nsot_helpers.render_index import InterfaceList, ServiceInventoryList
+from sohonet_nsot_helpers.secret_codec import encode_cisco_type7, encode_netiron_snmp
+
+SMN_RANGES_URL = ('https://lon-proxy-03.storagesvc.sohonet.com/v1/AUTH_bc8242fea43146a7b8cee34a40f328e0/'
+                  'ip-ranges-PUBLIC-READABLE/smn-ip-ranges.json')
+SMN_RANGES_TTL = 3600
+
 
 def encrypt_cisco_type7(password):
-    return cisco_type7.hash(password, salt=1)
+    return encode_cisco_type7(password, salt=1)
 
 
 def encrypt_netiron_snmp(community):
@@ -26,24 +32,7 @@ def encrypt_netiron_snmp(community):
     Returns:
         str: The encrypted and base64-encoded SNMP community string, prefixed with '$'.
     """
-
-    # yapf: disable
-    table = {
-      'a': '!','b': '2','c': 'd','d': '@','e': 'n','f': 'G','g': '"','h': 'b','i': '=','j': '?','k': 'D','l': '^','m': '6','n': 'g','o': 's','p': 'S',
-      'q': 'R','r': 'U','s': '-','t': 'o','u': 'i','v': 'r','w': '+','x': 'C','y': '\\','z': 'x','A': 'q','B': 'L','C': 'B','D': ':','E': 'f','F': 'w',
-      'G': '9','H': '0','I': """'""",'J': 'c','K': 'h','L': '#','M': 'k','N': 't','O': ',','P': '5','Q': '_','R': 'P','S': '%','T': 'l','U': 'K','V': ']',
-      'W': 'a','X': 'E','Y': '*','Z': '(','0': 'Q','1': 'Z','2': '|','3': '8','4': '3','5': '0','6': 'm','7': 'Y','8': 'W','9': '{','!': 'V','"': 'F',
-      '#': 'I','$': '4','%': 'u','&': '>',"""'""": 'N','(': 'p',')': 'z','*': 'X','+': 'e',',': 'T','-': 'M','.': '&','/': ')',':': 'y',';': ';','<': '`',
-      '=': '$','>': 'v','@': '1','[': '7',']': '~','\\': 'H','^': '<','_': '}','`': '/','{': '.','}': 'j','~': '[',
-    }
-    # yapf: enable
-
-    cipher_string = ''
-    for char in community:
-        cipher_string += table[char]
-
-    base64_bytes = base64.b64encode(cipher_string.encode('ascii'))
-    return '$' + base64_bytes.decode('ascii')
+    return encode_netiron_snmp(community)
 
 
 def mrv_physical_interfaces_to_config(ports):
@@ -51,41 +40,48 @@ def mrv_physical_interfaces_to_config(ports):
 
         i.e. 1-16  or  1-13,15-16
     '''
-    portlist = []
-    trunklist = []
+    portlist = set()
+    trunklist = set()
     for port in ports:
         if port['type'] != 'VIRTUAL' and port['name'].isdigit():
             if port['lag']:
-                if port['lag']['name'] not in trunklist:
-                    trunklist.append(port['lag']['name'])
+                trunklist.add(port['lag']['name'])
             else:
-                portlist.append(int(port['name']))
+                portlist.add(int(port['name']))
 
     if not portlist:
         return ''
 
-    portlist_config = vlanlist_to_config(portlist, min_grouping_size=2)
+    portlist_config = first_config_line(intervals_to_config(compress(portlist, min_grouping_size=2)))
     if trunklist:
-        portlist_config[0] = portlist_config[0] + "," + ",".join(sorted(trunklist))
-    return portlist_config[0]
+        portlist_config = portlist_config + "," + ",".join(sorted(trunklist))
+    return portlist_config
 
 
 def is_smn_ip(ipaddr):
     ''' check if an ipaddress is in SMN ranges '''
-    req = requests.get(
-        'https://lon-proxy-03.storagesvc.sohonet.com/v1/AUTH_bc8242fea43146a7b8cee34a40f328e0/ip-ranges-PUBLIC-READABLE/smn-ip-ranges.json'
-    )
-    ip_ranges = req.json()
-
     ip_to_check = ipaddress.ip_address(ipaddr.split('/')[0])
 
-    for prefix in ip_ranges['prefixes']:
-        if ip_to_check in ipaddress.ip_network(prefix['ip_prefix']):
+    for network in _smn_networks():
+        if ip_to_check in network:
             return True
 
     return False
 
 
+def _smn_networks():
+    ''' SMN ranges, downloaded once per node and parsed once per process every SMN_RANGES_TTL seconds '''
+
+    def download():
+        return requests.get(SMN_RANGES_URL).json()
+
+    def parse():
+        ip_ranges = CACHE.namespace('smn').get_or_compute('ip-ranges', download, ttl=SMN_RANGES_TTL)
+        return [ipaddress.ip_network(prefix['ip_prefix']) for prefix in ip_ranges['prefixes']]
+
+    return LOCAL_CACHE.namespace('smn').get_or_compute('networks', parse, ttl=SMN_RANGES_TTL)
+
+
 def netiron_normalized_interface_to_config(interface_name):
     ''' Convert Netiron normalized interface names to names used in config
 
@@ -99,19 +95,15 @@ def netiron_normalized_interface_to_config(interface_name):
     Ethernetmgmt1           ->      management 1
 
     '''
+    return netiron_config_name(interface_name)
+
 
-    match = re.match(r'\d*(\D+)(\d+[\d|/]*)', interface_name)
-    if match:
-        if 'mgmt' in match.group(1):
-            return f"management {match.group(2)}"
-        elif 'Ethernet' in match.group(1):
-            return f"ethernet {match.group(2)}"
-        elif 'Ve' in match.group(1):
-            return f"ve {match.group(2)}"
-        elif 'Loopback' in match.group(1):
-            return f"loopback {match.group(2)}"
+def netiron_normalized_interfaces_to_config(interface_names):
+    ''' Convert a list of Netiron normalized interface names to a config range, i.e.
 
-    return interface_name
+    [GigabitEthernet1/1, GigabitEthernet1/2, GigabitEthernet1/3]  ->  ethernet 1/1 to 1/3
+    '''
+    return compress_interfaces([netiron_normalized_interface_to_config(i) for i in interface_names], 'netiron')
 
 
 def bandwith_to_optiswitch_name(bandwidth):
@@ -131,9 +123,12 @@ def bandwith_to_optiswitch_name(bandwidth):
         return f"{bandwidth}m"
 
 
-def filter_inventories(service_inventories, filter):
-    ''' return list of service inventories with service_type matching filter  '''
-    return [s for s in service_inventories if s['serviceid']['service_type'] == filter]
+def filter_inventories(service_inventories, filter, *filters):
+    ''' return list of service inventories with service_type matching filter, or any of the filters given '''
+    if isinstance(service_inventories, ServiceInventoryList):
+        return service_inventories.lookup(filter, *filters)
+    service_types = {filter, *filters}
+    return [s for s in service_inventories if s['serviceid']['service_type'] in service_types]
 
 
 def adva_shaping_values(bandwidth, max_port_bandwidth, custom_shaping=False, shaping_eir=False):
@@ -496,4 +491,6 @@ def config_compliance(compliance_set):
 
 def filter_interfaces_not_managementmode(interfaces, mode):
     '''Filter interfaces that do not have a specific management mode.'''
+    if isinstance(interfaces, InterfaceList):
+        return interfaces.exclude(mode)
     return [i for i in interfaces if not i.get('managementmode') or i['managementmode'].get('mode') != mode]
\ No newline at end of file
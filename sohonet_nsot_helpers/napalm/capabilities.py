@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+SUPPORTED = 'supported'
+UNSUPPORTED = 'unsupported'
+
+
+class CapabilityRegistry:
+    ''' Record which command variants work on each platform model and OS version
+
+    Learned results are persisted to a JSON file so that later runs can go straight to the command that
+    works instead of paying for failed round trips to re-learn it. Each result is kept with the time it
+    was recorded and is forgotten after ttl seconds, so it is re-learned, i.e.
+
+    {
+        'platforms': {
+            'J9728A 2920-48G Switch|WB.16.10.0012': {
+                'show interfaces custom all port:10 type': ['supported', 1717200000.0],
+                'show interfaces config': ['unsupported', 1717200000.0],
+            }
+        },
+        'devices': {
+            'switch1.example.com': 'J9728A 2920-48G Switch|WB.16.10.0012'
+        }
+    }
+
+    Only record what the platform decides, i.e. that a command is rejected as invalid input, not
+    results that depend on a device's data or configuration.
+    '''
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or os.environ.get(
+            'SOHONET_CAPABILITY_REGISTRY',
+            os.path.join(os.path.expanduser('~'), '.cache', 'sohonet_nsot_helpers', 'capabilities.json'))
+        self.ttl = ttl if ttl is not None else float(os.environ.get('SOHONET_CAPABILITY_TTL', 7 * 24 * 3600))
+        self._lock = threading.Lock()
+        self._data = None
+
+    def status(self, key, command):
+        ''' return the recorded status of command on platform key, or None if it hasn't been tried within
+        ttl seconds '''
+        if key is None:
+            return None
+        entry = self._load()['platforms'].get(key, {}).get(command)
+        # Entries from before results were timestamped are re-learned
+        if not isinstance(entry, list) or entry[1] + self.ttl <= time.time():
+            return None
+        return entry[0]
+
+    def record(self, key, command, status):
+        ''' record the status of command on platform key '''
+        if key is None:
+            return
+        entry = self._load()['platforms'].get(key, {}).get(command)
+        # Only rewrite the file for an unchanged status once it is half way to expiring
+        if self.status(key, command) == status and entry[1] + self.ttl / 2 > time.time():
+            return
+        with self._lock:
+            self._load()['platforms'].setdefault(key, {})[command] = [status, time.time()]
+            self._save()
+
+    def ordered(self, key, commands):
+        ''' return command variants with known working ones first and known failing ones last '''
+        working = [c for c in commands if self.status(key, c) == SUPPORTED]
+        unknown = [c for c in commands if self.status(key, c) is None]
+        failing = [c for c in commands if self.status(key, c) == UNSUPPORTED]
+        return working + unknown + failing
+
+    def device_key(self, hostname):
+        ''' return the platform key last seen for hostname '''
+        return self._load()['devices'].get(hostname)
+
+    def remember_device(self, hostname, key):
+        ''' store the platform key for hostname so it doesn't need to be looked up next run '''
+        if self.device_key(hostname) == key:
+            return
+        with self._lock:
+            self._load()['devices'][hostname] = key
+            self._save()
+
+    def _load(self):
+        if self._data is None:
+            self._data = _read_registry(self.path)
+        return self._data
+
+    def _save(self):
+        # Merge with anything other processes have learned since the registry was loaded
+        on_disk = _read_registry(self.path)
+        for key, commands in self._data['platforms'].items():
+            merged = on_disk['platforms'].setdefault(key, {})
+            for command, entry in commands.items():
+                # The most recently recorded result wins
+                if not isinstance(entry, list):
+                    continue
+                if not isinstance(merged.get(command), list) or merged[command][1] <= entry[1]:
+                    merged[command] = entry
+        on_disk['devices'].update(self._data['devices'])
+        self._data = on_disk
+
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+        os.replace(f.name, self.path)
+
+
+def _read_registry(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data.setdefault('platforms', {})
+    data.setdefault('devices', {})
+    return data
+
+
+def platform_key(model, version):
+    ''' registry key for a platform model and OS version '''
+    return f"{model}|{version}"
+
+
+REGISTRY = CapabilityRegistry()
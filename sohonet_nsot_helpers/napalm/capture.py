@@ -0,0 +1,303 @@
+''' Record device interactions in production and replay them offline
+
+Capture wraps the connection a driver talks to, pyeapi's node for EOS and netmiko's connection for
+ProCurve, so everything the getters do through run_commands, _send_command, _walkMIB_values and
+_get_interface_map is written with its timing to a gzipped JSON lines archive per device:
+
+    with capture(driver, '/var/tmp/captures'):
+        eos_get_interfaces(driver)
+
+The archive can then be fed back to the same getters without network access, as fast as possible or
+with the latencies seen when it was recorded:
+
+    driver = replay_driver('/var/tmp/captures/switch1.example.com.jsonl.gz', speed=1.0)
+    procurve_get_interfaces(driver)
+
+Pipelined ProCurve batches are stored per command, so a replay doesn't depend on how commands were
+batched when they were captured.
+'''
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from pyeapi.eapilib import CommandError
+
+from sohonet_nsot_helpers.napalm.procurve_sessions import _split_pipelined_output, procurve_send_command
+
+SENTINEL_REGEX = re.compile(r'^sohonet-pipeline-\w+-\d+$')
+
+
+class CaptureArchive:
+    ''' Writer for one device's capture archive, {directory}/{hostname}.jsonl.gz
+
+    The first line describes the device, each following line is one request and its response:
+
+    {"hostname": "switch1", "vendor": "procurve", "prompt": "switch1#", "started": 1700000000.0}
+    {"method": "send_command", "command": "show vlans", "output": "...", "start": 0.01, "duration": 0.4}
+    {"method": "run_commands", "commands": [...], "encoding": "json", "responses": [...], ...}
+    '''
+
+    def __init__(self, directory, hostname, vendor, prompt=None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{hostname}.jsonl.gz")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._write({'hostname': hostname, 'vendor': vendor, 'prompt': prompt, 'started': time.time()})
+
+    def record(self, entry, start, duration):
+        ''' write a request/response entry, start is the time.monotonic() the request was made '''
+        entry['start'] = round(start - self._started, 6)
+        entry['duration'] = round(duration, 6)
+        self._write(entry)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(',', ':')) + "\n")
+
+
+class CapturingNode:
+    ''' pyeapi node wrapper recording run_commands '''
+
+    def __init__(self, node, archive):
+        self._node = node
+        self._archive = archive
+
+    def run_commands(self, commands, encoding='json', **kwargs):
+        entry = {'method': 'run_commands', 'commands': list(commands), 'encoding': encoding}
+        start = time.monotonic()
+        try:
+            responses = self._node.run_commands(commands, encoding=encoding, **kwargs)
+        except CommandError as e:
+            entry['error'] = {'code': e.error_code, 'message': e.error_text}
+            self._archive.record(entry, start, time.monotonic() - start)
+            raise
+        entry['responses'] = responses
+        self._archive.record(entry, start, time.monotonic() - start)
+        return responses
+
+    def __getattr__(self, name):
+        return getattr(self._node, name)
+
+
+class CapturingConnection:
+    ''' netmiko connection wrapper recording send_command and pipelined batches per command '''
+
+    def __init__(self, connection, archive, driver):
+        self._connection = connection
+        self._archive = archive
+        self._driver = driver
+        self._written = []
+        self._write_start = None
+
+    def send_command(self, command_string, *args, **kwargs):
+        start = time.monotonic()
+        output = self._connection.send_command(command_string, *args, **kwargs)
+        self._archive.record({'method': 'send_command', 'command': command_string, 'output': output}, start,
+                             time.monotonic() - start)
+        return output
+
+    def write_channel(self, out_data):
+        if self._write_start is None:
+            self._write_start = time.monotonic()
+        self._written.append(out_data)
+        return self._connection.write_channel(out_data)
+
+    def read_until_pattern(self, *args, **kwargs):
+        written = "".join(self._written)
+        start = self._write_start or time.monotonic()
+        self._written = []
+        self._write_start = None
+        output = self._connection.read_until_pattern(*args, **kwargs)
+
+        lines = [line for line in written.split(self._connection.RETURN) if line]
+        commands = [line for line in lines if not SENTINEL_REGEX.match(line)]
+        sentinels = [line for line in lines if SENTINEL_REGEX.match(line)]
+        if commands and len(commands) == len(sentinels):
+            outputs = _split_pipelined_output(output, commands, sentinels, self._driver.prompt)
+            self._archive.record({'method': 'send_commands', 'commands': commands, 'outputs': outputs}, start,
+                                 time.monotonic() - start)
+        return output
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def start_capture(driver, directory):
+    ''' start recording everything the driver sends to the device, returns the CaptureArchive '''
+    if hasattr(driver.device, 'run_commands'):
+        archive = CaptureArchive(directory, driver.hostname, 'eos')
+        driver.device = CapturingNode(driver.device, archive)
+    else:
+        archive = CaptureArchive(directory, driver.hostname, 'procurve', prompt=getattr(driver, 'prompt', None))
+        driver.device = CapturingConnection(driver.device, archive, driver)
+    return archive
+
+
+def stop_capture(driver):
+    ''' stop recording and close the archive, the driver's own connection is put back '''
+    if isinstance(driver.device, (CapturingNode, CapturingConnection)):
+        wrapper = driver.device
+        driver.device = wrapper._node if isinstance(wrapper, CapturingNode) else wrapper._connection
+        wrapper._archive.close()
+
+
+@contextmanager
+def capture(driver, directory):
+    ''' record the driver's interactions with the device for the duration of the with block '''
+    archive = start_capture(driver, directory)
+    try:
+        yield archive
+    finally:
+        stop_capture(driver)
+
+
+def read_archive(path):
+    ''' return (header, entries) from a capture archive '''
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        entries = [json.loads(line) for line in f if line.strip()]
+    return header, entries
+
+
+class _Responses:
+    ''' Recorded responses by request, replayed in the order they were recorded '''
+
+    def __init__(self, speed):
+        self.speed = speed
+        self._responses = defaultdict(deque)
+
+    def add(self, key, response, duration):
+        self._responses[key].append((response, duration))
+
+    def __contains__(self, key):
+        return key in self._responses
+
+    def take(self, key, sleep=True):
+        ''' next response for key, the last one is repeated once they run out '''
+        if key not in self._responses:
+            raise KeyError(f"{key} was not captured")
+        responses = self._responses[key]
+        response, duration = responses.popleft() if len(responses) > 1 else responses[0]
+        if sleep and self.speed:
+            time.sleep(duration * self.speed)
+        return response, duration
+
+
+class ReplayNode:
+    ''' Stand in for a pyeapi node answering from a capture archive '''
+
+    def __init__(self, entries, speed=0):
+        self._batches = _Responses(speed)
+        self._commands = _Responses(speed)
+        for entry in entries:
+            if entry['method'] != 'run_commands':
+                continue
+            response = entry.get('responses', entry.get('error'))
+            self._batches.add((tuple(entry['commands']), entry['encoding']), response, entry['duration'])
+            if 'responses' in entry:
+                for command, command_response in zip(entry['commands'], entry['responses']):
+                    self._commands.add((command, entry['encoding']), command_response,
+                                       entry['duration'] / len(entry['commands']))
+
+    def run_commands(self, commands, encoding='json', **kwargs):
+        batch = (tuple(commands), encoding)
+        if batch in self._batches:
+            response, _ = self._batches.take(batch)
+        else:
+            # Commands batched differently to the capture, answer each from any batch it was in
+            response = [self._commands.take((command, encoding))[0] for command in commands]
+        if isinstance(response, dict):
+            raise CommandError(response['code'], response['message'])
+        return response
+
+
+class ReplayConnection:
+    ''' Stand in for a ProCurve netmiko connection answering from a capture archive, including pipelined
+    batches written with procurve_send_commands '''
+    RETURN = "\n"
+
+    def __init__(self, entries, prompt, speed=0):
+        self.prompt = prompt
+        self._commands = _Responses(speed)
+        self._speed = speed
+        self._buffer = ""
+        self._pending_seconds = 0.0
+        for entry in entries:
+            if entry['method'] == 'send_command':
+                self._commands.add(entry['command'], entry['output'], entry['duration'])
+            elif entry['method'] == 'send_commands':
+                for command, output in zip(entry['commands'], entry['outputs']):
+                    self._commands.add(command, output, entry['duration'] / len(entry['commands']))
+
+    def find_prompt(self, *args, **kwargs):
+        return self.prompt
+
+    def send_command(self, command_string, *args, **kwargs):
+        return self._commands.take(command_string)[0]
+
+    def write_channel(self, out_data):
+        for line in out_data.split(self.RETURN)[:-1]:
+            if SENTINEL_REGEX.match(line):
+                body = f"Invalid input: {line}"
+            else:
+                body, duration = self._commands.take(line, sleep=False)
+                self._pending_seconds += duration
+            self._buffer += f"{self.prompt}{line}\n{body.rstrip(chr(10))}\n"
+        self._buffer += self.prompt
+
+    def read_until_pattern(self, *args, **kwargs):
+        if self._speed:
+            time.sleep(self._pending_seconds * self._speed)
+        output, self._buffer, self._pending_seconds = self._buffer, "", 0.0
+        return output
+
+    def clear_buffer(self, *args, **kwargs):
+        self._buffer = ""
+        return ""
+
+    def is_alive(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+
+class ReplayEOSDriver:
+    ''' Enough of an EOSDriver for the eos_get_* helpers, answering from a capture archive '''
+
+    def __init__(self, header, entries, speed=0):
+        self.hostname = header['hostname']
+        self.device = ReplayNode(entries, speed)
+
+
+class ReplayProcurveDriver:
+    ''' Enough of a ProcurveDriver for the procurve_get_* helpers, answering from a capture archive '''
+    _send_command = procurve_send_command
+
+    def __init__(self, header, entries, speed=0):
+        self.hostname = header['hostname']
+        self.prompt = header.get('prompt') or f"{self.hostname}#"
+        self.device = ReplayConnection(entries, self.prompt, speed)
+        self.interface_map = {}
+
+
+def replay_driver(path, speed=0):
+    ''' return a driver replaying the capture archive at path
+
+    speed=0 answers immediately, speed=1 sleeps for the latencies seen when capturing, speed=0.5 for
+    half of them, and so on.
+    '''
+    header, entries = read_archive(path)
+    if header['vendor'] == 'eos':
+        return ReplayEOSDriver(header, entries, speed)
+    return ReplayProcurveDriver(header, entries, speed)
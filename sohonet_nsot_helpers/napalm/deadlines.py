@@ -0,0 +1,195 @@
+''' Time budgets for the eos_get_* and procurve_get_* helpers
+
+A deadline is set on a driver for the duration of a getter. The helpers always collect their core data,
+but optional enrichments such as MPLS flags, interface ACLs, virtual-router IPs, trunk children and per
+subinterface VLANs are skipped, or cut short, once the budget is running out:
+
+    with getter_deadline(driver, 30, fill_queue=FILL_QUEUE):
+        interfaces_ip = driver.get_interfaces_ip()
+    if is_partial(interfaces_ip):
+        ...  # interfaces_ip.missing lists the enrichments left out
+
+A getter that left something out returns a PartialResult, which is the usual dict with partial and
+missing attributes, and queues the device and getter on the fill queue so the gaps can be filled by a
+later run without a deadline. Values that depend on a skipped enrichment are left out of the result
+rather than guessed, their records have None for them (see sohonet_nsot_helpers.normalize):
+
+    for device, getter, missing in FILL_QUEUE.take():
+        results = getattr(drivers[device], getter)()
+
+An enrichment only starts while more than reserve seconds of the budget are left, by default a fifth of
+it. Commands are given no longer than what is left of the budget to run, and DeadlineExceeded is raised
+once it has run out. The queue is a SQLite database, $SOHONET_FILL_QUEUE or
+~/.cache/sohonet_nsot_helpers/fills.sqlite.
+'''
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Deadline:
+    ''' Budget of seconds from now, enrichments are allowed while more than reserve seconds are left '''
+
+    def __init__(self, seconds, reserve=None, fill_queue=None, clock=time.monotonic):
+        self.seconds = seconds
+        self.reserve = seconds / 5 if reserve is None else reserve
+        self.fill_queue = fill_queue
+        self.clock = clock
+        self.expires = clock() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - self.clock())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows_enrichment(self):
+        return self.remaining() > self.reserve
+
+
+class DeadlineExceeded(TimeoutError):
+    ''' the deadline ran out before a getter collected its core data '''
+
+
+class PartialResult(dict):
+    ''' Getter result with enrichments left out to meet a deadline, missing lists which '''
+
+    def __init__(self, result, missing):
+        super().__init__(result)
+        self.missing = list(missing)
+
+    @property
+    def partial(self):
+        return bool(self.missing)
+
+
+def is_partial(result):
+    return isinstance(result, PartialResult) and result.partial
+
+
+@contextmanager
+def getter_deadline(driver, seconds, reserve=None, fill_queue=None):
+    ''' Deadline on driver for the helpers called within, results that are partial are put on fill_queue '''
+    previous = getattr(driver, 'deadline', None)
+    driver.deadline = Deadline(seconds, reserve, fill_queue)
+    try:
+        yield driver.deadline
+    finally:
+        driver.deadline = previous
+
+
+def collect_within(seconds, reserve=None, fill_queue=None):
+    ''' collect function for FleetScheduler.run and SweepWorker.run that runs each getter with a deadline '''
+
+    def collect(job, getter):
+        with getter_deadline(job.target, seconds, reserve, fill_queue):
+            return getattr(job.target, getter)()
+
+    return collect
+
+
+def enrichment_allowed(driver):
+    ''' whether a helper running on driver should start an optional enrichment '''
+    deadline = getattr(driver, 'deadline', None)
+    return deadline is None or deadline.allows_enrichment()
+
+
+def check_deadline(driver):
+    ''' raise DeadlineExceeded if driver's deadline has run out '''
+    deadline = getattr(driver, 'deadline', None)
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded(f"{driver.hostname}: deadline of {deadline.seconds}s ran out")
+
+
+def command_timeout(driver, timeout):
+    ''' timeout for the next command on driver, cut down to what is left of its deadline '''
+    check_deadline(driver)
+    deadline = getattr(driver, 'deadline', None)
+    if deadline is None:
+        return timeout
+    return deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+
+
+def queue_fill(driver, getter, missing):
+    ''' put getter on driver on the deadline's fill queue, for getters that stream rather than return a result '''
+    deadline = getattr(driver, 'deadline', None)
+    if deadline is not None and deadline.fill_queue is not None:
+        deadline.fill_queue.put(driver.hostname, getter, missing)
+
+
+def deadline_result(driver, getter, result, missing):
+    ''' result as a PartialResult if enrichments are missing, which is queued on the deadline's fill queue '''
+    if not missing:
+        return result
+    queue_fill(driver, getter, missing)
+    return PartialResult(result, missing)
+
+
+def keep_partial(result, records, left_out=()):
+    ''' records normalized from a getter result, as a PartialResult missing the same as result, and the
+    fields in left_out, i.e. those a fields projection left out, if there are any '''
+    missing = list(result.missing) if is_partial(result) else []
+    missing += [field for field in left_out if field not in missing]
+    if missing:
+        return PartialResult(records, missing)
+    return records
+
+
+class FillQueue:
+    ''' Devices and getters whose results were partial, to be collected again without a deadline '''
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get(
+            'SOHONET_FILL_QUEUE', os.path.join(os.path.expanduser('~'), '.cache', 'sohonet_nsot_helpers',
+                                               'fills.sqlite'))
+        self._local = threading.local()
+
+    def put(self, device, getter, missing):
+        ''' queue getter on device, adding to what is missing if it is already queued '''
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT missing FROM fills WHERE device = ? AND getter = ?",
+                                     (device, getter)).fetchone()
+            queued = json.loads(row[0]) if row else []
+            missing = queued + [enrichment for enrichment in missing if enrichment not in queued]
+            connection.execute("INSERT OR REPLACE INTO fills (device, getter, missing, queued) VALUES (?, ?, ?, ?)",
+                               (device, getter, json.dumps(missing), time.time()))
+
+    def pending(self):
+        ''' [(device, getter, missing)] oldest first, left on the queue '''
+        rows = self._connection().execute("SELECT device, getter, missing FROM fills ORDER BY queued").fetchall()
+        return [(device, getter, json.loads(missing)) for device, getter, missing in rows]
+
+    def take(self, limit=None):
+        ''' [(device, getter, missing)] oldest first, removed from the queue '''
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute("SELECT device, getter, missing FROM fills ORDER BY queued LIMIT ?",
+                                      (-1 if limit is None else limit, )).fetchall()
+            connection.executemany("DELETE FROM fills WHERE device = ? AND getter = ?",
+                                   [(device, getter) for device, getter, _ in rows])
+        return [(device, getter, json.loads(missing)) for device, getter, missing in rows]
+
+    def discard(self, device, getter):
+        ''' drop getter on device from the queue, i.e. once a full result has been collected some other way '''
+        with self._connection() as connection:
+            connection.execute("DELETE FROM fills WHERE device = ? AND getter = ?", (device, getter))
+
+    def _connection(self):
+        connection, pid = getattr(self._local, 'connection', (None, None))
+        if connection is None or pid != os.getpid():
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Autocommit, transactions are started explicitly where they're needed
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS fills (device TEXT, getter TEXT, missing TEXT, queued REAL, "
+                               "PRIMARY KEY (device, getter))")
+            self._local.connection = (connection, os.getpid())
+        return connection
+
+
+FILL_QUEUE = FillQueue()
@@ -1,8 +1,12 @@
 from nornir_napalm.plugins.tasks import napalm_get, napalm_cli
 import json
 import re
+import sys
 import textfsm
+import threading
+import time
 import os
+from contextlib import contextmanager
 
 import pyeapi
 import napalm.base.helpers
@@ -10,21 +14,30 @@ import napalm.base.helpers
 from napalm.eos.eos import EOSDriver
 from pyeapi.eapilib import CommandError
 
+from sohonet_nsot_helpers.cache import LOCAL_CACHE
+from sohonet_nsot_helpers.interface_names import eos_vlan_member_name, is_peer_interface, split_interface_name
+from sohonet_nsot_helpers.napalm.capabilities import REGISTRY, SUPPORTED, UNSUPPORTED, platform_key
+from sohonet_nsot_helpers.napalm.deadlines import (command_timeout, deadline_result, enrichment_allowed, keep_partial,
+                                                   queue_fill)
+from sohonet_nsot_helpers.napalm.fast_parsers import (FAST_PARSERS, STATIC_ROUTE_REGEX, fast_parser_verify,
+                                                     verify_fast_parser)
+from sohonet_nsot_helpers.normalize import (ArpEntry, LldpNeighbor, MacEntry, interface_fields, normalize_interfaces,
+                                            normalize_interfaces_ip, normalize_mac, normalize_vlans,
+                                            project_interfaces, projected_out)
+
 
 def transform_arista_vlans(vlan_dict):
     ''' Generate a NAPALM compabile vlan dict '''
     vlans = {}
     for vid, value in vlan_dict['vlans'].items():
-        interfaces = list(value['interfaces'].keys())
-        # Arista reports 'Cpu' in ports list if there is a virtual interface for the vlan. Change this to VlanXX
-        if 'Cpu' in interfaces:
-            interfaces.remove('Cpu')
-            interfaces.append('Vlan{}'.format(vid))
-        # Remove PeerEthernet and PeerPort interfaces
-        interfaces = [intf for intf in interfaces if 'Peer' not in intf]
+        members = list(value['interfaces'].keys())
+        # Arista reports 'Cpu' in ports list if there is a virtual interface for the vlan, it is listed last as VlanXX
+        if 'Cpu' in members:
+            members.remove('Cpu')
+            members.append('Cpu')
         vlans[vid] = {
             'name': value['name'],
-            'interfaces': [i for i in interfaces if 'Peer' not in i],  # Remove PeerEthernet interfaces
+            'interfaces': [name for name in (eos_vlan_member_name(i, vid) for i in members) if name],
         }
 
     return vlans
@@ -32,8 +45,7 @@ def transform_arista_vlans(vlan_dict):
 
 def get_subinterface_vlan(device, interface):
     # Construct command to run
-    intftype = re.sub(r'(\D+)([\d|\.|/]+)', r'\1', interface)
-    intfnum = re.sub(r'(\D+)([\d|\.|/]+)', r'\2', interface)
+    intftype, intfnum = split_interface_name(interface)
     output = device.run_commands(['show running-config interfaces {} {}'.format(intftype, intfnum)], encoding='text')
 
     # Extract VLAN ID from output
@@ -68,6 +80,173 @@ def get_patch_panel_vlans(device):
     return vlans
 
 
+# Seconds a fetched running config tree is shared between getters for
+RUNNING_CONFIG_TTL = 60.0
+
+
+def get_running_config_tree(self, fetch=True):
+    ''' return show running-config as a JSON cmds tree, or None if the platform can't return it
+
+    The whole config is a large payload, so the tree is held on the driver for RUNNING_CONFIG_TTL seconds
+    and shared by the getters. With fetch=False only a tree that is already held is returned, getters that
+    have smaller structured commands to run otherwise use it, but don't fetch it.
+
+    {
+        'cmds': {
+            'interface Ethernet1': {
+                'cmds': {
+                    'ip access-group CUST-IN in': None,
+                },
+                'comments': []
+            },
+            'ip route 0.0.0.0/0 192.0.2.1 name default': None,
+        }
+    }
+    '''
+    config_tree, expires = getattr(self, 'running_config_tree', (None, 0))
+    if config_tree is not None and expires > time.monotonic():
+        return config_tree
+    if not fetch:
+        return None
+
+    key = _eos_known_capability_key(self)
+    if REGISTRY.status(key, 'show running-config | json') == UNSUPPORTED:
+        return None
+
+    try:
+        config_tree = _eos_run_commands(self, ['show running-config'], encoding='json')[0]
+    except CommandError as e:
+        if _eos_invalid_command(e):
+            REGISTRY.record(key, 'show running-config | json', UNSUPPORTED)
+        return None
+
+    REGISTRY.record(key, 'show running-config | json', SUPPORTED)
+    self.running_config_tree = (config_tree, time.monotonic() + RUNNING_CONFIG_TTL)
+    return config_tree
+
+
+def _config_tree_lines(cmds):
+    ''' yield every config line in a cmds tree, depth first '''
+    for line, child in cmds.items():
+        yield line
+        if child:
+            yield from _config_tree_lines(child.get('cmds', {}))
+
+
+def _config_tree_section(config_tree, section):
+    ''' return the config lines directly below a top level section, i.e. interface Ethernet1 '''
+    child = config_tree['cmds'].get(section)
+    return child.get('cmds', {}) if child else {}
+
+
+def config_tree_subinterface_vlan(config_tree, interface):
+    ''' Same as get_subinterface_vlan, from a running config tree '''
+    vlan = False
+    for line in _config_tree_section(config_tree, f"interface {interface}"):
+        match = re.search(r'encapsulation dot1q vlan (?:\d+ inner )?(\d+)', line)
+        if match:
+            vlan = match.group(1)
+    return vlan
+
+
+def config_tree_patch_panel_vlans(config_tree):
+    ''' Same as get_patch_panel_vlans, from a running config tree '''
+    vlans = {}
+    for section, child in config_tree['cmds'].items():
+        if 'patch' not in section or not child:
+            continue
+        for line in _config_tree_lines(child.get('cmds', {})):
+            for match in re.findall(r'interface (\S+) dot1q vlan (\d+)', line):
+                vid = match[1]
+                if vid in vlans:
+                    vlans[vid]['interfaces'].append(match[0])
+                else:
+                    vlans[vid] = {'interfaces': [match[0]]}
+
+    return vlans
+
+
+def config_tree_interface_acls(config_tree):
+    ''' Same rows as the eos_show_running_config_interface_acl template, from a running config tree '''
+    acls = []
+    for section in config_tree['cmds'].keys():
+        if not section.startswith('interface '):
+            continue
+        for line in _config_tree_section(config_tree, section):
+            match = re.match(r'ip access-group (\S+) in', line)
+            if match:
+                acls.append({'interface': section.split()[1], 'interfaceacl': match.group(1)})
+    return acls
+
+
+def config_tree_interface_virtual_ips(config_tree):
+    ''' Same rows as the eos_show_running_config_interface_virtual_router template, from a running config tree '''
+    virtual_ips = []
+    for section in config_tree['cmds'].keys():
+        if not section.startswith('interface '):
+            continue
+        for line in _config_tree_section(config_tree, section):
+            match = re.match(r'ip virtual-router address (\S+)', line)
+            if match:
+                virtual_ips.append({'interface': section.split()[1], 'ipaddress': match.group(1)})
+    return virtual_ips
+
+
+def get_structured_output(self, command):
+    ''' return the JSON output of command, or None if the platform rejects it, which is remembered so it
+    isn't tried again '''
+    key = _eos_known_capability_key(self)
+    if REGISTRY.status(key, command) == UNSUPPORTED:
+        return None
+    try:
+        output = _eos_run_commands(self, [command])[0]
+    except CommandError as e:
+        if not _eos_invalid_command(e):
+            raise
+        REGISTRY.record(key, command, UNSUPPORTED)
+        return None
+    REGISTRY.record(key, command, SUPPORTED)
+    return output
+
+
+def structured_interface_acls(acl_summary):
+    ''' Same rows as the eos_show_running_config_interface_acl template, from show ip access-lists summary '''
+    acls = []
+    for acl in acl_summary.get('aclList', []):
+        for interface in acl.get('configuredIngressIntfs', []):
+            acls.append({'interface': interface['name'], 'interfaceacl': acl['name']})
+    return acls
+
+
+def structured_interface_virtual_ips(virtual_routers):
+    ''' Same rows as the eos_show_running_config_interface_virtual_router template, from show ip
+    virtual-router '''
+    virtual_ips = []
+    for router in virtual_routers.get('virtualRouters', []):
+        # Older releases show a single virtualIp rather than a virtualIps list
+        addresses = [address['ip'] for address in router.get('virtualIps', [])]
+        if router.get('virtualIp'):
+            addresses.append(router['virtualIp'])
+        for address in addresses:
+            virtual_ips.append({'interface': router['interface'], 'ipaddress': address})
+    return virtual_ips
+
+
+def config_tree_static_routes(config_tree):
+    ''' Same rows as the eos_show_running_config_static_route template, from a running config tree '''
+    routes = []
+    for line in config_tree['cmds'].keys():
+        match = STATIC_ROUTE_REGEX.match(line)
+        if match:
+            routes.append({
+                'prefix': match['prefix'],
+                'nexthop': match['nexthop'],
+                'name': match['name'] or '',
+                'vrf': match['vrf'] or '',
+            })
+    return routes
+
+
 def get_eos_vlans(task):
     ''' Helper task that can be used with nornir '''
     r = task.run(task=napalm_cli, commands=['show vlan|json'])
@@ -78,14 +257,27 @@ def get_eos_vlans(task):
 def eos_get_vlans(self):
     ''' Monkeypatch for get_vlans to use with EOSDriver in napalm '''
     commands = ['show vlan', 'show interfaces']
-    output = self.device.run_commands(commands, encoding='json')
+    output = _eos_run_commands(self, commands, encoding='json')
 
     # Process show vlans output
     vlans = transform_arista_vlans(output[0])
+    missing = []
+
+    # Prefer the structured running config over a text command per subinterface, but only fetch it when
+    # there are subinterfaces, the patch panel section alone is much smaller
+    subinterfaces = [i for i in output[1]['interfaces'].keys() if '.' in i]
+    config_tree = get_running_config_tree(self, fetch=bool(subinterfaces)) if enrichment_allowed(self) else None
 
     # Get vlans from subinterfaces
-    for interface in [i for i in output[1]['interfaces'].keys() if '.' in i]:
-        vlan = get_subinterface_vlan(self.device, interface)
+    for interface in subinterfaces:
+        if config_tree:
+            vlan = config_tree_subinterface_vlan(config_tree, interface)
+        elif enrichment_allowed(self):
+            with _eos_command_timeout(self):
+                vlan = get_subinterface_vlan(self.device, interface)
+        else:
+            missing.append('subinterface_vlans')
+            break
 
         if vlan:
             # Update vlans dict
@@ -98,7 +290,7 @@ def eos_get_vlans(self):
                 }
 
     # Get vlans from patch panels
-    pp_vlans = get_patch_panel_vlans(self.device)
+    pp_vlans = _eos_patch_panel_vlans(self, config_tree, missing)
     for vlan, data in pp_vlans.items():
         if vlan in vlans.keys():
             vlans[vlan]['interfaces'] += data['interfaces']
@@ -108,20 +300,36 @@ def eos_get_vlans(self):
                 'name': '',
             }
 
-    return vlans
+    # Member lists are incomplete without subinterfaces or patch panels, so are left out
+    if missing:
+        vlans = {vlan: {'name': data['name']} for vlan, data in vlans.items()}
+
+    return deadline_result(self, 'get_vlans', vlans, missing)
+
+
+def _eos_patch_panel_vlans(self, config_tree, missing):
+    ''' patch panel vlans from config_tree if there is one, otherwise from show running-config section
+    patch if the deadline allows it, adding patch_panel_vlans to missing if it doesn't '''
+    if config_tree:
+        return config_tree_patch_panel_vlans(config_tree)
+    if enrichment_allowed(self):
+        with _eos_command_timeout(self):
+            return get_patch_panel_vlans(self.device)
+    missing.append('patch_panel_vlans')
+    return {}
 
 
 def eos_get_interfaces_vlans(self):
     ''' Implement get_interfaces_vlans '''
     commands = ['show interfaces', 'show interfaces trunk', 'show vlan']
-    output = self.device.run_commands(commands, encoding='json')
+    output = _eos_run_commands(self, commands, encoding='json')
 
     result = {}
 
     # Generate list of interfaces
     for interface in output[0]['interfaces'].keys():
         # Ignore PeerEthernet interfaces
-        if 'Peer' in interface:
+        if is_peer_interface(interface):
             continue
         result[interface] = {
             'mode': 'access',
@@ -148,51 +356,96 @@ def eos_get_interfaces_vlans(self):
 
     # Any other vlans in show vlans will be access vlans
     for vlan, data in output[2]['vlans'].items():
-        for interface in data['interfaces'].keys():
-            # Arista reports 'Cpu' in ports list if there is a virtual interface for the vlan. Change this to VlanXX
-            if interface == 'Cpu':
-                interface = 'Vlan{}'.format(vlan)
-
-            # Ignore PeerEthernet interfaces
-            if 'Peer' in interface:
+        for member in data['interfaces'].keys():
+            # 'Cpu' becomes VlanXX, PeerEthernet interfaces are ignored
+            interface = eos_vlan_member_name(member, vlan)
+            if interface is None:
                 continue
 
             if result[interface]['mode'] == 'access':
                 result[interface]['access-vlan'] = vlan
 
+    # Prefer the structured running config over a text command per subinterface, but only fetch it when
+    # there are subinterfaces, the patch panel section alone is much smaller
+    missing = []
+    subinterfaces = [i for i in output[0]['interfaces'].keys() if '.' in i]
+    config_tree = get_running_config_tree(self, fetch=bool(subinterfaces)) if enrichment_allowed(self) else None
+
     # Add vlans for subinterfaces
-    for interface in [i for i in output[0]['interfaces'].keys() if '.' in i]:
-        vlan = get_subinterface_vlan(self.device, interface)
+    for interface in subinterfaces:
+        if config_tree:
+            vlan = config_tree_subinterface_vlan(config_tree, interface)
+        elif enrichment_allowed(self):
+            with _eos_command_timeout(self):
+                vlan = get_subinterface_vlan(self.device, interface)
+        else:
+            missing.append('subinterface_vlans')
+            break
         if vlan:
             result[interface]['access-vlan'] = vlan
+    if 'subinterface_vlans' in missing:
+        for interface in subinterfaces:
+            del result[interface]['access-vlan']
 
     # Add vlans from patch panels
-    pp_vlans = get_patch_panel_vlans(self.device)
+    pp_vlans = _eos_patch_panel_vlans(self, config_tree, missing)
     for vlan, data in pp_vlans.items():
         for interface in data['interfaces']:
             result[interface]['trunk-vlans'].append(vlan)
             result[interface]['mode'] = 'trunk'
 
-    return result
+    # Without the patch panels, any port that isn't a trunk or in a VLAN could be a patch panel trunk
+    if 'patch_panel_vlans' in missing:
+        for interface, data in result.items():
+            if '.' not in interface and data['mode'] == 'access' and data['access-vlan'] == -1:
+                del data['mode'], data['trunk-vlans']
 
+    return deadline_result(self, 'get_interfaces_vlans', result, missing)
 
-def eos_get_interfaces(self):
-    ''' Monkeypatch to add port-channel children in get_interfaces '''
-    commands = ['show interfaces', 'show interfaces status']
-    cmd_result = self.device.run_commands(commands)
 
-    try:
-        mpls_result = self.device.run_commands(['show mpls interface'])
-        show_mpls_interface = mpls_result[0]
-    except CommandError as e:
-        show_mpls_interface = {'intfs': {}}
+# Fields that can do without show interfaces, the much smaller show interfaces description lists the interfaces
+EOS_DESCRIPTION_FIELDS = frozenset(['is_up', 'is_enabled', 'description', 'type'])
+
 
-    show_interfaces = cmd_result[0]
-    show_interfaces_status = cmd_result[1]
+def eos_get_interfaces(self, fields=None):
+    ''' Monkeypatch to add port-channel children in get_interfaces
+
+    fields limits the result to some of normalize.INTERFACE_FIELDS, i.e. {'description', 'is_up'}, and
+    only the commands those fields come from are run
+    '''
+    fields = interface_fields(fields)
+    commands = _eos_interface_commands(fields)
+    cmd_result = dict(zip(commands, _eos_run_commands(self, commands)))
+
+    # Skip show mpls interface on platforms that are known not to support it, or when short of time
+    show_mpls_interface = {'intfs': {}}
+    missing = []
+    if 'mpls_enabled' in fields and not enrichment_allowed(self):
+        missing.append('mpls_enabled')
+    elif 'mpls_enabled' in fields:
+        key = _eos_capability_key(self, cmd_result['show version'])
+        if REGISTRY.status(key, 'show mpls interface') != UNSUPPORTED:
+            try:
+                mpls_result = _eos_run_commands(self, ['show mpls interface'])
+                show_mpls_interface = mpls_result[0]
+                REGISTRY.record(key, 'show mpls interface', SUPPORTED)
+            except CommandError as e:
+                # Without MPLS configured the command fails on platforms that do support it
+                if _eos_invalid_command(e):
+                    REGISTRY.record(key, 'show mpls interface', UNSUPPORTED)
 
     interfaces = {}
 
-    for interface, values in show_interfaces['interfaces'].items():
+    # Only status and descriptions wanted, from the much smaller show interfaces description
+    descriptions = cmd_result.get('show interfaces description', {}).get('interfaceDescriptions', {})
+    for interface, values in descriptions.items():
+        interfaces[interface] = {
+            'is_up': values['lineProtocolStatus'] == 'up',
+            'is_enabled': values['lineProtocolStatus'] == 'up' or values['interfaceStatus'] != 'adminDown',
+            'description': values['description'],
+        }
+
+    for interface, values in cmd_result.get('show interfaces', {}).get('interfaces', {}).items():
         interfaces[interface] = {}
 
         if values['lineProtocolStatus'] == 'up':
@@ -214,14 +467,17 @@ def eos_get_interfaces(self):
         interfaces[interface]['mac_address'] = values.pop('physicalAddress', '')
 
         if 'memberInterfaces' in values:
-            interfaces[interface]['children'] = [i for i in values['memberInterfaces'].keys() if 'Peer' not in i]
+            interfaces[interface]['children'] = [i for i in values['memberInterfaces'].keys() if not is_peer_interface(i)]
 
-        if interface in show_mpls_interface['intfs'].keys():
+        # Left out rather than False when show mpls interface was skipped
+        if 'mpls_enabled' in missing:
+            pass
+        elif interface in show_mpls_interface['intfs'].keys():
             interfaces[interface]["mpls_enabled"] = show_mpls_interface['intfs'][interface]['ldpConfigured']
         else:
             interfaces[interface]["mpls_enabled"] = False
 
-    for interface, values in show_interfaces_status['interfaceStatuses'].items():
+    for interface, values in cmd_result.get('show interfaces status', {}).get('interfaceStatuses', {}).items():
         if values['interfaceType'] == '10GBASE-T':
             interfaces[interface]['type'] = '10gbase-t'
         elif values['interfaceType'] == '10GBASE-SRL':
@@ -233,24 +489,177 @@ def eos_get_interfaces(self):
         elif values['interfaceType'] in ['100GBASE-CR4', '100GBASE-SR4']:
             interfaces[interface]['type'] = '100gbase-x-qsfp28'
 
-    return interfaces
+    return deadline_result(self, 'get_interfaces', project_interfaces(interfaces, fields), missing)
+
+
+def _eos_interface_commands(fields):
+    ''' commands eos_get_interfaces runs for fields, show interfaces description stands in for show
+    interfaces when it has everything needed '''
+    commands = ['show interfaces', 'show interfaces status', 'show version']
+    if fields <= EOS_DESCRIPTION_FIELDS:
+        commands[0] = 'show interfaces description'
+    if 'type' not in fields:
+        commands.remove('show interfaces status')
+    if 'mpls_enabled' not in fields:
+        commands.remove('show version')
+    return commands
+
+
+def eos_get_interface_records(self, fields=None):
+    ''' eos_get_interfaces as compact Interface records, use Interface.to_napalm_dict() for the dict view
+
+    Fields left out by a fields projection are None in the records, which are then a PartialResult missing
+    those fields, so diff.diff_records keeps what Nautobot holds for them.
+    '''
+    interfaces = eos_get_interfaces(self, fields)
+    return keep_partial(interfaces, normalize_interfaces(interfaces, fields), projected_out(fields))
+
+
+def eos_get_ip_records(self):
+    ''' eos_get_interfaces_ip as compact IPAddress records '''
+    interfaces_ip = eos_get_interfaces_ip(self)
+    return keep_partial(interfaces_ip, normalize_interfaces_ip(interfaces_ip))
+
+
+def eos_get_vlan_records(self):
+    ''' eos_get_vlans as compact Vlan records '''
+    vlans = eos_get_vlans(self)
+    return keep_partial(vlans, normalize_vlans(vlans))
+
+
+def eos_get_mac_records(self):
+    ''' Yield a MacEntry for each unicast entry of the MAC address table '''
+    table = _eos_run_commands(self, ['show mac address-table'], encoding='json')[0]
+    for entry in table['unicastTable']['tableEntries']:
+        yield MacEntry(
+            mac=normalize_mac(entry['macAddress']),
+            interface=sys.intern(entry['interface']),
+            vlan=int(entry['vlanId']),
+            static=entry['entryType'] != 'dynamic',
+        )
+
+
+def eos_get_arp_records(self):
+    ''' Yield an ArpEntry for each IPv4 ARP and IPv6 neighbor entry in the default VRF
+
+    IPv6 neighbors are left out when short of time, the getter is then put on the deadline's fill queue.
+    '''
+    show_arp = _eos_run_commands(self, ['show ip arp'], encoding='json')[0]
+    for neighbor in show_arp['ipV4Neighbors']:
+        yield _eos_arp_entry(neighbor)
+    del show_arp
+
+    if not enrichment_allowed(self):
+        queue_fill(self, 'get_arp_records', ['ipv6_neighbors'])
+        return
+    try:
+        show_neighbors = _eos_run_commands(self, ['show ipv6 neighbors'], encoding='json')[0]
+    except CommandError:
+        return
+    for neighbor in show_neighbors.get('ipV6Neighbors', []):
+        yield _eos_arp_entry(neighbor)
+
+
+def eos_get_lldp_records(self):
+    ''' Yield an LldpNeighbor for each neighbor in show lldp neighbors detail '''
+    show_lldp = _eos_run_commands(self, ['show lldp neighbors detail'], encoding='json')[0]
+    for interface, values in show_lldp['lldpNeighbors'].items():
+        interface = sys.intern(interface)
+        for neighbor in values.get('lldpNeighborInfo', []):
+            port = neighbor.get('neighborInterfaceInfo', {})
+            chassis_id = neighbor.get('chassisId', '')
+            if neighbor.get('chassisIdType') == 'macAddress':
+                chassis_id = normalize_mac(chassis_id)
+            yield LldpNeighbor(
+                local_interface=interface,
+                remote_chassis_id=chassis_id,
+                remote_port=port.get('interfaceId_v2') or port.get('interfaceId', '').strip('"'),
+                remote_port_description=port.get('interfaceDescription', ''),
+                remote_system_name=neighbor.get('systemName', ''),
+            )
+
+
+def _eos_arp_entry(neighbor):
+    # Entries learnt on an SVI name the member port too, i.e. "Vlan100, Ethernet1"
+    return ArpEntry(
+        interface=sys.intern(neighbor['interface'].split(',')[0]),
+        address=neighbor['address'],
+        mac=normalize_mac(neighbor['hwAddress']),
+        age=neighbor.get('age'),
+    )
+
+
+def _eos_run_commands(self, commands, encoding='json'):
+    ''' self.device.run_commands, given no longer than what is left of the driver's deadline '''
+    with _eos_command_timeout(self):
+        return self.device.run_commands(commands, encoding=encoding)
+
+
+@contextmanager
+def _eos_command_timeout(self):
+    ''' Cut the eAPI transport's timeout down to what is left of the driver's deadline for the commands run
+    within, pyeapi connects again for each request so the timeout applies to each of them '''
+    if getattr(self, 'deadline', None) is None:
+        yield
+        return
+    transport = self.device.connection.transport
+    timeout = transport.timeout
+    transport.timeout = command_timeout(self, timeout)
+    try:
+        yield
+    finally:
+        transport.timeout = timeout
+
+
+def _eos_invalid_command(error):
+    ''' whether a CommandError is EOS rejecting the command itself rather than failing to run it '''
+    message = str(error).lower()
+    return int(error.error_code) == 1002 and any(text in message
+                                                 for text in ('invalid input', 'invalid command', 'not supported'))
+
+
+def _eos_known_capability_key(self):
+    ''' Capability registry key of the device, from show version if it hasn't been seen before '''
+    key = getattr(self, 'capability_key', None) or REGISTRY.device_key(self.hostname)
+    if key is None:
+        key = _eos_capability_key(self, _eos_run_commands(self, ['show version'])[0])
+    return key
+
+
+def _eos_capability_key(self, show_version):
+    ''' Capability registry key from show version output '''
+    self.capability_key = platform_key(show_version['modelName'], show_version['version'])
+    REGISTRY.remember_device(self.hostname, self.capability_key)
+    return self.capability_key
 
 
 def _textfsm_extractor(template, raw_text):
-    ''' Apply textfsm templates on raw_text'''
+    ''' Apply textfsm templates on raw_text, using the equivalent fast parser if there is one'''
+    if template in FAST_PARSERS and not fast_parser_verify():
+        return FAST_PARSERS[template](raw_text)
+
     textfsm_data = list()
     current_dir = os.path.dirname(os.path.abspath(__file__))
     template_path = f"{current_dir}/../textfsm_templates/{template}.tpl"
 
-    with open(template_path) as f:
-        fsm_handler = textfsm.TextFSM(f)
-        for obj in fsm_handler.ParseText(raw_text):
-            entry = {}
-            for index, entry_value in enumerate(obj):
-                entry[fsm_handler.header[index].lower()] = entry_value
-            textfsm_data.append(entry)
+    # Compiled templates are kept per thread, a TextFSM holds its parse state
+    fsm_handler = LOCAL_CACHE.namespace('textfsm').get_or_compute(f"{template_path}:{threading.get_ident()}",
+                                                                  lambda: _compile_textfsm(template_path))
+    fsm_handler.Reset()
+    for obj in fsm_handler.ParseText(raw_text):
+        entry = {}
+        for index, entry_value in enumerate(obj):
+            entry[fsm_handler.header[index].lower()] = entry_value
+        textfsm_data.append(entry)
+
+    if template in FAST_PARSERS:
+        verify_fast_parser(template, raw_text, textfsm_data)
+    return textfsm_data
+
 
-        return textfsm_data
+def _compile_textfsm(template_path):
+    with open(template_path) as f:
+        return textfsm.TextFSM(f)
 
 
 def eos_get_interfaces_ip(self):
@@ -258,9 +667,9 @@ def eos_get_interfaces_ip(self):
 
     interfaces_ip = {}
 
-    interfaces_ipv4_out = self.device.run_commands(["show ip interface"])[0]["interfaces"]
+    interfaces_ipv4_out = _eos_run_commands(self, ["show ip interface"])[0]["interfaces"]
     try:
-        interfaces_ipv6_out = self.device.run_commands(["show ipv6 interface"])[0]["interfaces"]
+        interfaces_ipv6_out = _eos_run_commands(self, ["show ipv6 interface"])[0]["interfaces"]
     except pyeapi.eapilib.CommandError as e:
         msg = str(e)
         if "No IPv6 configured interfaces" in msg:
@@ -268,10 +677,13 @@ def eos_get_interfaces_ip(self):
         else:
             raise
 
-    interface_config = self.device.run_commands(["show running-config | section interface"],
-                                                encoding="text")[0]["output"]
-    interface_acls = _textfsm_extractor("eos_show_running_config_interface_acl", interface_config)
-    interface_virtual_ips = _textfsm_extractor("eos_show_running_config_interface_virtual_router", interface_config)
+    missing = []
+    if enrichment_allowed(self):
+        interface_acls, interface_virtual_ips = _eos_interface_acls_and_virtual_ips(self)
+    else:
+        interface_acls = []
+        interface_virtual_ips = []
+        missing = ['interfaceacl', 'virtual_ips']
 
     for interface_name, interface_details in interfaces_ipv4_out.items():
         ipv4_list = []
@@ -348,14 +760,40 @@ def eos_get_interfaces_ip(self):
         if i["interface"] in interfaces_ip.keys():
             interfaces_ip[i["interface"]]["interfaceacl"] = i["interfaceacl"]
 
-    return interfaces_ip
+    return deadline_result(self, 'get_interfaces_ip', interfaces_ip, missing)
+
+
+def _eos_interface_acls_and_virtual_ips(self):
+    ''' (interface ACL rows, virtual router IP rows) from a running config tree another getter fetched, the
+    structured show commands, a fetched running config tree or the text interface section, whichever
+    comes first that the platform supports '''
+    config_tree = get_running_config_tree(self, fetch=False)
+    if not config_tree:
+        acl_summary = get_structured_output(self, "show ip access-lists summary")
+        virtual_routers = get_structured_output(self, "show ip virtual-router")
+        if acl_summary is not None and virtual_routers is not None:
+            return structured_interface_acls(acl_summary), structured_interface_virtual_ips(virtual_routers)
+        config_tree = get_running_config_tree(self)
+    if config_tree:
+        return config_tree_interface_acls(config_tree), config_tree_interface_virtual_ips(config_tree)
+
+    interface_config = _eos_run_commands(self, ["show running-config | section interface"],
+                                         encoding="text")[0]["output"]
+    return (_textfsm_extractor("eos_show_running_config_interface_acl", interface_config),
+            _textfsm_extractor("eos_show_running_config_interface_virtual_router", interface_config))
 
 
 def eos_get_static_routes(self):
     """Get static routes configured on EOS devices"""
 
-    show_running_config_route = self.device.run_commands(['show running-config | section ip route'],
-                                                         encoding='text')[0]['output']
+    # show ip route static leaves out route names and routes that aren't installed, so they come from the
+    # running config tree, or the text route section on platforms that can't return the tree
+    config_tree = get_running_config_tree(self)
+    if config_tree:
+        return config_tree_static_routes(config_tree)
+
+    show_running_config_route = _eos_run_commands(self, ['show running-config | section ip route'],
+                                                  encoding='text')[0]['output']
     routes = _textfsm_extractor("eos_show_running_config_static_route", show_running_config_route)
 
     return routes
@@ -367,7 +805,7 @@ def eos_get_network_instances(self):
 
     instances = {}
 
-    show_vrf_output = self.device.run_commands(["show vrf | json"])[0]["vrfs"]
+    show_vrf_output = _eos_run_commands(self, ["show vrf | json"])[0]["vrfs"]
 
     for vrf in show_vrf_output:
         instances[vrf] = {
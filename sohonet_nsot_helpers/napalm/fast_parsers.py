@@ -0,0 +1,87 @@
+''' Hand written parsers for the largest TextFSM parsed outputs
+
+Each parser returns exactly what _textfsm_extractor would return for the template of the same name, but
+uses a single precompiled regex instead of running the TextFSM state machine over every line. The
+templates in textfsm_templates remain the reference: set SOHONET_FAST_PARSER_VERIFY=1, or call
+set_fast_parser_verify(True) at runtime, to parse with both and raise on any difference.
+'''
+import os
+import re
+
+STATIC_ROUTE_REGEX = re.compile(r'^ip route(?: vrf (?P<vrf>\S+))? (?P<prefix>\S+) (?P<nexthop>\S+)(?: name (?P<name>\S+))?',
+                                re.MULTILINE)
+PROCURVE_VLANS_REGEX = re.compile(
+    r'^\s+(?P<vlan>\d+)\s+(?P<name>.*?)\s+(\| )?(?P<status>\S+)\s+((?P<voice>Yes|No)\s+)?(?P<jumbo>Yes|No)')
+PROCURVE_INTERFACES_STATUS_REGEX = re.compile(
+    r'^\s+(?P<port>\S+)\s+((?P<name>\S*)\s+)?(?P<status>Up|Down)\s+(?P<configmode>\S+)\s+(?P<speed>\S+)\s+'
+    r'(?P<type>\S+)\s+(?P<taggedvlans>\S+)\s+(?P<untaggedvlan>\S+)')
+PROCURVE_TRUNKS_REGEX = re.compile(
+    r'^\s+(?P<port>\S+)\s+\| ((?P<name>\S*))?\s+(?P<porttype>\S+)\s+\| (?P<group>Trk\d+)\s+(?P<trunktype>\S+)')
+
+
+def parse_eos_static_routes(raw_text):
+    ''' eos_show_running_config_static_route '''
+    return [{
+        'prefix': match['prefix'],
+        'nexthop': match['nexthop'],
+        'name': match['name'] or '',
+        'vrf': match['vrf'] or '',
+    } for match in STATIC_ROUTE_REGEX.finditer(raw_text)]
+
+
+def parse_procurve_vlans(raw_text):
+    ''' procurve_show_vlans '''
+    return _parse_lines(PROCURVE_VLANS_REGEX, ['vlan', 'name', 'status', 'voice', 'jumbo'], raw_text)
+
+
+def parse_procurve_interfaces_status(raw_text):
+    ''' procurve_show_interfaces_status '''
+    return _parse_lines(PROCURVE_INTERFACES_STATUS_REGEX,
+                        ['port', 'name', 'status', 'configmode', 'speed', 'type', 'taggedvlans', 'untaggedvlan'],
+                        raw_text)
+
+
+def parse_procurve_trunks(raw_text):
+    ''' procurve_show_trunks '''
+    return _parse_lines(PROCURVE_TRUNKS_REGEX, ['port', 'name', 'porttype', 'group', 'trunktype'], raw_text)
+
+
+def _parse_lines(regex, fields, raw_text):
+    ''' Record one row per matching line, as the single rule -> Record templates do '''
+    rows = []
+    for line in raw_text.splitlines():
+        match = regex.match(line)
+        if match:
+            rows.append({field: match[field] or '' for field in fields})
+    return rows
+
+
+FAST_PARSERS = {
+    'eos_show_running_config_static_route': parse_eos_static_routes,
+    'procurve_show_vlans': parse_procurve_vlans,
+    'procurve_show_interfaces_status': parse_procurve_interfaces_status,
+    'procurve_show_trunks': parse_procurve_trunks,
+}
+
+_verify = os.environ.get('SOHONET_FAST_PARSER_VERIFY', '') not in ['', '0']
+
+
+def set_fast_parser_verify(enabled):
+    ''' turn parsing with both the fast parsers and TextFSM on or off, returns the previous setting '''
+    global _verify
+    previous, _verify = _verify, bool(enabled)
+    return previous
+
+
+def fast_parser_verify():
+    ''' whether outputs are parsed with both the fast parsers and TextFSM '''
+    return _verify
+
+
+def verify_fast_parser(template, raw_text, textfsm_data):
+    ''' Raise ValueError if the fast parser for template doesn't return textfsm_data for raw_text '''
+    fast_data = FAST_PARSERS[template](raw_text)
+    if fast_data != textfsm_data:
+        mismatches = [(fast, reference) for fast, reference in zip(fast_data, textfsm_data) if fast != reference]
+        raise ValueError(f"Fast parser for {template} returned {len(fast_data)} rows, TextFSM returned "
+                         f"{len(textfsm_data)}. First mismatch: {mismatches[:1]}")
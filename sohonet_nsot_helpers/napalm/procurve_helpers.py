@@ -1,46 +1,123 @@
+import functools
 import re
 import os
+import sys
+import time
 
 import textfsm
+import threading
 from netaddr import IPAddress
 from nornir_napalm.plugins.tasks import napalm_get, napalm_cli
 
 from napalm_procurve.procurve import ProcurveDriver
 
+from sohonet_nsot_helpers.cache import LOCAL_CACHE
+from sohonet_nsot_helpers.interface_names import InterfaceNameIndex, strip_trunk_suffix
+from sohonet_nsot_helpers.napalm.capabilities import REGISTRY, SUPPORTED, UNSUPPORTED, platform_key
+from sohonet_nsot_helpers.napalm.deadlines import check_deadline, deadline_result, enrichment_allowed, keep_partial
+from sohonet_nsot_helpers.napalm.fast_parsers import FAST_PARSERS, fast_parser_verify, verify_fast_parser
+from sohonet_nsot_helpers.napalm.procurve_sessions import procurve_send_commands
+from sohonet_nsot_helpers.normalize import (ArpEntry, LldpNeighbor, MacEntry, interface_fields, normalize_interfaces,
+                                            normalize_interfaces_ip, normalize_mac, normalize_vlans,
+                                            projected_out)
 
-def procurve_get_interfaces(self):
-    """Parse brief interface overview"""
+
+# Seconds prefetched outputs are used for, i.e. after procurve_snmp_prefetch
+PREFETCH_TTL = 60.0
+
+
+def _prefetch_scope(getter):
+    ''' Drop outputs getter prefetched but didn't use when it returns, so they can't go stale on the driver '''
+
+    @functools.wraps(getter)
+    def scoped(self, *args, **kwargs):
+        outer = getattr(self, 'prefetch_scope', None)
+        self.prefetch_scope = set()
+        try:
+            return getter(self, *args, **kwargs)
+        finally:
+            for command in self.prefetch_scope:
+                self.prefetched.pop(command, None)
+            self.prefetch_scope = outer
+
+    return scoped
+
+
+# Interface fields read from a MIB walk, in the order they are walked
+PROCURVE_INTERFACE_WALKS = [
+    ("description", "ifAlias"),
+    ("mac_address", "ifPhysAddress"),
+    ("mtu", "ifMtu"),
+    ("is_enabled", "ifAdminStatus"),
+    ("is_up", "ifOperStatus"),
+]
+
+
+@_prefetch_scope
+def procurve_get_interfaces(self, fields=None):
+    """Parse brief interface overview
+
+    fields limits the result to some of normalize.INTERFACE_FIELDS, i.e. {'description', 'is_up'}, and
+    only the walks and commands those fields come from are run
+    """
+    fields = interface_fields(fields)
     interfaces = {}
-    ifs = self._get_interface_map()
+    walks = {field: oid for field, oid in PROCURVE_INTERFACE_WALKS if field in fields}
+    commands = [f"walkMIB {oid}" for oid in walks.values()]
+    # speed and type come from the interface type commands, which are picked by platform
+    interface_types = bool(fields & {'speed', 'type'})
+    if interface_types:
+        interface_type_commands = REGISTRY.ordered(_procurve_capability_key(self), [
+            "show interfaces custom all port:10 type",
+            "show interfaces config",
+        ])
+        commands.append(interface_type_commands[0])
+    # Trunk children are left out when short of time
+    missing = []
+    if 'children' in fields and not enrichment_allowed(self):
+        missing.append('children')
+    elif 'children' in fields:
+        commands.append("show trunks")
+    cached_commands = _procurve_cached_commands(self, vlans='type' in fields)
+    if not interface_types:
+        # sysDescr is only needed to pick the interface type command
+        cached_commands = [command for command in cached_commands if command != "getMIB sysDescr.0"]
+    _procurve_prefetch(self, commands + cached_commands)
+    ifs = _get_interface_map(self)
 
     # Initialize custom attributes
-    if not hasattr(self, 'vlans'):
-        show_vlans_output = self._send_command("show vlans")
-        self.vlans = _textfsm_extractor("procurve_show_vlans", show_vlans_output)
+    if 'type' in fields and not hasattr(self, 'vlans'):
+        self.vlans = _procurve_parsed(self, "show vlans", "procurve_show_vlans")
 
-    if_alias = self._walkMIB_values("ifAlias")
-    if_macs = self._walkMIB_values("ifPhysAddress")
-    if_mtu = self._walkMIB_values("ifMtu")
-    if_adm_state = self._walkMIB_values("ifAdminStatus")
-    if_lnk_state = self._walkMIB_values("ifOperStatus")
+    walked = {field: _walkMIB_values(self, oid) for field, oid in walks.items()}
 
     for ifn, idx in ifs.items():
-        interfaces[str(ifn)] = {
-            "is_up": True if if_lnk_state[idx] == "1" else False,
-            "is_enabled": True if if_adm_state[idx] == "1" else False,
-            "description": str(if_alias[idx]),
-            "last_flapped": -1.0,
-            "speed": 0,
-            "mac_address": str(if_macs[idx]),
-            "mtu": int(re.sub(",", "", if_mtu[idx])),
-        }
-
-    # Add speeds & interface type
-    show_interface_custom_output = self._send_command("show interfaces custom all port:10 type")
-    data = _textfsm_extractor("procurve_show_interfaces_custom", show_interface_custom_output)
-    if not data:
-        show_interface_config_putput = self._send_command("show interfaces config")
-        data = _textfsm_extractor("procurve_show_interfaces_custom", show_interface_config_putput)
+        interface = interfaces[str(ifn)] = {}
+        if 'is_up' in fields:
+            interface["is_up"] = True if walked['is_up'][idx] == "1" else False
+        if 'is_enabled' in fields:
+            interface["is_enabled"] = True if walked['is_enabled'][idx] == "1" else False
+        if 'description' in fields:
+            interface["description"] = str(walked['description'][idx])
+        if 'last_flapped' in fields:
+            interface["last_flapped"] = -1.0
+        if 'speed' in fields:
+            interface["speed"] = 0
+        if 'mac_address' in fields:
+            interface["mac_address"] = str(walked['mac_address'][idx])
+        if 'mtu' in fields:
+            interface["mtu"] = int(re.sub(",", "", walked['mtu'][idx]))
+
+    # Add speeds & interface type, using the first command that works on this platform
+    data = []
+    for command in interface_type_commands if interface_types else []:
+        show_interface_custom_output = _procurve_command(self, command)
+        data = _textfsm_extractor("procurve_show_interfaces_custom", show_interface_custom_output)
+        if "Invalid input" in show_interface_custom_output:
+            REGISTRY.record(_procurve_capability_key(self), command, UNSUPPORTED)
+        elif data:
+            REGISTRY.record(_procurve_capability_key(self), command, SUPPORTED)
+            break
     for row in data:
         # Determine interface speed
         speed = 1000
@@ -56,76 +133,101 @@ def procurve_get_interfaces(self):
             intf_type = '10gbase-t'
 
         # Strip -TrkX strings from port names
-        portname = re.sub(r'-.*', '', row['port'])
+        portname = strip_trunk_suffix(row['port'])
 
-        interfaces[portname]['speed'] = speed
-        interfaces[portname]['type'] = intf_type
+        if 'speed' in fields:
+            interfaces[portname]['speed'] = speed
+        if 'type' in fields:
+            interfaces[portname]['type'] = intf_type
 
     # Append trunk children
-    trunks = _procurve_get_trunks(self)
-    for trunk, data in trunks.items():
-        interfaces[trunk]['children'] = data['interfaces']
+    if 'children' in fields and not missing:
+        trunks = _procurve_get_trunks(self)
+        for trunk, data in trunks.items():
+            interfaces[trunk]['children'] = data['interfaces']
 
     # Set type virtual for VLAN interfaces
-    if not hasattr(self, 'vlans'):
-        show_vlans_output = self._send_command("show vlans")
-        self.vlans = _textfsm_extractor("procurve_show_vlans", show_vlans_output)
-    for vlan in self.vlans:
-        vlan_interface = _vid_to_interface(self, vlan['vlan'])
-        interfaces[vlan_interface]['type'] = 'virtual'
+    if 'type' in fields:
+        for vlan in self.vlans:
+            vlan_interface = _vid_to_interface(self, vlan['vlan'])
+            interfaces[vlan_interface]['type'] = 'virtual'
 
-    return interfaces
+    return deadline_result(self, 'get_interfaces', interfaces, missing)
 
 
+@_prefetch_scope
 def procurve_get_interfaces_ip(self):
     ''' napalm get_interfaces_ip function '''
-    ifs = self._get_interface_map()
-    if_alias = self._walkMIB_values("ifAlias")
+    # Run alternate command to get ip info if any fields are truncated. Default to show ip to support
+    # older models
+    show_ip_commands = REGISTRY.ordered(_procurve_capability_key(self), [
+        "show ip",
+        "show vlan custom id name ipconfig ipaddr ipmask",
+    ])
+    _procurve_prefetch(self, ["walkMIB ifAlias", show_ip_commands[0]] + _procurve_cached_commands(self, vlans=False))
+    name_index = _procurve_name_index(self)
+    name_index.add_aliases(_walkMIB_values(self, "ifAlias"))
 
     ips = {}
 
-    # Get show ip output, and process valid lines including ip address
-    show_ip_output = self._send_command("show ip")
-    # Run alternate command to get ip info if any fields are truncated. Default to show ip to support
-    # older models
-    if '...' in show_ip_output:
-        show_ip_output = self._send_command("show vlan custom id name ipconfig ipaddr ipmask")
+    # Get show ip output, and process valid lines including ip address. Truncated output is used if no
+    # command shows the names in full, or there isn't time to try another
+    show_ip_output = ''
+    missing = []
+    for command in show_ip_commands:
+        if '...' in show_ip_output and not enrichment_allowed(self):
+            missing.append('full_vlan_names')
+            break
+        output = _procurve_command(self, command)
+        if "Invalid input" in output:
+            REGISTRY.record(_procurve_capability_key(self), command, UNSUPPORTED)
+            continue
+        show_ip_output = output
+        if '...' in output:
+            # Truncation depends on the device's VLAN names, not the platform, so isn't recorded
+            continue
+        REGISTRY.record(_procurve_capability_key(self), command, SUPPORTED)
+        break
     show_ip = _textfsm_extractor("procurve_show_ip", show_ip_output)
     for ip in show_ip:
-        vlan_name = ip['vlan']
-        if vlan_name not in ifs.keys():
-            # Lookup interface index from alias
-            idx = list(k for k, v in if_alias.items() if v == vlan_name)[0]
-            # Lookup interface name from idx
-            vlan_name = list(k for k, v in ifs.items() if v == idx)[0]
+        # VLAN interfaces are shown by name, which may be the ifAlias rather than the ifName
+        vlan_name = name_index.normalized(ip['vlan'])
+        if vlan_name is None:
+            # Neither an ifName nor an ifAlias, i.e. a truncated name, so there's no interface to put it on
+            continue
 
-        ips.update(
-            {vlan_name: {
-                "ipv4": {
-                    ip['ipaddress']: {
-                        "prefix_length": IPAddress(ip['subnetmask']).netmask_bits()
-                    }
-                }
-            }})
+        ips.setdefault(vlan_name, {"ipv4": {}})["ipv4"][ip['ipaddress']] = {
+            "prefix_length": IPAddress(ip['subnetmask']).netmask_bits()
+        }
 
-    return ips
+    return deadline_result(self, 'get_interfaces_ip', ips, missing)
 
 
+@_prefetch_scope
 def procurve_get_vlans(self):
 
     result = {}
+    _procurve_prefetch(self, ["show interfaces status", "show trunks"] + _procurve_cached_commands(self))
 
     # Get list of vlans, populate name to result dict
     if not hasattr(self, 'vlans'):
-        show_vlans_output = self._send_command("show vlans")
-        self.vlans = _textfsm_extractor("procurve_show_vlans", show_vlans_output)
+        self.vlans = _procurve_parsed(self, "show vlans", "procurve_show_vlans")
     for vlan in self.vlans:
         vlan_interface = _vid_to_interface(self, vlan['vlan'])
         result[vlan['vlan']] = {'name': vlan['name'], 'interfaces': [vlan_interface]}
 
     # Get VLANs for interfaces
-    show_interfaces_status_output = self._send_command("show interfaces status")
-    interfaces = _textfsm_extractor("procurve_show_interfaces_status", show_interfaces_status_output)
+    interfaces = _procurve_parsed(self, "show interfaces status", "procurve_show_interfaces_status")
+    trunks = _procurve_get_trunks(self)
+
+    # Collect the per port vlan commands needed below in one batch, unless short of time
+    missing = [] if enrichment_allowed(self) else ['tagged_vlans']
+    _procurve_prefetch(self, [] if missing else [
+        f"show vlans ports {interface['port']}"
+        for interface in interfaces
+        if 'Trk' not in interface['port'] and interface['taggedvlans'] == 'multi'
+    ] + [f"show vlans ports {trunk}" for trunk in trunks.keys()])
+
     for interface in interfaces:
         # Exclude trunk ports
         if 'Trk' in interface['port']:
@@ -137,35 +239,45 @@ def procurve_get_vlans(self):
         if interface['taggedvlans'].isdigit():
             result[interface['taggedvlans']]['interfaces'].append(interface['port'])
 
-        if interface['taggedvlans'] == 'multi':
-            intf_show_vlans_output = self._send_command(f"show vlans ports {interface['port']}")
-            intf_vlans = _textfsm_extractor("procurve_show_vlans", intf_show_vlans_output)
+        if interface['taggedvlans'] == 'multi' and not missing:
+            intf_vlans = _procurve_parsed(self, f"show vlans ports {interface['port']}", "procurve_show_vlans")
             for vlan in intf_vlans:
                 result[vlan['vlan']]['interfaces'].append(interface['port'])
 
     # Get VLANs for trunks
-    trunks = _procurve_get_trunks(self)
-    for trunk in trunks.keys():
-        trunk_show_vlans_output = self._send_command(f"show vlans ports {trunk}")
-        trunk_vlans = _textfsm_extractor("procurve_show_vlans", trunk_show_vlans_output)
+    for trunk in [] if missing else trunks.keys():
+        trunk_vlans = _procurve_parsed(self, f"show vlans ports {trunk}", "procurve_show_vlans")
         for vlan in trunk_vlans:
             result[vlan['vlan']]['interfaces'].append(trunk)
 
-    return result
+    # Member lists are incomplete without the tagged VLANs, so are left out
+    if missing:
+        result = {vlan: {'name': data['name']} for vlan, data in result.items()}
+
+    return deadline_result(self, 'get_vlans', result, missing)
 
 
+@_prefetch_scope
 def procurve_get_interfaces_vlans(self):
     """return dict as documented at
         https://github.com/napalm-automation/napalm/issues/919#issuecomment-485905491"""
 
     result = {}
+    _procurve_prefetch(self, ["show interfaces status", "show trunks"] + _procurve_cached_commands(self))
 
     # Collect data for standard interfaces
-    show_interfaces_status_output = self._send_command("show interfaces status")
-    interfaces = _textfsm_extractor("procurve_show_interfaces_status", show_interfaces_status_output)
+    interfaces = _procurve_parsed(self, "show interfaces status", "procurve_show_interfaces_status")
+    trunks = _procurve_get_trunks(self)
+
+    # Collect the per port vlan commands needed below in one batch, unless short of time
+    missing = [] if enrichment_allowed(self) else ['tagged_vlans']
+    _procurve_prefetch(self, [] if missing else [
+        f"show vlans ports {interface['port']}" for interface in interfaces if interface['taggedvlans'] == 'multi'
+    ] + [f"show vlans ports {trunk}" for trunk in trunks.keys()])
+
     for interface in interfaces:
         # Strip -TrkX strings from port names
-        portname = re.sub(r'-.*', '', interface['port'])
+        portname = strip_trunk_suffix(interface['port'])
 
         # Untagged interfaces
         if interface['taggedvlans'] == 'No':
@@ -186,31 +298,30 @@ def procurve_get_interfaces_vlans(self):
                 'native-vlan': -1 if interface['untaggedvlan'] == 'No' else interface['untaggedvlan'],
                 'tagged-native-vlan': False,
             }
-            if interface['taggedvlans'] == 'multi':
+            # Which VLANs are tagged is left out when short of time
+            if interface['taggedvlans'] == 'multi' and missing:
+                del result[portname]['trunk-vlans']
+            elif interface['taggedvlans'] == 'multi':
                 result[portname]['trunk-vlans'] = []
-                intf_show_vlans_output = self._send_command(f"show vlans ports {interface['port']}")
-                intf_vlans = _textfsm_extractor("procurve_show_vlans", intf_show_vlans_output)
+                intf_vlans = _procurve_parsed(self, f"show vlans ports {interface['port']}", "procurve_show_vlans")
                 for vlan in intf_vlans:
                     result[portname]['trunk-vlans'].append(vlan['vlan'])
 
     # Collect data for trunks
-    trunks = _procurve_get_trunks(self)
     for trunk in trunks.keys():
-        trunk_show_vlans_output = self._send_command(f"show vlans ports {trunk}")
-        trunk_vlans = _textfsm_extractor("procurve_show_vlans", trunk_show_vlans_output)
-
         result[trunk] = {
             'mode': 'trunk',
             'access-vlan': -1,
-            'trunk-vlans': [vlan['vlan'] for vlan in trunk_vlans],
             'native-vlan': -1,
             'tagged-native-vlan': True
         }
+        if not missing:
+            trunk_vlans = _procurve_parsed(self, f"show vlans ports {trunk}", "procurve_show_vlans")
+            result[trunk]['trunk-vlans'] = [vlan['vlan'] for vlan in trunk_vlans]
 
     # Collect data for VLAN interfaces
     if not hasattr(self, 'vlans'):
-        show_vlans_output = self._send_command("show vlans")
-        self.vlans = _textfsm_extractor("procurve_show_vlans", show_vlans_output)
+        self.vlans = _procurve_parsed(self, "show vlans", "procurve_show_vlans")
     for vlan in self.vlans:
         vlan_interface = _vid_to_interface(self, vlan['vlan'])
 
@@ -222,7 +333,143 @@ def procurve_get_interfaces_vlans(self):
             'tagged-native-vlan': False,
         }
 
-    return result
+    return deadline_result(self, 'get_interfaces_vlans', result, missing)
+
+
+def procurve_get_interface_records(self, fields=None):
+    ''' procurve_get_interfaces as compact Interface records, use Interface.to_napalm_dict() for the dict view
+
+    Fields left out by a fields projection are None in the records, which are then a PartialResult missing
+    those fields, so diff.diff_records keeps what Nautobot holds for them.
+    '''
+    interfaces = procurve_get_interfaces(self, fields)
+    return keep_partial(interfaces, normalize_interfaces(interfaces, fields), projected_out(fields))
+
+
+def procurve_get_ip_records(self):
+    ''' procurve_get_interfaces_ip as compact IPAddress records '''
+    interfaces_ip = procurve_get_interfaces_ip(self)
+    return keep_partial(interfaces_ip, normalize_interfaces_ip(interfaces_ip))
+
+
+def procurve_get_vlan_records(self):
+    ''' procurve_get_vlans as compact Vlan records '''
+    vlans = procurve_get_vlans(self)
+    return keep_partial(vlans, normalize_vlans(vlans))
+
+
+# dot1qTpFdbStatus learned(3), anything else was configured or is the switch's own address
+FDB_STATUS_LEARNED = 3
+
+WALKMIB_LINE_REGEX = re.compile(r"^\w+\.([\d.]+) =\s?(.*)$", re.MULTILINE)
+HEX_OCTETS_REGEX = re.compile(r"^[0-9a-fA-F]{2}(?:[ :-][0-9a-fA-F]{2})*$")
+
+
+def procurve_get_mac_records(self):
+    ''' Yield a MacEntry for each entry of dot1qTpFdbTable
+
+    Tables are walked over SNMP when the driver has an SnmpClient as self.snmp, i.e.
+    driver.snmp = SnmpClient(driver.hostname, community), otherwise with walkMIB on the CLI.
+    '''
+    name_index = _procurve_name_index(self)
+    bridge_ports = {index[0]: if_index for index, (if_index, ) in _procurve_walk(self, ['dot1dBasePortIfIndex'])}
+    for index, (port, status) in _procurve_walk(self, ['dot1qTpFdbPort', 'dot1qTpFdbStatus']):
+        # Indexed by FDB ID and MAC, ProCurve uses a FDB per VLAN with the VLAN ID as its ID
+        yield MacEntry(
+            mac=normalize_mac(bytes(index[1:7])),
+            interface=name_index.by_if_index(str(bridge_ports.get(port, port))),
+            vlan=index[0],
+            static=status != FDB_STATUS_LEARNED,
+        )
+
+
+def procurve_get_arp_records(self):
+    ''' Yield an ArpEntry for each entry of ipNetToMediaTable, ages aren't available so are None '''
+    name_index = _procurve_name_index(self)
+    for index, (mac, _) in _procurve_walk(self, ['ipNetToMediaPhysAddress', 'ipNetToMediaType']):
+        yield ArpEntry(
+            interface=name_index.by_if_index(str(index[0])),
+            address='.'.join(str(octet) for octet in index[1:5]),
+            mac=normalize_mac(mac),
+            age=None,
+        )
+
+
+def procurve_get_lldp_records(self):
+    ''' Yield an LldpNeighbor for each entry of lldpRemTable '''
+    local_ports = {index[0]: _lldp_text(port_id) for index, (port_id, ) in _procurve_walk(self, ['lldpLocPortId'])}
+    columns = ['lldpRemChassisId', 'lldpRemPortId', 'lldpRemPortDesc', 'lldpRemSysName']
+    for index, (chassis_id, port_id, port_description, system_name) in _procurve_walk(self, columns):
+        # Indexed by time mark, local port number and remote index
+        yield LldpNeighbor(
+            local_interface=sys.intern(local_ports.get(index[1], str(index[1]))),
+            remote_chassis_id=_lldp_text(chassis_id),
+            remote_port=_lldp_text(port_id),
+            remote_port_description=_lldp_text(port_description),
+            remote_system_name=_lldp_text(system_name),
+        )
+
+
+def _procurve_walk(self, columns):
+    ''' Yield (index tuple, [value per column]) for the rows of MIB table columns
+
+    Over SNMP if the driver has a self.snmp SnmpClient, rows are then streamed a GETBULK response at a
+    time. Otherwise the columns are walked with walkMIB as one pipelined batch, values are then ints or
+    the text walkMIB shows. The CLI holds each column's whole output, as send_command returns it, but rows
+    are parsed and yielded a line at a time without building a table of them.
+    '''
+    snmp = getattr(self, 'snmp', None)
+    if snmp is not None:
+        for row in snmp.walk_columns(columns):
+            # A table cut short would read as entries that have gone, so stop once the deadline has run out
+            check_deadline(self)
+            yield row
+        return
+
+    _procurve_prefetch(self, [f"walkMIB {column}" for column in columns])
+    walks = [_walkMIB_rows(_procurve_command(self, f"walkMIB {column}")) for column in columns]
+    others = walks[1:]
+    pending = [next(walk, None) for walk in others]
+    for index, value in walks[0]:
+        values = [value]
+        for n, walk in enumerate(others):
+            # walkMIB goes through each column in index order, so rows the first column doesn't have are
+            # skipped by moving on until this column reaches the index
+            while pending[n] is not None and pending[n][0] < index:
+                pending[n] = next(walk, None)
+            values.append(pending[n][1] if pending[n] is not None and pending[n][0] == index else None)
+        yield index, [_walkMIB_value(value) for value in values]
+
+
+def _walkMIB_rows(output):
+    ''' Yield (index tuple, value text) for each line of walkMIB output '''
+    for match in WALKMIB_LINE_REGEX.finditer(output):
+        yield tuple(int(n) for n in match.group(1).split('.')), match.group(2)
+
+
+def _walkMIB_value(value):
+    ''' walkMIB text as the value SNMP would return, octet strings shown as hex become bytes '''
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    if HEX_OCTETS_REGEX.match(value) and len(value) > 2:
+        return bytes.fromhex(re.sub(r"[ :-]", "", value))
+    return value
+
+
+def _lldp_text(value):
+    ''' LLDP chassis and port IDs are MAC addresses or text, shown as text or colon separated hex '''
+    if value is None:
+        return ''
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return value
+    if len(value) == 6 and not all(32 <= octet < 127 for octet in value):
+        return normalize_mac(value)
+    return value.decode('utf-8', errors='replace')
 
 
 def _procurve_get_trunks(self):
@@ -234,8 +481,7 @@ def _procurve_get_trunks(self):
   }
   '''
     result = {}
-    show_trunks_output = self._send_command("show trunks")
-    trunks = _textfsm_extractor("procurve_show_trunks", show_trunks_output)
+    trunks = _procurve_parsed(self, "show trunks", "procurve_show_trunks")
     for port in trunks:
         trunk_name = port['group']
         if trunk_name not in result.keys():
@@ -245,34 +491,175 @@ def _procurve_get_trunks(self):
     return result
 
 
+def hold_prefetched(self, outputs, ttl=PREFETCH_TTL):
+    ''' Hold {command: output} on the driver for the helpers to use in place of running the commands
+
+    Each output is used once, and only within ttl seconds.
+    '''
+    if not hasattr(self, 'prefetched'):
+        self.prefetched = {}
+    expires = time.monotonic() + ttl
+    for command, output in outputs.items():
+        self.prefetched[command] = (output, expires)
+
+
+def has_prefetched(self, command):
+    ''' whether output for command is held on the driver and hasn't expired '''
+    output, expires = getattr(self, 'prefetched', {}).get(command, (None, 0))
+    return output is not None and expires > time.monotonic()
+
+
+def _procurve_prefetch(self, commands):
+    ''' Run the commands a getter is going to need as one pipelined batch
+
+    Outputs are held on the driver until they are consumed by _procurve_command, or the getter returns.
+    '''
+    commands = [command for command in commands if not has_prefetched(self, command)]
+    hold_prefetched(self, procurve_send_commands(self, commands))
+    scope = getattr(self, 'prefetch_scope', None)
+    if scope is not None:
+        scope.update(commands)
+
+
+def hold_parsed(self, parsed, ttl=PREFETCH_TTL):
+    ''' Hold {command: parsed output} on the driver, i.e. parsed ahead by pipeline.procurve_get_many
+
+    Like prefetched outputs, each is used once and only within ttl seconds.
+    '''
+    if not hasattr(self, 'preparsed'):
+        self.preparsed = {}
+    expires = time.monotonic() + ttl
+    for command, rows in parsed.items():
+        self.preparsed[command] = (rows, expires)
+
+
+def _procurve_parsed(self, command, template):
+    ''' Return output of command parsed with template, using output held by hold_parsed if there is any '''
+    rows, expires = getattr(self, 'preparsed', {}).pop(command, (None, 0))
+    if rows is not None and expires > time.monotonic():
+        # The raw output is held too, so the getter doesn't run the command again
+        getattr(self, 'prefetched', {}).pop(command, None)
+        return rows
+    return _textfsm_extractor(template, _procurve_command(self, command))
+
+
+def _procurve_command(self, command):
+    ''' Return prefetched output for command, or run it if it wasn't prefetched '''
+    output, expires = getattr(self, 'prefetched', {}).pop(command, (None, 0))
+    if output is not None and expires > time.monotonic():
+        return output
+    return self._send_command(command)
+
+
+def _procurve_cached_commands(self, vlans=True):
+    ''' Commands for data that is cached on the driver, only needed if it hasn't been collected yet '''
+    commands = []
+    if not hasattr(self, 'capability_key'):
+        commands.append("getMIB sysDescr.0")
+    if not self.interface_map:
+        commands.append("walkMIB ifName")
+    if not vlans:
+        return commands
+    if not hasattr(self, 'vlans'):
+        commands.append("show vlans")
+    if not hasattr(self, 'vlan_map'):
+        commands.append("walkMIB dot1qVlanStaticName")
+    return commands
+
+
+def _procurve_capability_key(self):
+    ''' Capability registry key from sysDescr, i.e. "HP J9728A 2920-48G Switch, revision WB.16.10.0012, ..."
+
+    The key last seen for the device is used until sysDescr has been collected with a prefetched batch.
+    '''
+    if hasattr(self, 'capability_key'):
+        return self.capability_key
+    if not has_prefetched(self, "getMIB sysDescr.0"):
+        return REGISTRY.device_key(self.hostname)
+
+    self.capability_key = None
+    sysdescr = _procurve_command(self, "getMIB sysDescr.0")
+    match = re.search(r"= (.*?), revision (\S+?),", sysdescr)
+    if match:
+        self.capability_key = platform_key(match.group(1), match.group(2))
+        REGISTRY.remember_device(self.hostname, self.capability_key)
+    return self.capability_key
+
+
+def _walkMIB_values(self, oid):
+    ''' Same as ProcurveDriver._walkMIB_values, but able to use prefetched output '''
+    output = _procurve_command(self, f"walkMIB {oid}")
+
+    # Check if system supports the command
+    if "Cannot translate" in output:
+        return {}
+
+    mibs = {}
+    for mib in output.splitlines():
+        m = re.search(r"^.*\.(\d+) =(.*)$", mib)
+        if m is None:
+            continue
+        mibs[m.group(1).strip()] = m.group(2).strip()
+
+    return mibs
+
+
+def _get_interface_map(self):
+    ''' Same as ProcurveDriver._get_interface_map, but able to use prefetched output '''
+    if not self.interface_map:
+        self.interface_map = {v: k for k, v in _walkMIB_values(self, "ifName").items()}
+    return self.interface_map
+
+
+def _procurve_name_index(self):
+    ''' InterfaceNameIndex of the device ifName map, rebuilt only if the map is '''
+    ifs = _get_interface_map(self)
+    if getattr(self, 'name_index', None) is None or self.name_index_source is not ifs:
+        self.name_index = InterfaceNameIndex.from_if_names('procurve', ifs)
+        self.name_index_source = ifs
+    return self.name_index
+
+
 def _textfsm_extractor(template, raw_text):
-    ''' Apply textfsm templates on raw_text'''
+    ''' Apply textfsm templates on raw_text, using the equivalent fast parser if there is one'''
+    if template in FAST_PARSERS and not fast_parser_verify():
+        return FAST_PARSERS[template](raw_text)
+
     textfsm_data = list()
     current_dir = os.path.dirname(os.path.abspath(__file__))
     template_path = f"{current_dir}/../textfsm_templates/{template}.tpl"
 
-    with open(template_path) as f:
-        fsm_handler = textfsm.TextFSM(f)
-        for obj in fsm_handler.ParseText(raw_text):
-            entry = {}
-            for index, entry_value in enumerate(obj):
-                entry[fsm_handler.header[index].lower()] = entry_value
-            textfsm_data.append(entry)
+    # Compiled templates are kept per thread, a TextFSM holds its parse state
+    fsm_handler = LOCAL_CACHE.namespace('textfsm').get_or_compute(f"{template_path}:{threading.get_ident()}",
+                                                                  lambda: _compile_textfsm(template_path))
+    fsm_handler.Reset()
+    for obj in fsm_handler.ParseText(raw_text):
+        entry = {}
+        for index, entry_value in enumerate(obj):
+            entry[fsm_handler.header[index].lower()] = entry_value
+        textfsm_data.append(entry)
+
+    if template in FAST_PARSERS:
+        verify_fast_parser(template, raw_text, textfsm_data)
+    return textfsm_data
 
-        return textfsm_data
+
+def _compile_textfsm(template_path):
+    with open(template_path) as f:
+        return textfsm.TextFSM(f)
 
 
 def _vid_to_interface(self, vid):
     ''' VLAN interfaces names from dot1qVlanStaticName or VLANXXXX convention'''
-    ifs = self._get_interface_map()
+    name_index = _procurve_name_index(self)
     if not hasattr(self, 'vlan_map'):
-        self.vlan_map = self._walkMIB_values("dot1qVlanStaticName")
+        self.vlan_map = _walkMIB_values(self, "dot1qVlanStaticName")
 
     # VLAN Interface names are sometimes the description of the VLAN, and sometimes just VLANXXXX
     # Try to determine the correct interface name
     vlan_name = self.vlan_map[str(vid)]
-    if vlan_name in ifs.keys():
-        return vlan_name
+    if vlan_name in name_index:
+        return name_index.normalized(vlan_name)
 
     if int(vid) == 1:
         return 'DEFAULT_VLAN'
@@ -0,0 +1,211 @@
+import re
+import socket
+import threading
+import uuid
+from collections import OrderedDict
+
+from netmiko import ConnectHandler
+from netmiko.exceptions import ReadTimeout
+from napalm.base.exceptions import ConnectionClosedException
+
+from sohonet_nsot_helpers.napalm.deadlines import command_timeout
+
+# Seconds to read a single command's output for, netmiko's default, less if a deadline is closer
+READ_TIMEOUT = 10.0
+
+
+class ProcurveSessionPool:
+    ''' Bounded pool of authenticated ProCurve SSH sessions keyed by host
+
+    Sessions are checked out exclusively by one driver at a time and returned to the pool on close, so
+    a sync job that connects to the same switch several times only pays for login, enable, and paging
+    setup once. Once more than max_sessions idle sessions are held the least recently used one is
+    disconnected.
+    '''
+
+    def __init__(self, max_sessions=32):
+        self.max_sessions = max_sessions
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, driver):
+        ''' return a (connection, prompt) tuple for the driver's host, reusing an idle session if possible '''
+        key = _session_key(driver)
+        with self._lock:
+            session = self._idle.pop(key, None)
+
+        if session is not None:
+            connection, prompt = session
+            if connection.is_alive():
+                return connection, prompt
+            _disconnect(connection)
+
+        device_type = "hp_procurve_telnet" if driver.transport == "telnet" else "hp_procurve_ssh"
+        connection = ConnectHandler(device_type=device_type,
+                                    host=driver.hostname,
+                                    username=driver.username,
+                                    password=driver.password,
+                                    **driver.netmiko_optional_args)
+        # netmiko's session_preparation has already disabled paging, only enable mode is left to do
+        connection.enable()
+        prompt = connection.find_prompt()
+        return connection, prompt
+
+    def release(self, driver, connection, prompt):
+        ''' return a session to the pool, evicting the least recently used idle session if full '''
+        key = _session_key(driver)
+        evicted = []
+        with self._lock:
+            previous = self._idle.pop(key, None)
+            if previous is not None:
+                evicted.append(previous[0])
+            self._idle[key] = (connection, prompt)
+            while len(self._idle) > self.max_sessions:
+                evicted.append(self._idle.popitem(last=False)[1][0])
+
+        for stale in evicted:
+            _disconnect(stale)
+
+    def discard(self, connection):
+        ''' disconnect a session that should not be reused '''
+        _disconnect(connection)
+
+    def close_all(self):
+        ''' disconnect all idle sessions '''
+        with self._lock:
+            sessions = list(self._idle.values())
+            self._idle.clear()
+
+        for connection, _ in sessions:
+            _disconnect(connection)
+
+
+SESSION_POOL = ProcurveSessionPool()
+
+
+def procurve_open(self):
+    ''' Monkeypatch for ProcurveDriver.open to borrow a session from SESSION_POOL '''
+    self.device, self.prompt = SESSION_POOL.acquire(self)
+
+
+def procurve_close(self):
+    ''' Monkeypatch for ProcurveDriver.close to hand the session back to SESSION_POOL '''
+    if self.device is None:
+        return
+    if getattr(self, 'prompt', None):
+        SESSION_POOL.release(self, self.device, self.prompt)
+    else:
+        SESSION_POOL.discard(self.device)
+    self.device = None
+
+
+def procurve_send_command(self, command):
+    ''' Monkeypatch for ProcurveDriver._send_command
+
+    Reads up to the cached exact prompt instead of letting netmiko rediscover the prompt with a
+    delay-based read on every command. If command is a list, commands are tried in turn until one is
+    valid.
+    '''
+    try:
+        if isinstance(command, list):
+            for cmd in command:
+                output = _send_command_to_prompt(self, cmd)
+                if "Invalid input: " not in output:
+                    break
+        else:
+            output = _send_command_to_prompt(self, command)
+        return output
+    except ReadTimeout:
+        # The output may still arrive, and would be read as the next command's
+        _drop_session(self)
+        raise
+    except (socket.error, EOFError) as e:
+        _drop_session(self)
+        raise ConnectionClosedException(str(e))
+
+
+def _drop_session(self):
+    ''' Don't hand a broken or dirty session back to the pool, or keep using it, open() connects again '''
+    SESSION_POOL.discard(self.device)
+    self.device = None
+    self.prompt = None
+
+
+def procurve_send_commands(self, commands, read_timeout=60):
+    ''' Run a batch of commands with a single channel write and return a dict of command: output
+
+    Each command is followed by a sentinel line that the CLI rejects as invalid input. The combined
+    output is read in one go up to the last sentinel and then split back into per command results.
+    read_timeout is cut down to what is left of the driver's deadline. If the batch can't be read back in
+    time the session is dropped, as its output may still arrive, and ReadTimeout is raised.
+    '''
+    commands = list(dict.fromkeys(commands))
+    if not commands:
+        return {}
+    if len(commands) == 1:
+        return {commands[0]: self._send_command(commands[0])}
+
+    if not getattr(self, 'prompt', None):
+        self.prompt = self.device.find_prompt()
+
+    token = uuid.uuid4().hex[:12]
+    sentinels = [f"sohonet-pipeline-{token}-{i}" for i in range(len(commands))]
+    newline = self.device.RETURN
+    self.device.write_channel("".join(f"{command}{newline}{sentinel}{newline}"
+                                      for command, sentinel in zip(commands, sentinels)))
+    try:
+        output = self.device.read_until_pattern(
+            pattern=rf"Invalid input: {re.escape(sentinels[-1])}.*?{re.escape(self.prompt)}",
+            read_timeout=command_timeout(self, read_timeout),
+            re_flags=re.DOTALL,
+        )
+    except ReadTimeout:
+        _drop_session(self)
+        raise
+
+    return dict(zip(commands, _split_pipelined_output(output, commands, sentinels, self.prompt)))
+
+
+def _split_pipelined_output(output, commands, sentinels, prompt):
+    ''' split the output of a pipelined batch into the output of each command '''
+    results = []
+    position = 0
+    for command, sentinel in zip(commands, sentinels):
+        echo = output.index(sentinel, position)
+        segment = output[position:output.rfind("\n", position, echo) + 1]
+        # Skip past the sentinel echo and the invalid input error for it
+        rejected = output.index(sentinel, echo + len(sentinel))
+        position = output.find("\n", rejected)
+        position = len(output) if position == -1 else position + 1
+
+        lines = segment.splitlines()
+        # Strip the command echo and the trailing prompt, as netmiko's send_command would
+        for index, line in enumerate(lines):
+            if command in line:
+                lines = lines[index + 1:]
+                break
+        while lines and (not lines[-1].strip() or lines[-1].strip() == prompt):
+            lines.pop()
+        results.append("\n".join(lines))
+
+    return results
+
+
+def _send_command_to_prompt(self, command):
+    prompt = getattr(self, 'prompt', None)
+    read_timeout = command_timeout(self, READ_TIMEOUT)
+    if not prompt:
+        return self.device.send_command(command, read_timeout=read_timeout)
+    return self.device.send_command(command, expect_string=re.escape(prompt), auto_find_prompt=False,
+                                    read_timeout=read_timeout)
+
+
+def _session_key(driver):
+    return (driver.hostname, driver.port, driver.username, driver.transport)
+
+
+def _disconnect(connection):
+    try:
+        connection.disconnect()
+    except (socket.error, EOFError, OSError):
+        pass
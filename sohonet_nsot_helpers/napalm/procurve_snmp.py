@@ -0,0 +1,117 @@
+''' Collect the MIB data of the procurve_get_* helpers over SNMP, for many switches on one event loop
+
+The helpers read ifName, ifAlias, dot1qVlanStaticName and the like with walkMIB on the CLI, one table
+after another. procurve_snmp_prefetch walks the same tables with an SnmpEngine, all columns in
+parallel, and leaves the results on the driver formatted as walkMIB would have shown them, so the
+helpers use them in place of running the commands:
+
+    procurve_snmp_prefetch_fleet(drivers, ['procurve_get_interfaces', 'procurve_get_vlans'])
+    for driver in drivers:
+        procurve_get_interfaces(driver)
+
+SNMP is sent to driver.snmp.host and port if the driver has an SnmpClient as driver.snmp, otherwise to
+driver.hostname on the engine port.
+'''
+import asyncio
+
+from sohonet_nsot_helpers.napalm.procurve_helpers import PREFETCH_TTL, has_prefetched, hold_prefetched
+from sohonet_nsot_helpers.snmp import HEX_OBJECTS, SnmpError, display_value, format_oid, parse_oid
+from sohonet_nsot_helpers.snmp_engine import SnmpEngine
+
+# walkMIB and getMIB objects each helper reads, cached ones are skipped once they are on the driver
+PROCURVE_SNMP_OBJECTS = {
+    'procurve_get_interfaces': [
+        'getMIB sysDescr.0',
+        'walkMIB ifName',
+        'walkMIB ifAlias',
+        'walkMIB ifPhysAddress',
+        'walkMIB ifMtu',
+        'walkMIB ifAdminStatus',
+        'walkMIB ifOperStatus',
+        'walkMIB dot1qVlanStaticName',
+    ],
+    'procurve_get_interfaces_ip': ['getMIB sysDescr.0', 'walkMIB ifName', 'walkMIB ifAlias'],
+    'procurve_get_vlans': ['getMIB sysDescr.0', 'walkMIB ifName', 'walkMIB dot1qVlanStaticName'],
+    'procurve_get_interfaces_vlans': ['getMIB sysDescr.0', 'walkMIB ifName', 'walkMIB dot1qVlanStaticName'],
+}
+
+
+async def procurve_snmp_prefetch(engine, driver, getters, ttl=PREFETCH_TTL):
+    ''' walk the MIB objects getters need over SNMP and hold them on the driver for the helpers
+
+    Objects that fail over SNMP are left for the helpers to read with the CLI, as are any the getters
+    haven't used within ttl seconds.
+    '''
+    commands = _snmp_commands(driver, getters)
+    snmp = getattr(driver, 'snmp', None)
+    host, port = (snmp.host, snmp.port) if snmp is not None else (driver.hostname, engine.port)
+    community = snmp.community if snmp is not None else None
+
+    walks = [command.split()[1] for command in commands if command.startswith('walkMIB ')]
+    gets = [command.split()[1] for command in commands if command.startswith('getMIB ')]
+    results = await asyncio.gather(
+        engine.walk_columns(host, walks, port=port, community=community),
+        engine.get(host, gets, port=port, community=community) if gets else _no_values(),
+        return_exceptions=True,
+    )
+
+    prefetched = {}
+    if not isinstance(results[0], SnmpError):
+        for name, rows in results[0].items():
+            prefetched[f"walkMIB {name}"] = "\n".join(
+                f"{name}.{format_oid(index)} = {display_value(*value, hex_octets=name in HEX_OBJECTS)}"
+                for index, value in rows)
+    if not isinstance(results[1], SnmpError):
+        for name in gets:
+            tag, value = results[1].get(parse_oid(name), (None, None))
+            if tag is not None and value is not None:
+                hex_octets = name.partition('.')[0] in HEX_OBJECTS
+                prefetched[f"getMIB {name}"] = f"{name} = {display_value(tag, value, hex_octets)}"
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, SnmpError):
+            raise result
+
+    hold_prefetched(driver, prefetched, ttl)
+    return prefetched
+
+
+def procurve_snmp_prefetch_fleet(drivers, getters, engine=None, **engine_kwargs):
+    ''' procurve_snmp_prefetch for all drivers at once on a new event loop, with engine or an SnmpEngine
+    made from engine_kwargs, which is started and closed here. Returns {driver.hostname: error} for
+    drivers that couldn't be walked, their helpers fall back to the CLI.
+    '''
+
+    async def prefetch_all():
+        async with (engine or SnmpEngine(**engine_kwargs)) as snmp_engine:
+            results = await asyncio.gather(
+                *(procurve_snmp_prefetch(snmp_engine, driver, getters) for driver in drivers),
+                return_exceptions=True,
+            )
+        return {driver.hostname: result for driver, result in zip(drivers, results) if isinstance(result, Exception)}
+
+    return asyncio.run(prefetch_all())
+
+
+def procurve_prefetch_with_snmp(self, getters, engine=None, **engine_kwargs):
+    ''' procurve_snmp_prefetch for one driver, blocking '''
+    return procurve_snmp_prefetch_fleet([self], getters, engine, **engine_kwargs)
+
+
+def _snmp_commands(driver, getters):
+    commands = []
+    for getter in getters:
+        for command in PROCURVE_SNMP_OBJECTS.get(getter, []):
+            if command in commands or has_prefetched(driver, command):
+                continue
+            if command == 'getMIB sysDescr.0' and hasattr(driver, 'capability_key'):
+                continue
+            if command == 'walkMIB ifName' and driver.interface_map:
+                continue
+            if command == 'walkMIB dot1qVlanStaticName' and hasattr(driver, 'vlan_map'):
+                continue
+            commands.append(command)
+    return commands
+
+
+async def _no_values():
+    return {}
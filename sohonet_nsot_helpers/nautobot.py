@@ -1,4 +1,119 @@
+import hashlib
+import importlib.metadata
+import json
+import os
 import re
+import sqlite3
+import threading
+import time
+
+from sohonet_nsot_helpers.cache import LOCAL_CACHE
+from sohonet_nsot_helpers.secret_codec import canonicalize_type7_secrets
+
+
+class ComplianceCache:
+    """
+    Compliance results keyed on everything that decides them, so unchanged features aren't re-evaluated.
+
+    The key is the rule ID, a hash of the rule's pattern lists and ordering, the version of the compliance
+    method, and hashes of the filtered actual and intended config. Results are stored in a SQLite database
+    so they're shared between compliance job runs and workers, the path defaults to
+    $SOHONET_COMPLIANCE_CACHE or ~/.cache/sohonet_nsot_helpers/compliance.sqlite. Set it to ':memory:' to
+    keep results per process.
+
+    Results are used for max_age seconds, $SOHONET_COMPLIANCE_CACHE_TTL or 30 days, and every prune_every
+    results stored the cache is pruned of expired results and down to the max_entries newest.
+    """
+
+    def __init__(self, path=None, max_age=None, max_entries=100000, prune_every=1000):
+        self.path = path or os.environ.get(
+            'SOHONET_COMPLIANCE_CACHE',
+            os.path.join(os.path.expanduser('~'), '.cache', 'sohonet_nsot_helpers', 'compliance.sqlite'))
+        self.max_age = max_age if max_age is not None else float(
+            os.environ.get('SOHONET_COMPLIANCE_CACHE_TTL', 30 * 86400))
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stored = 0
+
+    @staticmethod
+    def key(rule_id, rule_settings, actual, intended, version=''):
+        """Cache key for a rule's result on the given filtered actual and intended config"""
+        settings = json.dumps(rule_settings, sort_keys=True, default=str)
+        return ":".join([str(rule_id), _text_hash(version)] +
+                        [_text_hash(text) for text in [settings, actual, intended]])
+
+    def get(self, key):
+        row = self._connection().execute("SELECT result FROM compliance WHERE key = ? AND updated >= ?",
+                                         (key, time.time() - self.max_age)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, result):
+        with self._connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO compliance (key, result, updated) VALUES (?, ?, ?)",
+                               (key, json.dumps(result), time.time()))
+        with self._lock:
+            self._stored += 1
+            prune = self._stored % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def prune(self, max_age=None):
+        """Remove results not stored within max_age seconds, and all but the max_entries newest"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._connection() as connection:
+            connection.execute("DELETE FROM compliance WHERE updated < ?", (time.time() - max_age, ))
+            connection.execute("DELETE FROM compliance WHERE key IN "
+                               "(SELECT key FROM compliance ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                               (self.max_entries, ))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM compliance").fetchone()[0]
+
+    def _connection(self):
+        # A connection can't be used across a fork, so each process opens its own
+        connection, pid = getattr(self._local, 'connection', (None, None))
+        if connection is None or pid != os.getpid():
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS compliance (key TEXT PRIMARY KEY, result TEXT, updated REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS compliance_updated ON compliance (updated)")
+            self._local.connection = (connection, os.getpid())
+        return connection
+
+
+def _text_hash(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+COMPLIANCE_CACHE = ComplianceCache()
+
+# Bump when sohonet_custom_compliance changes how results are worked out, so cached results aren't reused
+COMPLIANCE_VERSION = 2
+
+
+def _compliance_version(compliance_method):
+    """Version of the results of compliance_method, from the golden config release and the method's name"""
+    name = f"{compliance_method.__module__}.{compliance_method.__qualname__}"
+    return LOCAL_CACHE.namespace('compliance-version').get_or_compute(
+        name, lambda: f"{COMPLIANCE_VERSION}:{_package_version('nautobot-golden-config')}:{name}")
+
+
+def _package_version(package):
+    try:
+        return importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+
+def _compiled_patterns(patterns):
+    """Compiled regexes for a rule's pattern list, compiled once per process"""
+    patterns = tuple(patterns)
+    return LOCAL_CACHE.namespace('compliance-patterns').get_or_compute(
+        json.dumps(patterns), lambda: [re.compile(pattern) for pattern in patterns])
 
 
 def compliance_include(compliance_include_patterns, actual_config):
@@ -13,7 +128,7 @@ def compliance_include(compliance_include_patterns, actual_config):
         list: Lines from the actual configuration that match any of the include patterns.
     """
     included_lines = []
-    matchers = [re.compile(pattern) for pattern in compliance_include_patterns]
+    matchers = _compiled_patterns(compliance_include_patterns)
     for line in actual_config.splitlines():
         if any(matcher.search(line) for matcher in matchers):
             included_lines.append(line)
@@ -33,7 +148,7 @@ def compliance_exclude(compliance_exclude_patterns, actual_config):
         list: Lines from the actual configuration that do not match any of the exclude patterns.
     """
     included_lines = []
-    matchers = [re.compile(pattern) for pattern in compliance_exclude_patterns]
+    matchers = _compiled_patterns(compliance_exclude_patterns)
     for line in actual_config.splitlines():
         if not any(matcher.search(line) for matcher in matchers):
             included_lines.append(line)
@@ -90,7 +205,54 @@ def sohonet_custom_compliance(obj):
         obj.actual = "\n".join(included_lines_actual)
         obj.intended = "\n".join(included_lines_intended)
 
-    # Run compliance method with filtered actual configuration
+    # Reuse the stored result if neither side of this feature, nor the compliance method, has changed since it
+    # was evaluated
     compliance_method = FUNC_MAPPER["cli"]
-    compliance_details = compliance_method(obj)
+    cache_key = COMPLIANCE_CACHE.key(obj.rule.pk, {
+        'compliance_include': compliance_include_patterns,
+        'compliance_exclude': compliance_exclude_patterns,
+        'config_ordered': getattr(obj.rule, 'config_ordered', None),
+    }, obj.actual, obj.intended, _compliance_version(compliance_method))
+    compliance_details = COMPLIANCE_CACHE.get(cache_key)
+    if compliance_details is not None:
+        return compliance_details
+
+    # Type 7 secrets are salted by the device, compare them with a fixed salt but report the lines as they are
+    actual, intended = obj.actual, obj.intended
+    obj.actual = canonicalize_type7_secrets(actual)
+    obj.intended = canonicalize_type7_secrets(intended)
+
+    # Run compliance method with filtered actual configuration
+    try:
+        compliance_details = compliance_method(obj)
+    finally:
+        canonical_actual, canonical_intended = obj.actual, obj.intended
+        obj.actual, obj.intended = actual, intended
+    compliance_details['missing'] = _restore_lines(compliance_details.get('missing'),
+                                                   _original_lines(intended, canonical_intended))
+    compliance_details['extra'] = _restore_lines(compliance_details.get('extra'),
+                                                 _original_lines(actual, canonical_actual))
+    COMPLIANCE_CACHE.set(cache_key, compliance_details)
     return compliance_details
+
+
+def _original_lines(config, canonical_config):
+    """Lines canonicalize_type7_secrets changed, stripped, mapped back to the stripped lines of config"""
+    return {
+        canonical.strip(): line.strip()
+        for line, canonical in zip(config.splitlines(), canonical_config.splitlines())
+        if line != canonical
+    }
+
+
+def _restore_lines(lines, originals):
+    """Missing or extra lines of a compliance result with canonical lines put back as they were, indented the same"""
+    if not lines or not originals or not isinstance(lines, str):
+        return lines
+    restored = []
+    for line in lines.splitlines():
+        stripped = line.strip()
+        if stripped in originals:
+            line = line[:len(line) - len(line.lstrip())] + originals[stripped]
+        restored.append(line)
+    return "\n".join(restored)
@@ -0,0 +1,320 @@
+''' Canonical form for the eos_get_* and procurve_get_* getter results
+
+The getters return napalm style nested dicts which aren't consistent between vendors, VLAN IDs are
+strings on ProCurve and ints or strings on EOS, prefix lengths are sometimes strings, and
+procurve_get_interfaces_vlans mixes trunk_vlans/native_vlan with trunk-vlans/native-vlan keys. These
+functions turn each result into a dict of immutable records keyed by their natural key, with typed
+fields and sorted member lists, so two collections of the same state compare equal and hash the same.
+
+The records are tuples without a per instance __dict__, and interface names, type slugs, modes and VRF
+names are interned, so a whole fleet's worth can be held in memory for a sync far more cheaply than the
+getter dicts.
+
+A value the getter couldn't collect, because its deadline skipped the enrichment it comes from, is None
+in the record. The result is then a PartialResult, whose missing enrichments the functions here take
+into account, and sohonet_nsot_helpers.diff keeps what Nautobot holds for those values.
+'''
+import hashlib
+import json
+import sys
+from collections import namedtuple
+
+
+class Interface(
+        namedtuple('Interface', [
+            'name',
+            'is_up',
+            'is_enabled',
+            'description',
+            'speed',
+            'mtu',
+            'mac_address',
+            'type',
+            'mpls_enabled',
+            'children',
+        ])):
+    __slots__ = ()
+
+    def to_napalm_dict(self):
+        ''' napalm get_interfaces value for this interface, without fields that are None
+
+        last_flapped isn't kept so is always -1.0.
+        '''
+        interface = {
+            'is_up': self.is_up,
+            'is_enabled': self.is_enabled,
+            'description': self.description,
+            'last_flapped': -1.0,
+            'speed': self.speed,
+            'mtu': self.mtu,
+            'mac_address': self.mac_address,
+            'mpls_enabled': self.mpls_enabled,
+        }
+        interface = {field: value for field, value in interface.items() if value is not None}
+        if self.type:
+            interface['type'] = self.type
+        if self.children:
+            interface['children'] = list(self.children)
+        return interface
+
+
+# get_interfaces fields, for the getters' fields= projections
+INTERFACE_FIELDS = frozenset([
+    'is_up',
+    'is_enabled',
+    'description',
+    'last_flapped',
+    'speed',
+    'mtu',
+    'mac_address',
+    'type',
+    'mpls_enabled',
+    'children',
+])
+
+
+def interface_fields(fields):
+    ''' fields as a frozenset, all INTERFACE_FIELDS for None, raises ValueError for unknown fields '''
+    if fields is None:
+        return INTERFACE_FIELDS
+    fields = frozenset(fields)
+    unknown = fields - INTERFACE_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown interface fields {sorted(unknown)}, expected some of {sorted(INTERFACE_FIELDS)}")
+    return fields
+
+
+def projected_out(fields):
+    ''' Interface record fields a fields projection leaves out, sorted '''
+    return sorted(INTERFACE_FIELDS - interface_fields(fields) - {'last_flapped'})
+
+
+def project_interfaces(interfaces, fields):
+    ''' get_interfaces result with only fields kept for each interface '''
+    if fields == INTERFACE_FIELDS:
+        return interfaces
+    return {
+        name: {field: value for field, value in values.items() if field in fields}
+        for name, values in interfaces.items()
+    }
+
+
+class IPAddress(namedtuple('IPAddress', ['interface', 'address', 'prefix_length', 'family', 'vrf', 'interface_acl'])):
+    __slots__ = ()
+
+
+class Vlan(namedtuple('Vlan', ['vid', 'name', 'interfaces'])):
+    __slots__ = ()
+
+    def to_napalm_dict(self):
+        ''' napalm get_vlans value for this VLAN, without interfaces if they aren't known '''
+        vlan = {'name': self.name}
+        if self.interfaces is not None:
+            vlan['interfaces'] = list(self.interfaces)
+        return vlan
+
+
+class InterfaceVlans(
+        namedtuple('InterfaceVlans', [
+            'interface',
+            'mode',
+            'access_vlan',
+            'native_vlan',
+            'trunk_vlans',
+            'tagged_native_vlan',
+        ])):
+    __slots__ = ()
+
+    def to_napalm_dict(self):
+        ''' get_interfaces_vlans value for this interface, using -1 for no VLAN, without mode or trunk-vlans
+        if they aren't known '''
+        interface_vlans = {
+            'mode': self.mode,
+            'access-vlan': -1 if self.access_vlan is None else self.access_vlan,
+            'trunk-vlans': None if self.trunk_vlans is None else list(self.trunk_vlans),
+            'native-vlan': -1 if self.native_vlan is None else self.native_vlan,
+            'tagged-native-vlan': self.tagged_native_vlan,
+        }
+        return {field: value for field, value in interface_vlans.items() if value is not None}
+
+
+StaticRoute = namedtuple('StaticRoute', ['vrf', 'prefix', 'nexthop', 'name'])
+NetworkInstance = namedtuple('NetworkInstance', ['name', 'type', 'route_distinguisher', 'interfaces'])
+
+# Table entries, streamed by the eos_get_*_records and procurve_get_*_records table getters one at a time
+MacEntry = namedtuple('MacEntry', ['mac', 'interface', 'vlan', 'static'])
+ArpEntry = namedtuple('ArpEntry', ['interface', 'address', 'mac', 'age'])
+LldpNeighbor = namedtuple('LldpNeighbor', [
+    'local_interface',
+    'remote_chassis_id',
+    'remote_port',
+    'remote_port_description',
+    'remote_system_name',
+])
+
+
+def normalize_interfaces(interfaces, fields=None):
+    ''' get_interfaces result to {name: Interface}
+
+    last_flapped is left out, Nautobot doesn't store it and it changes on every flap. Fields not in
+    fields, i.e. left out of a projected result, are None rather than an empty value, as are values the
+    result doesn't have. type and children are only set where they apply, so are empty if missing, unless
+    the result is partial and missing them.
+    '''
+    fields = interface_fields(fields) - frozenset(getattr(interfaces, 'missing', ()))
+    normalized = {}
+    for name, values in interfaces.items():
+        values = {field: value for field, value in values.items() if field in fields}
+        normalized[sys.intern(name)] = Interface(
+            name=sys.intern(name),
+            is_up=_to_bool(values.get('is_up')),
+            is_enabled=_to_bool(values.get('is_enabled')),
+            description=values.get('description'),
+            speed=_to_int(values.get('speed')),
+            mtu=_to_int(values.get('mtu')),
+            mac_address=None if values.get('mac_address') is None else normalize_mac(values['mac_address']),
+            type=sys.intern(values.get('type') or '') if 'type' in fields else None,
+            mpls_enabled=_to_bool(values.get('mpls_enabled')),
+            children=tuple(sorted(sys.intern(str(child))
+                                  for child in values.get('children', []))) if 'children' in fields else None,
+        )
+    return normalized
+
+
+def normalize_interfaces_ip(interfaces_ip):
+    ''' get_interfaces_ip result to {(interface, address): IPAddress}, interface_acl is None if the result is
+    partial and missing the ACLs '''
+    acls = 'interfaceacl' not in getattr(interfaces_ip, 'missing', ())
+    addresses = {}
+    for interface, values in interfaces_ip.items():
+        interface = sys.intern(interface)
+        vrf = sys.intern(values.get('vrf') or '')
+        for family in [4, 6]:
+            for address, details in values.get(f"ipv{family}", {}).items():
+                addresses[(interface, address)] = IPAddress(
+                    interface=interface,
+                    address=address,
+                    prefix_length=_to_int(details.get('prefix_length')),
+                    family=family,
+                    vrf=vrf,
+                    interface_acl=(values.get('interfaceacl') or '') if acls else None,
+                )
+    return addresses
+
+
+def normalize_vlans(vlans):
+    ''' get_vlans result to {vid: Vlan}, interfaces is None for VLANs whose interfaces were left out '''
+    return {
+        int(vid): Vlan(
+            vid=int(vid),
+            name=values.get('name') or '',
+            interfaces=tuple(sorted({sys.intern(interface)
+                                     for interface in values['interfaces']})) if 'interfaces' in values else None,
+        )
+        for vid, values in vlans.items()
+    }
+
+
+def normalize_interfaces_vlans(interfaces_vlans):
+    ''' get_interfaces_vlans result to {interface: InterfaceVlans}
+
+    Accepts both the trunk-vlans and trunk_vlans spellings, -1 for no VLAN becomes None. mode and
+    trunk_vlans are None for interfaces they were left out for.
+    '''
+    result = {}
+    for interface, values in interfaces_vlans.items():
+        interface = sys.intern(interface)
+        trunk_vlans = values.get('trunk-vlans', values.get('trunk_vlans'))
+        result[interface] = InterfaceVlans(
+            interface=interface,
+            mode=sys.intern(values['mode']) if 'mode' in values else None,
+            access_vlan=_to_vid(values.get('access-vlan', values.get('access_vlan'))),
+            native_vlan=_to_vid(values.get('native-vlan', values.get('native_vlan'))),
+            trunk_vlans=None if trunk_vlans is None else tuple(
+                sorted({vid for vid in (_to_vid(v) for v in trunk_vlans) if vid is not None})),
+            tagged_native_vlan=bool(values.get('tagged-native-vlan', values.get('tagged_native_vlan'))),
+        )
+    return result
+
+
+def normalize_static_routes(routes):
+    ''' get_static_routes result to {(vrf, prefix, nexthop): StaticRoute} '''
+    return {
+        (route['vrf'] or '', route['prefix'], route['nexthop']): StaticRoute(
+            vrf=route['vrf'] or '',
+            prefix=route['prefix'],
+            nexthop=route['nexthop'],
+            name=route['name'] or '',
+        )
+        for route in routes
+    }
+
+
+def normalize_network_instances(instances):
+    ''' get_network_instances result to {name: NetworkInstance} '''
+    return {
+        name: NetworkInstance(
+            name=name,
+            type=values.get('type', ''),
+            route_distinguisher=values.get('state', {}).get('route_distinguisher') or '',
+            interfaces=tuple(sorted(values.get('interfaces', {}).get('interface', {}).keys())),
+        )
+        for name, values in instances.items()
+    }
+
+
+def to_napalm_interfaces_ip(addresses):
+    ''' {(interface, address): IPAddress} back to a napalm get_interfaces_ip dict '''
+    interfaces_ip = {}
+    for record in addresses.values():
+        interface = interfaces_ip.setdefault(record.interface, {'ipv4': {}, 'ipv6': {}})
+        interface[f"ipv{record.family}"][record.address] = {'prefix_length': record.prefix_length}
+        if record.vrf:
+            interface['vrf'] = record.vrf
+        if record.interface_acl:
+            interface['interfaceacl'] = record.interface_acl
+    return interfaces_ip
+
+
+def record_hash(record):
+    ''' Stable content hash of a record, the same across processes and runs '''
+    canonical = json.dumps([type(record).__name__, list(record)], separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def content_hash(records):
+    ''' Stable content hash of a dict of records, i.e. the normalized result of one getter '''
+    digest = hashlib.blake2b(digest_size=16)
+    for record_digest in sorted(record_hash(record) for record in records.values()):
+        digest.update(record_digest.encode())
+    return digest.hexdigest()
+
+
+def normalize_mac(mac):
+    ''' MAC address as lower case colon separated hex, from bytes or any of the usual text forms
+
+    i.e. octets from SNMP, '001c.7300.0001', '00-1C-73-00-00-01' or '00 1c 73 00 00 01'
+    '''
+    if isinstance(mac, (bytes, bytearray)):
+        return mac.hex(':')
+    digits = mac.replace(':', '').replace('.', '').replace('-', '').replace(' ', '').lower()
+    return ':'.join(digits[i:i + 2] for i in range(0, len(digits), 2))
+
+
+def _to_bool(value):
+    if value is None:
+        return None
+    return bool(value)
+
+
+def _to_int(value):
+    if value is None or value == '':
+        return None
+    return int(str(value).replace(',', ''))
+
+
+def _to_vid(value):
+    ''' VLAN ID as an int, None for the -1/No placeholders used for no VLAN '''
+    if value is None or not str(value).isdigit():
+        return None
+    return int(value)
@@ -0,0 +1,184 @@
+''' Overlap device I/O with parsing across a fleet
+
+Collectors run in threads and only talk to devices, handing raw outputs to a process pool for parsing,
+so sockets aren't left idle while a getter holds the GIL parsing the previous device's output.
+
+    def collect(device):
+        return device.run_commands(['show running-config | section ip route'], encoding='text')[0]['output']
+
+    for device, routes, error in collect_and_parse(devices, collect, parse_textfsm_output,
+                                                   parse_args=('eos_show_running_config_static_route',)):
+        ...
+
+The ProCurve getters that parse several commands run through it with procurve_get_many, which collects
+the templated commands of each switch as one batch, parses them in the process pool and then runs the
+getter on the held results, leaving it only the commands that depend on them:
+
+    for driver, vlans, error in procurve_get_many(drivers, 'procurve_get_vlans'):
+        ...
+
+Parse workers are started from a fork server, or spawned, rather than forked from a process running
+collector threads, so scripts using the pipeline need the usual if __name__ == '__main__': guard.
+'''
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from sohonet_nsot_helpers.napalm import procurve_helpers
+from sohonet_nsot_helpers.napalm.eos_helpers import _textfsm_extractor
+from sohonet_nsot_helpers.napalm.procurve_sessions import procurve_send_commands
+
+_DONE = object()
+
+# Collectors are threads, and a worker forked while one of them holds a lock would start with it held, so
+# parse workers are started from a fork server, or spawned where there isn't one
+PARSE_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Templates of the commands the ProCurve getters parse, and which of them each getter needs up front
+PROCURVE_TEMPLATES = {
+    "show vlans": "procurve_show_vlans",
+    "show interfaces status": "procurve_show_interfaces_status",
+    "show trunks": "procurve_show_trunks",
+}
+PROCURVE_GETTER_COMMANDS = {
+    'procurve_get_interfaces': ["show vlans", "show trunks"],
+    'procurve_get_vlans': ["show vlans", "show interfaces status", "show trunks"],
+    'procurve_get_interfaces_vlans': ["show vlans", "show interfaces status", "show trunks"],
+}
+
+
+def parse_textfsm_output(template, raw_text):
+    ''' Parse stage for raw text outputs using the package TextFSM templates or their fast parsers '''
+    return _textfsm_extractor(template, raw_text)
+
+
+def collect_and_parse(devices, collect, parse, parse_args=(), collectors=8, parsers=None, max_pending=32,
+                      finish=None):
+    ''' Yield (device, parsed result, error) for each device in the order devices were given
+
+    collect(device) runs in one of the collector threads and returns the raw output for a device.
+    parse(*parse_args, raw_output) runs in a process pool, so it has to be a picklable module level
+    function. If given, finish(device, parsed) then runs in a collector thread and its return value is
+    yielded instead of the parsed result. At most max_pending devices are held between being collected
+    and being yielded; collectors block once that many are outstanding, so a slow parse or finish stage
+    slows collection down rather than letting results pile up in memory.
+
+    If collect, parse or finish raises for a device, the exception is yielded as error alongside a None
+    result and the remaining devices carry on.
+    '''
+    devices = list(devices)
+    pending = threading.BoundedSemaphore(max_pending)
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def collect_device(position, device, collect_pool, parse_pool):
+        if stop.is_set():
+            return
+        try:
+            raw_output = collect(device)
+            future = parse_pool.submit(parse, *parse_args, raw_output)
+        except Exception as e:
+            results.put((position, device, None, e))
+            return
+        future.add_done_callback(lambda f: parsed(position, device, f, collect_pool))
+
+    def parsed(position, device, future, collect_pool):
+        error = future.exception()
+        if error is not None or finish is None:
+            results.put((position, device, None if error else future.result(), error))
+            return
+        try:
+            collect_pool.submit(finish_device, position, device, future.result())
+        except RuntimeError:
+            # The pool has shut down because the caller stopped, nothing is waiting for the result
+            pass
+
+    def finish_device(position, device, parsed_result):
+        try:
+            results.put((position, device, finish(device, parsed_result), None))
+        except Exception as e:
+            results.put((position, device, None, e))
+
+    def feed(collect_pool, parse_pool):
+        # Slots are taken in device order, so the next result to be yielded always has one
+        for position, device in enumerate(devices):
+            pending.acquire()
+            if stop.is_set():
+                return
+            collect_pool.submit(collect_device, position, device, collect_pool, parse_pool)
+
+    with ProcessPoolExecutor(max_workers=parsers, mp_context=PARSE_CONTEXT) as parse_pool, \
+            ThreadPoolExecutor(max_workers=collectors) as collect_pool:
+        feeder = threading.Thread(target=feed, args=(collect_pool, parse_pool), daemon=True)
+        feeder.start()
+
+        # Hold results that finish early until every device before them has been yielded
+        finished = {}
+        try:
+            for position in range(len(devices)):
+                while position not in finished:
+                    done_position, device, result, error = results.get()
+                    finished[done_position] = (device, result, error)
+                device, result, error = finished.pop(position)
+                pending.release()
+                yield device, result, error
+        finally:
+            stop.set()
+            # Unblock the feeder if it is waiting for a slot
+            try:
+                pending.release()
+            except ValueError:
+                pass
+            feeder.join()
+
+
+def parse_procurve_outputs(outputs):
+    ''' Parse stage for {command: raw output} of the commands in PROCURVE_TEMPLATES '''
+    return {
+        command: procurve_helpers._textfsm_extractor(PROCURVE_TEMPLATES[command], output)
+        for command, output in outputs.items()
+    }
+
+
+def procurve_get_many(drivers, getter, collectors=8, parsers=None, max_pending=32):
+    ''' Yield (driver, result, error) of the procurve_helpers getter for each driver, in the order drivers were
+    given
+
+    The commands in PROCURVE_GETTER_COMMANDS[getter] are collected with the driver's cached commands as one
+    batch and parsed in the process pool. The getter then runs in one of the collector threads, on the
+    outputs held with hold_prefetched and hold_parsed, while the next drivers are still being collected.
+    Drivers waiting for their getter count towards max_pending. If a driver's batch, parse or getter
+    raises, the exception is yielded as its error and the remaining drivers carry on.
+    '''
+    getter_function = getattr(procurve_helpers, getter)
+    commands = PROCURVE_GETTER_COMMANDS.get(getter, [])
+    held = {}
+
+    def collect(driver):
+        batch = [command for command in commands if command != "show vlans" or not hasattr(driver, 'vlans')]
+        outputs = procurve_send_commands(driver, batch + procurve_helpers._procurve_cached_commands(driver))
+        procurve_helpers.hold_prefetched(driver, outputs)
+        held[id(driver)] = list(outputs)
+        return {command: outputs[command] for command in batch}
+
+    def finish(driver, parsed):
+        procurve_helpers.hold_parsed(driver, parsed)
+        try:
+            return getter_function(driver)
+        finally:
+            drop_held(driver)
+
+    def drop_held(driver):
+        # Don't leave outputs the getter didn't use on the driver
+        for command in held.pop(id(driver), []):
+            getattr(driver, 'prefetched', {}).pop(command, None)
+            getattr(driver, 'preparsed', {}).pop(command, None)
+
+    for driver, result, error in collect_and_parse(drivers, collect, parse_procurve_outputs, collectors=collectors,
+                                                   parsers=parsers, max_pending=max_pending, finish=finish):
+        if error is not None:
+            # The getter never ran if collecting or parsing failed
+            drop_held(driver)
+        yield driver, result, error
@@ -0,0 +1,136 @@
+''' Compress and expand interface lists to and from the range syntax used in vendor config
+
+    VENDOR      NAMES                                       CONFIG
+
+    mrv         1, 2, 3, 5                              <-> 1-3,5
+    netiron     ethernet 1/1 ... ethernet 1/24          <-> ethernet 1/1 to 1/24
+    arista      Ethernet1 ... Ethernet48, Ethernet50/1  <-> Ethernet1-48,Ethernet50/1
+
+Names are parsed once into a prefix and a tuple of chassis/slot/port numbers and memoized, ranges are
+built over the last number of names that share everything before it.
+'''
+import re
+from functools import lru_cache
+from itertools import groupby
+
+RANGE_SEPARATORS = {
+    'mrv': '-',
+    'netiron': ' to ',
+    'arista': '-',
+}
+
+
+@lru_cache(maxsize=65536)
+def parse_port(name):
+    ''' split an interface name into (prefix, numbers), i.e. 'Ethernet1/24' -> ('Ethernet', (1, 24))
+
+    Returns None for names that don't end in a number.
+    '''
+    match = re.match(r'^(.*?)(\d+(?:/\d+)*)$', name)
+    if not match:
+        return None
+    return match.group(1), tuple(int(n) for n in match.group(2).split('/'))
+
+
+def compress(numbers, min_grouping_size=2):
+    ''' sorted, de-duplicated (start, end) intervals, runs shorter than min_grouping_size are left as singles '''
+    intervals = []
+    for _, run in groupby(enumerate(sorted(set(numbers))), lambda item: item[1] - item[0]):
+        run = [number for _, number in run]
+        if len(run) >= min_grouping_size:
+            intervals.append((run[0], run[-1]))
+        else:
+            intervals.extend((number, number) for number in run)
+    return intervals
+
+
+def intervals_to_config(intervals, separator='-'):
+    ''' i.e. [(1, 13), (15, 16)] -> 1-13,15-16 '''
+    return ",".join(str(start) if start == end else f"{start}{separator}{end}" for start, end in intervals)
+
+
+def first_config_line(config, first_line_len=48):
+    ''' first line of config when split into lines at commas, as netutils vlanlist_to_config does
+
+    Raises ValueError if there is no comma to split config at within first_line_len characters.
+    '''
+    if len(config) <= first_line_len:
+        return config
+    match = re.match(f"^.{{0,{first_line_len}}}(?=,)", config)
+    if not match:
+        raise ValueError(f"No comma within the first {first_line_len} characters of {config!r} to split it at")
+    return match.group(0)
+
+
+def compress_interfaces(names, vendor, min_grouping_size=2):
+    ''' interface names to a range config string for vendor, names that don't end in a number are dropped '''
+    separator = RANGE_SEPARATORS[vendor]
+    groups = {}
+    for name in names:
+        parsed = parse_port(name)
+        if parsed:
+            prefix, numbers = parsed
+            groups.setdefault((prefix, numbers[:-1]), set()).add(numbers[-1])
+
+    parts = []
+    for (prefix, head), last_numbers in sorted(groups.items()):
+        head = "".join(f"{n}/" for n in head)
+        for start, end in compress(last_numbers, min_grouping_size):
+            if start == end:
+                parts.append(f"{prefix}{head}{start}")
+            elif vendor == 'netiron':
+                parts.append(f"{prefix}{head}{start}{separator}{head}{end}")
+            else:
+                parts.append(f"{prefix}{head}{start}{separator}{end}")
+
+    joiner = " " if vendor == 'netiron' else ","
+    return joiner.join(parts)
+
+
+def compress_interfaces_batch(name_lists, vendor, min_grouping_size=2):
+    ''' compress_interfaces for many interface lists, i.e. one per template render, sharing parsed names '''
+    return [compress_interfaces(names, vendor, min_grouping_size) for names in name_lists]
+
+
+def expand_interfaces(config, vendor):
+    ''' range config string for vendor back to a list of interface names
+
+    Raises ValueError naming the part of config that isn't an interface or range of interfaces.
+    '''
+    if vendor == 'netiron':
+        # ethernet 1/1 to 1/4 ethernet 2/1, also accepting ethernet 1/1-1/4
+        item_regex = r'(\D+?)\s*(\d+(?:/\d+)*)(?:\s*(?:to|-)\s*(\d+(?:/\d+)*))?(?=\s|$)'
+        unparsed = re.sub(item_regex, "", config).strip()
+        if unparsed:
+            raise ValueError(f"Invalid {vendor} interface range {unparsed!r} in {config!r}")
+        items = re.findall(item_regex, config)
+        joiner = " "
+    else:
+        items = []
+        for item in [item.strip() for item in config.split(",") if item.strip()]:
+            match = re.match(r'^(\D*)(\d+(?:/\d+)*)(?:-(\d+(?:/\d+)*))?$', item)
+            if not match:
+                raise ValueError(f"Invalid {vendor} interface range {item!r} in {config!r}")
+            items.append(match.groups())
+        joiner = ""
+
+    names = []
+    prefix = ''
+    for item_prefix, start, end in items:
+        # Arista and MRV allow the prefix to be left off following items, i.e. Ethernet1-4,6
+        prefix = item_prefix.strip() or prefix
+        start_numbers = [int(n) for n in start.split('/')]
+        if not end:
+            names.append(_port_name(prefix, start_numbers, joiner))
+            continue
+        end_numbers = [int(n) for n in end.split('/')]
+        # The end of a range only changes the last number, i.e. Ethernet1/1-4 or ethernet 1/1 to 1/4
+        if end_numbers[:-1] not in ([], start_numbers[:-1]) or end_numbers[-1] < start_numbers[-1]:
+            raise ValueError(f"Invalid {vendor} interface range {start}-{end} in {config!r}")
+        for number in range(start_numbers[-1], end_numbers[-1] + 1):
+            names.append(_port_name(prefix, start_numbers[:-1] + [number], joiner))
+    return names
+
+
+def _port_name(prefix, numbers, joiner):
+    return f"{prefix}{joiner if prefix else ''}{'/'.join(str(n) for n in numbers)}"
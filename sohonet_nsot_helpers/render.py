@@ -0,0 +1,172 @@
+''' Batch rendering of intended configs with the Sohonet filters registered
+
+A RenderEngine builds its Jinja environment once, with every filter in jinja_filters registered and
+templates compiled to bytecode cached on disk, so neither the environment nor the templates are rebuilt
+per device. render_many renders a batch of devices in a process pool and streams each config straight
+to a file, yielding per device timings as they finish:
+
+    engine = RenderEngine(['/opt/nautobot/git/intended-templates'])
+    jobs = [RenderJob(device, 'arista_eos.j2', graphql_data[device]) for device in devices]
+    for result in engine.render_many(jobs, '/opt/nautobot/git/intended-configs'):
+        if result.error:
+            ...
+
+The bytecode cache defaults to $SOHONET_TEMPLATE_CACHE or ~/.cache/sohonet_nsot_helpers/templates
+and is shared by the pool's processes and later runs. Contexts are wrapped with index_render_data
+unless index=False.
+'''
+import inspect
+import os
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import jinja2
+
+from sohonet_nsot_helpers import jinja_filters
+from sohonet_nsot_helpers.render_index import index_render_data
+
+RenderJob = namedtuple('RenderJob', ['name', 'template', 'context'])
+RenderResult = namedtuple('RenderResult', ['name', 'path', 'seconds', 'error'])
+
+# Every public function in jinja_filters, by name
+FILTERS = {
+    name: function
+    for name, function in inspect.getmembers(jinja_filters, inspect.isfunction)
+    if function.__module__ == jinja_filters.__name__ and not name.startswith('_')
+}
+
+
+def register_filters(environment):
+    ''' add the Sohonet filters to an existing Jinja environment, i.e. Golden Config's '''
+    environment.filters.update(FILTERS)
+    return environment
+
+
+class RenderEngine:
+    ''' Jinja environment over template_dirs with the Sohonet filters and an on-disk bytecode cache
+
+    environment_kwargs are passed to jinja2.Environment, they default to Golden Config's jinja_env
+    defaults of StrictUndefined and trim_blocks.
+    '''
+
+    def __init__(self, template_dirs, bytecode_cache_dir=None, processes=None, index=True, **environment_kwargs):
+        self.template_dirs = [template_dirs] if isinstance(template_dirs, str) else list(template_dirs)
+        self.bytecode_cache_dir = bytecode_cache_dir or os.environ.get(
+            'SOHONET_TEMPLATE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'sohonet_nsot_helpers',
+                                                   'templates'))
+        self.processes = processes or os.cpu_count()
+        self.index = index
+        self.environment_kwargs = {'undefined': jinja2.StrictUndefined, 'trim_blocks': True, **environment_kwargs}
+        self._environment = None
+
+    @property
+    def environment(self):
+        if self._environment is None:
+            os.makedirs(self.bytecode_cache_dir, exist_ok=True)
+            self._environment = register_filters(
+                jinja2.Environment(
+                    loader=jinja2.FileSystemLoader(self.template_dirs),
+                    bytecode_cache=jinja2.FileSystemBytecodeCache(self.bytecode_cache_dir),
+                    **self.environment_kwargs,
+                ))
+        return self._environment
+
+    def compile_templates(self, names=None):
+        ''' compile names, or every template, into the bytecode cache
+
+        Returns {name: error} for the templates that failed to compile, the others are still compiled.
+        '''
+        errors = {}
+        for name in self.environment.list_templates() if names is None else names:
+            error = self._compile_template(name)
+            if error is not None:
+                errors[name] = error
+        return errors
+
+    def _compile_template(self, name):
+        ''' compile one template, returns why it failed as text or None '''
+        try:
+            self.environment.get_template(name)
+        except Exception as e:
+            return _error_text(e)
+        return None
+
+    def render(self, template, context):
+        ''' rendered config for one device '''
+        if self.index:
+            context = index_render_data(context)
+        return self.environment.get_template(template).render(**context)
+
+    def render_to_file(self, job, path):
+        ''' render job streaming to path, replaced atomically once complete, returns a RenderResult '''
+        start = time.perf_counter()
+        try:
+            context = index_render_data(job.context) if self.index else job.context
+            template = self.environment.get_template(job.template)
+            directory = os.path.dirname(path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+                try:
+                    for chunk in template.generate(**context):
+                        f.write(chunk)
+                except BaseException:
+                    f.close()
+                    os.unlink(f.name)
+                    raise
+            os.replace(f.name, path)
+        except Exception as e:
+            # As text, not every template error can be pickled back from the pool
+            return RenderResult(job.name, None, time.perf_counter() - start, _error_text(e))
+        return RenderResult(job.name, path, time.perf_counter() - start, None)
+
+    def render_many(self, jobs, output_dir, suffix='.cfg', in_flight=None):
+        ''' Yield a RenderResult for each job as it finishes, rendered to output_dir/{name}{suffix}
+
+        Jobs are rendered in a pool of processes that each build the environment once. At most in_flight
+        jobs, four per process by default, are handed to the pool at a time so jobs can be a generator
+        of contexts without them all being held at once.
+
+        Each template is compiled into the bytecode cache the first time a job uses it, before the pool's
+        processes load it. A template that doesn't compile, or fails to render, fails only the devices
+        using it, their results have the error.
+        '''
+        in_flight = in_flight or self.processes * 4
+        jobs = iter(jobs)
+        pending = set()
+        compiled = {}
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=_start_worker,
+                                 initargs=(self.template_dirs, self.bytecode_cache_dir, self.index,
+                                           self.environment_kwargs)) as pool:
+            while True:
+                for job in jobs:
+                    if job.template not in compiled:
+                        compiled[job.template] = self._compile_template(job.template)
+                    if compiled[job.template] is not None:
+                        yield RenderResult(job.name, None, 0.0, compiled[job.template])
+                        continue
+                    pending.add(pool.submit(_render_in_worker, job, os.path.join(output_dir, f"{job.name}{suffix}")))
+                    if len(pending) >= in_flight:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+
+_WORKER_ENGINE = None
+
+
+def _start_worker(template_dirs, bytecode_cache_dir, index, environment_kwargs):
+    global _WORKER_ENGINE
+    _WORKER_ENGINE = RenderEngine(template_dirs, bytecode_cache_dir, processes=1, index=index, **environment_kwargs)
+
+
+def _render_in_worker(job, path):
+    return _WORKER_ENGINE.render_to_file(job, path)
+
+
+def _error_text(error):
+    return f"{type(error).__name__}: {error}"
@@ -0,0 +1,95 @@
+''' Indexed views of the Nautobot GraphQL data passed to intended config templates
+
+Templates filter the same service inventory and interface lists many times per render, once per
+service_type or management mode. index_render_data wraps those lists in list subclasses that group
+their items the first time a filter asks, so each later filter call is a dict lookup:
+
+    data = index_render_data(graphql_result['data'])
+    template.render(**data)
+
+The wrapped lists behave as plain lists in templates; treat them as read only once they are indexed.
+'''
+
+NO_MANAGEMENT_MODE = object()
+
+
+class IndexedList(list):
+    ''' list of dicts grouped lazily by key_func(item), keeping list order within each group
+
+    key_func is passed in, i.e. IndexedList(items, key_func=lambda item: item['status']), or defined by a
+    subclass as a staticmethod.
+    '''
+    __slots__ = ('_index', '_excluded', '_key_func')
+    key_func = None
+
+    def __init__(self, items=(), key_func=None):
+        super().__init__(items)
+        self._key_func = key_func or self.key_func
+        if self._key_func is None:
+            raise TypeError(f"{type(self).__name__} needs a key_func")
+        self._index = None
+        self._excluded = {}
+
+    def _groups(self):
+        if self._index is None:
+            index = {}
+            for position, item in enumerate(self):
+                index.setdefault(self._key_func(item), []).append(position)
+            self._index = index
+        return self._index
+
+    def lookup(self, *keys):
+        ''' items with any of keys, in list order '''
+        groups = self._groups()
+        if len(keys) == 1:
+            return [self[position] for position in groups.get(keys[0], [])]
+        positions = sorted({position for key in set(keys) for position in groups.get(key, [])})
+        return [self[position] for position in positions]
+
+    def exclude(self, *keys):
+        ''' items without any of keys, in list order '''
+        keys = frozenset(keys)
+        if keys not in self._excluded:
+            groups = self._groups()
+            excluded = {position for key in keys for position in groups.get(key, [])}
+            self._excluded[keys] = [item for position, item in enumerate(self) if position not in excluded]
+        return list(self._excluded[keys])
+
+
+class ServiceInventoryList(IndexedList):
+    ''' service inventories grouped by serviceid.service_type '''
+    __slots__ = ()
+
+    @staticmethod
+    def key_func(item):
+        return item['serviceid']['service_type']
+
+
+class InterfaceList(IndexedList):
+    ''' interfaces grouped by managementmode.mode, NO_MANAGEMENT_MODE for interfaces without one '''
+    __slots__ = ()
+
+    @staticmethod
+    def key_func(item):
+        if not item.get('managementmode'):
+            return NO_MANAGEMENT_MODE
+        return item['managementmode'].get('mode')
+
+
+def index_render_data(data):
+    ''' return data with service inventory and interface lists wrapped in their indexed views
+
+    Lists are recognised by their items, service inventories have a serviceid and interfaces have a
+    managementmode key. Everything else is returned as is.
+    '''
+    if isinstance(data, dict):
+        return {key: index_render_data(value) for key, value in data.items()}
+    if isinstance(data, list) and not isinstance(data, IndexedList):
+        items = [index_render_data(item) for item in data]
+        if items and all(isinstance(item, dict) for item in items):
+            if all(isinstance(item.get('serviceid'), dict) for item in items):
+                return ServiceInventoryList(items)
+            if all('managementmode' in item for item in items):
+                return InterfaceList(items)
+        return items
+    return data
@@ -0,0 +1,219 @@
+''' Schedule getters across a fleet, longest devices first, within per site limits
+
+Collection time is usually decided by a few slow devices. The scheduler keeps a history of how long
+each getter took on each device and starts the devices expected to take longest first, so they aren't
+left to run on their own at the end:
+
+    scheduler = FleetScheduler(workers=32, site_concurrency=4, site_rate=2.0)
+    jobs = [DeviceJob(name, site, ['get_interfaces', 'get_vlans'], driver) for ...]
+
+    def collect(job, getter):
+        return getattr(job.target, getter)()
+
+    for job, results, error in scheduler.run(jobs, collect):
+        ...
+
+site_concurrency caps how many devices of a site are collected at once and site_rate caps how many are
+started per second, to protect shared control planes. Estimates for devices without history come from
+the timings of this run as they arrive, and the queue is re-ordered as they change.
+'''
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+DeviceJob = namedtuple('DeviceJob', ['name', 'site', 'getters', 'target'])
+
+
+class TimingHistory:
+    ''' Exponentially weighted moving average of getter durations per device, persisted to a JSON file
+
+    {
+        'devices': {
+            'switch1.example.com': {
+                'get_interfaces': 12.5,
+                'get_vlans': 3.25,
+            }
+        }
+    }
+    '''
+
+    def __init__(self, path=None, alpha=0.3, default_seconds=10.0):
+        self.path = path or os.environ.get(
+            'SOHONET_TIMING_HISTORY',
+            os.path.join(os.path.expanduser('~'), '.cache', 'sohonet_nsot_helpers', 'timings.json'))
+        self.alpha = alpha
+        self.default_seconds = default_seconds
+        self._lock = threading.Lock()
+        self._data = None
+        self._getter_means = None
+
+    def duration(self, device, getter):
+        ''' return the average duration of getter on device, or None if it hasn't been timed '''
+        return self._load()['devices'].get(device, {}).get(getter)
+
+    def record(self, device, getter, seconds):
+        ''' add a duration of getter on device to its average '''
+        with self._lock:
+            timings = self._load()['devices'].setdefault(device, {})
+            previous = timings.get(getter)
+            timings[getter] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+            self._getter_means = None
+
+    def estimate(self, device, getters):
+        ''' expected seconds to run getters on device, using the fleet mean for getters it hasn't run '''
+        total = 0.0
+        with self._lock:
+            for getter in getters:
+                seconds = self.duration(device, getter)
+                if seconds is None:
+                    seconds = self._getter_mean(getter)
+                total += seconds
+        return total
+
+    def save(self):
+        ''' write the history, merged with devices timed by other processes since it was loaded '''
+        with self._lock:
+            on_disk = _read_history(self.path)
+            for device, timings in self._load()['devices'].items():
+                on_disk['devices'].setdefault(device, {}).update(timings)
+            self._data = on_disk
+
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+                json.dump(self._data, f, indent=2, sort_keys=True)
+            os.replace(f.name, self.path)
+
+    def _getter_mean(self, getter):
+        if self._getter_means is None:
+            sums = Counter()
+            counts = Counter()
+            for timings in self._load()['devices'].values():
+                for name, seconds in timings.items():
+                    sums[name] += seconds
+                    counts[name] += 1
+            self._getter_means = {name: sums[name] / counts[name] for name in sums}
+        return self._getter_means.get(getter, self.default_seconds)
+
+    def _load(self):
+        if self._data is None:
+            self._data = _read_history(self.path)
+        return self._data
+
+
+def _read_history(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data.setdefault('devices', {})
+    return data
+
+
+class FleetScheduler:
+    ''' Run getters on devices longest expected first, within per site concurrency and rate limits '''
+
+    def __init__(self, history=None, workers=16, site_concurrency=None, site_rate=None, replan_every=10,
+                 clock=time.monotonic):
+        self.history = history or TimingHistory()
+        self.workers = workers
+        self.site_concurrency = site_concurrency
+        self.site_rate = site_rate
+        self.replan_every = replan_every
+        self.clock = clock
+
+    def plan(self, jobs):
+        ''' return [(estimated seconds, job)] in the order they would be started, longest first '''
+        return sorted(((self.history.estimate(job.name, job.getters), job) for job in jobs),
+                      key=lambda item: item[0],
+                      reverse=True)
+
+    def run(self, jobs, collect, save=True):
+        ''' Yield (job, {getter: result}, error) for each job as it finishes
+
+        collect(job, getter) runs in a worker thread, the getters of a job run in order on the same
+        worker. If one raises, the job stops there and the exception is returned as error alongside the
+        results so far. Timings are added to the history as they come in, and saved at the end.
+        '''
+        pending = [job for _, job in self.plan(jobs)]
+        running = Counter()
+        last_start = {}
+        done = queue.Queue()
+        completed_since_plan = 0
+        in_flight = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while pending or in_flight:
+                    wait = None
+                    if in_flight < self.workers:
+                        position, wait = self._next_job(pending, running, last_start)
+                        if position is not None:
+                            job = pending.pop(position)
+                            running[job.site] += 1
+                            last_start[job.site] = self.clock()
+                            in_flight += 1
+                            pool.submit(self._run_job, job, collect, done)
+                            continue
+
+                    try:
+                        job, results, error = done.get(timeout=wait)
+                    except queue.Empty:
+                        continue
+                    running[job.site] -= 1
+                    in_flight -= 1
+                    yield job, results, error
+
+                    # Devices without history are estimated from this run's timings, re-order as they change
+                    completed_since_plan += 1
+                    if completed_since_plan >= self.replan_every:
+                        pending = [job for _, job in self.plan(pending)]
+                        completed_since_plan = 0
+        finally:
+            if save:
+                self.history.save()
+
+    def _next_job(self, pending, running, last_start):
+        ''' return (position of the first startable pending job, or None, seconds until one may be) '''
+        wait = None
+        for position, job in enumerate(pending):
+            if self.site_concurrency and running[job.site] >= self.site_concurrency:
+                continue
+            if self.site_rate and job.site in last_start:
+                delay = last_start[job.site] + 1.0 / self.site_rate - self.clock()
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+            return position, None
+        return None, wait
+
+    def _run_job(self, job, collect, done):
+        results = {}
+        error = None
+        try:
+            for getter in job.getters:
+                start = self.clock()
+                results[getter] = collect(job, getter)
+                self.history.record(job.name, getter, self.clock() - start)
+        except Exception as e:
+            error = e
+        done.put((job, results, error))
+
+
+def simulated_collect(latencies, default_seconds=0.0, speed=1.0):
+    ''' collect function for FleetScheduler.run that sleeps for latencies[(device, getter)] * speed
+
+    For trying out schedules and limits against recorded or made up device latencies.
+    '''
+
+    def collect(job, getter):
+        time.sleep(latencies.get((job.name, getter), default_seconds) * speed)
+        return None
+
+    return collect
@@ -0,0 +1,120 @@
+''' Encode and decode the reversible secret formats used in device config
+
+    NetIron SNMP communities        $<base64 of the community through a substitution table>
+    Cisco/Arista type 7             <2 digit salt><hex of the secret XORed with a fixed key>
+
+Tables are built once at import, encoding and decoding are str.translate and bytes operations, and
+every function has a batch form for rendering or comparing many secrets at a time.
+'''
+import base64
+import binascii
+import re
+
+# yapf: disable
+NETIRON_SNMP_TABLE = {
+  'a': '!','b': '2','c': 'd','d': '@','e': 'n','f': 'G','g': '"','h': 'b','i': '=','j': '?','k': 'D','l': '^','m': '6','n': 'g','o': 's','p': 'S',
+  'q': 'R','r': 'U','s': '-','t': 'o','u': 'i','v': 'r','w': '+','x': 'C','y': '\\','z': 'x','A': 'q','B': 'L','C': 'B','D': ':','E': 'f','F': 'w',
+  'G': '9','H': '0','I': """'""",'J': 'c','K': 'h','L': '#','M': 'k','N': 't','O': ',','P': '5','Q': '_','R': 'P','S': '%','T': 'l','U': 'K','V': ']',
+  'W': 'a','X': 'E','Y': '*','Z': '(','0': 'Q','1': 'Z','2': '|','3': '8','4': '3','5': '0','6': 'm','7': 'Y','8': 'W','9': '{','!': 'V','"': 'F',
+  '#': 'I','$': '4','%': 'u','&': '>',"""'""": 'N','(': 'p',')': 'z','*': 'X','+': 'e',',': 'T','-': 'M','.': '&','/': ')',':': 'y',';': ';','<': '`',
+  '=': '$','>': 'v','@': '1','[': '7',']': '~','\\': 'H','^': '<','_': '}','`': '/','{': '.','}': 'j','~': '[',
+}
+# yapf: enable
+
+_NETIRON_ENCODE = str.maketrans(NETIRON_SNMP_TABLE)
+# The table isn't one to one, 'H' and '5' both encode to '0', which decodes to the first of them
+_NETIRON_DECODE = {}
+for _plain, _cipher in NETIRON_SNMP_TABLE.items():
+    _NETIRON_DECODE.setdefault(ord(_cipher), _plain)
+_NETIRON_CHARS = frozenset(NETIRON_SNMP_TABLE)
+_NETIRON_CIPHER_CHARS = frozenset(NETIRON_SNMP_TABLE.values())
+
+CISCO_TYPE7_KEY = b"dsfd;kfoA,.iyewrkldJKDHSUBsgvca69834ncxv9873254k;fg87"
+CISCO_TYPE7_MAX_SALT = 52
+
+# A type 7 secret after its keyword on the same line, a salt of 00-52 then at least two whole bytes of hex
+TYPE7_CONFIG_REGEX = re.compile(
+    r'(\b(?:password|secret|key|key-string)[ \t]+7[ \t]+)((?:[0-4]\d|5[0-2])(?:[0-9A-Fa-f]{2}){2,})(?![\w.:-])')
+
+
+def encode_netiron_snmp(community):
+    ''' NetIron encrypted form of an SNMP community, raises KeyError for characters NetIron can't encode '''
+    if not _NETIRON_CHARS.issuperset(community):
+        raise KeyError(next(char for char in community if char not in _NETIRON_CHARS))
+    return '$' + base64.b64encode(community.translate(_NETIRON_ENCODE).encode('ascii')).decode('ascii')
+
+
+def decode_netiron_snmp(encoded):
+    ''' SNMP community from its NetIron encrypted form, raises ValueError if encoded isn't one '''
+    if not encoded.startswith('$'):
+        raise ValueError(f"NetIron encrypted community should start with $: {encoded}")
+    try:
+        cipher_string = base64.b64decode(encoded[1:], validate=True).decode('ascii')
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid NetIron encrypted community: {encoded}") from e
+    if not _NETIRON_CIPHER_CHARS.issuperset(cipher_string):
+        raise ValueError(f"Invalid NetIron encrypted community: {encoded}")
+    return cipher_string.translate(_NETIRON_DECODE)
+
+
+def encode_cisco_type7(secret, salt=1):
+    ''' Cisco type 7 form of secret, the same as passlib's cisco_type7.hash(secret, salt=salt) '''
+    if not 0 <= salt <= CISCO_TYPE7_MAX_SALT:
+        raise ValueError(f"Cisco type 7 salt must be between 0 and {CISCO_TYPE7_MAX_SALT}")
+    data = secret.encode('utf-8')
+    key = CISCO_TYPE7_KEY
+    key_size = len(key)
+    return "%02d" % salt + bytes(value ^ key[(salt + idx) % key_size] for idx, value in enumerate(data)).hex().upper()
+
+
+def decode_cisco_type7(encoded):
+    ''' secret from its Cisco type 7 form, raises ValueError if encoded isn't one '''
+    if len(encoded) < 2 or not encoded[:2].isdigit() or int(encoded[:2]) > CISCO_TYPE7_MAX_SALT:
+        raise ValueError(f"Invalid Cisco type 7 salt: {encoded}")
+    salt = int(encoded[:2])
+    try:
+        data = bytes.fromhex(encoded[2:])
+        key = CISCO_TYPE7_KEY
+        key_size = len(key)
+        return bytes(value ^ key[(salt + idx) % key_size] for idx, value in enumerate(data)).decode('utf-8')
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid Cisco type 7 secret: {encoded}") from e
+
+
+def encode_netiron_snmp_batch(communities):
+    ''' encode_netiron_snmp of each community '''
+    return [encode_netiron_snmp(community) for community in communities]
+
+
+def decode_netiron_snmp_batch(encoded):
+    ''' decode_netiron_snmp of each encoded community '''
+    return [decode_netiron_snmp(community) for community in encoded]
+
+
+def encode_cisco_type7_batch(secrets, salt=1):
+    ''' encode_cisco_type7 of each secret, all with the same salt '''
+    return [encode_cisco_type7(secret, salt) for secret in secrets]
+
+
+def decode_cisco_type7_batch(encoded):
+    ''' decode_cisco_type7 of each encoded secret '''
+    return [decode_cisco_type7(secret) for secret in encoded]
+
+
+def canonicalize_type7_secrets(config):
+    ''' re-encode type 7 secrets in config with salt 1, so the same secret always reads the same
+
+    Devices pick their own salt, so the same key can look different in actual and intended config.
+    Secrets stay encoded, values that don't decode to printable text are left as they are. Lines are
+    only changed in place, so the result has the same lines as config.
+    '''
+    def canonical(match):
+        try:
+            secret = decode_cisco_type7(match.group(2))
+        except ValueError:
+            return match.group(0)
+        if not secret.isprintable():
+            return match.group(0)
+        return match.group(1) + encode_cisco_type7(secret)
+
+    return TYPE7_CONFIG_REGEX.sub(canonical, config)
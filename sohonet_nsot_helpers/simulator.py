@@ -0,0 +1,647 @@
+''' Simulated Arista eAPI endpoints, ProCurve SSH CLIs and SNMP agents for load testing
+
+Each SimulatedDevice is served on its own local ports, so the napalm drivers with the helpers patched
+in connect to it exactly as they would to a switch:
+
+    with Simulator() as simulator:
+        for i in range(200):
+            simulator.add_device(generate_procurve_device(f"sw{i}", ports=48, latency=0.05, jitter=0.02))
+        ...
+        driver = ProcurveDriver('sw0', 'admin', 'admin', optional_args=simulator.optional_args('sw0'))
+
+Devices serve generated data or what was recorded with sohonet_nsot_helpers.napalm.capture, with a
+per request latency and jitter. ProCurve CLIs page output until 'no page' is sent and SNMP agents can
+cap GETBULK max-repetitions, to exercise the same paging production devices do.
+'''
+import bisect
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import paramiko
+
+from sohonet_nsot_helpers.napalm.capture import read_archive
+from sohonet_nsot_helpers.snmp import (END_OF_MIB_VIEW, GAUGE32, GET_BULK_REQUEST, GET_NEXT_REQUEST, GET_REQUEST,
+                                       GET_RESPONSE, HEX_OBJECTS, INTEGER, MIB_OBJECTS, NO_SUCH_INSTANCE, NO_SUCH_NAME,
+                                       OCTET_STRING, OBJECT_IDENTIFIER, TIMETICKS, VERSION_1, decode_message,
+                                       display_value, encode_message)
+
+CommandFailure = namedtuple('CommandFailure', ['code', 'message'])
+Endpoints = namedtuple('Endpoints', ['eapi', 'ssh', 'snmp'])
+
+PROCURVE_PAGER = "-- MORE --, next page: Space, next line: Enter, quit: Control-C"
+
+
+class SimulatedDevice:
+    ''' Data and behaviour of one simulated device
+
+    responses maps commands to their output, for EOS keyed by (command, encoding) with JSON results
+    for 'json' and text for 'text', for ProCurve keyed by command. A CommandFailure value makes the
+    command fail. mib maps OID tuples to (tag, value), it answers SNMP and ProCurve's walkMIB/getMIB.
+    '''
+
+    def __init__(self, hostname, vendor, responses=None, mib=None, latency=0.0, jitter=0.0, page_size=None,
+                 snmp_max_repetitions=None, community='public', username=None, password=None):
+        self.hostname = hostname
+        self.vendor = vendor
+        self.responses = responses or {}
+        self.mib = mib or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.page_size = page_size
+        self.snmp_max_repetitions = snmp_max_repetitions
+        self.community = community
+        self.username = username
+        self.password = password
+        self._mib_oids = None
+
+    def delay(self):
+        ''' sleep for one request's latency '''
+        seconds = self.latency + random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def accepts(self, username, password):
+        return self.username in (None, username) and self.password in (None, password)
+
+    def eapi(self, command, encoding):
+        ''' result of an eAPI command, a CommandFailure for unknown or failing commands '''
+        response = self.responses.get((command, encoding))
+        if response is None:
+            return CommandFailure(1002, f"Invalid input (at token 0: '{command}')")
+        if encoding == 'text' and isinstance(response, str):
+            return {'output': response}
+        return response
+
+    def cli(self, command):
+        ''' output of a ProCurve CLI command '''
+        words = command.split()
+        if words and words[0] in ('walkMIB', 'getMIB') and len(words) == 2:
+            return self._cli_mib(words[0], words[1])
+        response = self.responses.get(command)
+        if response is None or isinstance(response, CommandFailure):
+            return f"Invalid input: {command}"
+        return response
+
+    def mib_get(self, oid):
+        return self.mib.get(oid)
+
+    def mib_next(self, oid):
+        ''' (oid, value) following oid in the MIB, or None past the end '''
+        if self._mib_oids is None:
+            self._mib_oids = sorted(self.mib)
+        position = bisect.bisect_right(self._mib_oids, oid)
+        if position == len(self._mib_oids):
+            return None
+        next_oid = self._mib_oids[position]
+        return next_oid, self.mib[next_oid]
+
+    def _cli_mib(self, verb, name):
+        base_name, _, suffix = name.partition('.')
+        if base_name not in MIB_OBJECTS:
+            return f"Cannot translate {name}"
+        base = MIB_OBJECTS[base_name]
+        if verb == 'getMIB':
+            oid = base + tuple(int(n) for n in suffix.split('.') if n)
+            value = self.mib.get(oid)
+            if value is None:
+                return f"{name}: No Such Instance"
+            return f"{name} = {display_value(*value, hex_octets=base_name in HEX_OBJECTS)}"
+
+        lines = []
+        oid = base
+        while True:
+            found = self.mib_next(oid)
+            if found is None or found[0][:len(base)] != base:
+                break
+            oid, value = found
+            lines.append(f"{base_name}.{'.'.join(str(n) for n in oid[len(base):])} = "
+                         f"{display_value(*value, hex_octets=base_name in HEX_OBJECTS)}")
+        return "\n".join(lines)
+
+
+class Simulator:
+    ''' Serve SimulatedDevices on local ports, eAPI over HTTP for EOS and SSH for ProCurve, SNMP for both '''
+
+    def __init__(self, host='127.0.0.1', host_key=None):
+        self.host = host
+        self.host_key = host_key
+        self.devices = {}
+        self.endpoints = {}
+        self._servers = []
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add_device(self, device):
+        ''' start serving device, returns its Endpoints '''
+        eapi_port = ssh_port = None
+        if device.vendor == 'eos':
+            eapi_port = self._start_eapi(device)
+        else:
+            ssh_port = self._start_ssh(device)
+        snmp_port = self._start_snmp(device)
+        self.devices[device.hostname] = device
+        self.endpoints[device.hostname] = Endpoints(eapi_port, ssh_port, snmp_port)
+        return self.endpoints[device.hostname]
+
+    def optional_args(self, hostname):
+        ''' napalm optional_args pointing a driver at the simulated device '''
+        endpoints = self.endpoints[hostname]
+        if endpoints.eapi:
+            return {'transport': 'http', 'port': endpoints.eapi}
+        return {'port': endpoints.ssh}
+
+    def stop(self):
+        self._stop.set()
+        for server in self._servers:
+            try:
+                server.shutdown() if isinstance(server, ThreadingHTTPServer) else server.close()
+            except OSError:
+                pass
+            if isinstance(server, ThreadingHTTPServer):
+                server.server_close()
+        self._servers = []
+
+    def _start_eapi(self, device):
+        handler = type('EapiHandler', (_EapiHandler, ), {'device': device})
+        server = ThreadingHTTPServer((self.host, 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return server.server_address[1]
+
+    def _start_ssh(self, device):
+        if self.host_key is None:
+            self.host_key = paramiko.RSAKey.generate(2048)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, 0))
+        listener.listen(64)
+        listener.settimeout(0.5)
+        threading.Thread(target=self._accept_ssh, args=(listener, device), daemon=True).start()
+        self._servers.append(listener)
+        return listener.getsockname()[1]
+
+    def _accept_ssh(self, listener, device):
+        while not self._stop.is_set():
+            try:
+                client, _ = listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            client.settimeout(None)
+            threading.Thread(target=_serve_ssh_client, args=(client, device, self.host_key), daemon=True).start()
+
+    def _start_snmp(self, device):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((self.host, 0))
+        sock.settimeout(0.5)
+        threading.Thread(target=_serve_snmp, args=(sock, device, self._stop), daemon=True).start()
+        self._servers.append(sock)
+        return sock.getsockname()[1]
+
+
+class _EapiHandler(BaseHTTPRequestHandler):
+    ''' JSON-RPC runCmds as served on /command-api '''
+    protocol_version = 'HTTP/1.1'
+    device = None
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        params = request.get('params', {})
+        encoding = params.get('format', 'json')
+        commands = [c['cmd'] if isinstance(c, dict) else c for c in params.get('cmds', [])]
+        self.device.delay()
+
+        results = []
+        reply = {'jsonrpc': '2.0', 'id': request.get('id')}
+        for index, command in enumerate(commands):
+            if command == 'enable' or command.startswith('terminal '):
+                results.append({})
+                continue
+            result = self.device.eapi(command, encoding)
+            if isinstance(result, CommandFailure):
+                message = f"CLI command {index + 1} of {len(commands)} '{command}' failed: {result.message}"
+                reply['error'] = {'code': result.code, 'message': message,
+                                  'data': results + [{'errors': [result.message]}]}
+                break
+            results.append(result)
+        else:
+            reply['result'] = results
+
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _SSHServer(paramiko.ServerInterface):
+
+    def __init__(self, device):
+        self.device = device
+        self.shell_requested = threading.Event()
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if self.device.accepts(username, password) else paramiko.AUTH_FAILED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell_requested.set()
+        return True
+
+
+def _serve_ssh_client(client, device, host_key):
+    transport = paramiko.Transport(client)
+    transport.add_server_key(host_key)
+    server = _SSHServer(device)
+    try:
+        transport.start_server(server=server)
+        channel = transport.accept(20)
+        if channel is None or not server.shell_requested.wait(20):
+            return
+        _ProcurveCli(channel, device).run()
+    except (EOFError, OSError, paramiko.SSHException):
+        pass
+    finally:
+        transport.close()
+
+
+class _ProcurveCli:
+    ''' Line based ProCurve manager CLI, echoing input and paging output until 'no page' '''
+
+    def __init__(self, channel, device):
+        self.channel = channel
+        self.device = device
+        self.prompt = f"{device.hostname}# "
+        self.paging = bool(device.page_size)
+        self.buffer = ""
+
+    def run(self):
+        self.channel.sendall("\r\nHP J9728A 2920-48G Switch\r\n"
+                          "Software revision WB.16.10.0012\r\n\r\n"
+                          "(C) Copyright 2024 Hewlett Packard Enterprise Development LP\r\n\r\n"
+                          "Press any key to continue\r\n")
+        if not self._read_key():
+            return
+        self.channel.sendall(f"\r\n{self.prompt}")
+        while True:
+            line = self._read_line()
+            if line is None:
+                return
+            command = line.strip()
+            self.channel.sendall(f"{line}\r\n")
+            if command in ('logout', 'exit'):
+                return
+            if command == 'no page':
+                self.paging = False
+            elif command and command != 'enable' and not command.startswith('terminal '):
+                self.device.delay()
+                self._send_output(self.device.cli(command))
+            self.channel.sendall(self.prompt)
+
+    def _send_output(self, output):
+        lines = output.splitlines()
+        if not self.paging:
+            self.channel.sendall("".join(f"{line}\r\n" for line in lines))
+            return
+        position = 0
+        step = self.device.page_size
+        while position < len(lines):
+            self.channel.sendall("".join(f"{line}\r\n" for line in lines[position:position + step]))
+            position += step
+            if position >= len(lines):
+                break
+            self.channel.sendall(PROCURVE_PAGER)
+            key = self._read_key()
+            self.channel.sendall("\r" + " " * len(PROCURVE_PAGER) + "\r")
+            if key is None or key == "\x03" or key in "qQ":
+                break
+            step = 1 if key in "\r\n" else self.device.page_size
+
+    def _fill(self):
+        data = self.channel.recv(65536)
+        if not data:
+            return False
+        # Like the switch, ignore the NUL netmiko's is_alive() sends to check a pooled session
+        self.buffer += data.decode('utf-8', errors='replace').replace("\x00", "")
+        return True
+
+    def _read_key(self):
+        if not self.buffer and not self._fill():
+            return None
+        key, self.buffer = self.buffer[0], self.buffer[1:]
+        # A key sent as a line ending counts once
+        if key == "\r" and self.buffer.startswith("\n"):
+            self.buffer = self.buffer[1:]
+        return key
+
+    def _read_line(self):
+        while True:
+            match = re.search(r"\r\n|\r|\n", self.buffer)
+            if match and not (match.group(0) == "\r" and match.end() == len(self.buffer)):
+                line, self.buffer = self.buffer[:match.start()], self.buffer[match.end():]
+                return line
+            if not self._fill():
+                return None
+
+
+def _serve_snmp(sock, device, stop):
+    while not stop.is_set():
+        try:
+            data, address = sock.recvfrom(65535)
+        except socket.timeout:
+            continue
+        except OSError:
+            return
+        try:
+            request = decode_message(data)
+        except ValueError:
+            continue
+        if getattr(request, 'community', None) != device.community.encode():
+            continue
+        if request.pdu_type not in (GET_REQUEST, GET_NEXT_REQUEST, GET_BULK_REQUEST):
+            continue
+        device.delay()
+        varbinds, error_status, error_index = _snmp_response(device, request)
+        try:
+            sock.sendto(
+                encode_message(request.community, GET_RESPONSE, request.request_id, varbinds, error_status,
+                               error_index, version=request.version), address)
+        except OSError:
+            return
+
+
+def _snmp_response(device, request):
+    ''' (varbinds, error_status, error_index) answering a GET, GETNEXT or GETBULK request '''
+    end_of_mib = (END_OF_MIB_VIEW, None)
+
+    def next_varbind(oid):
+        found = device.mib_next(oid)
+        return found if found is not None else (oid, end_of_mib)
+
+    if request.pdu_type == GET_REQUEST:
+        varbinds = []
+        for index, (oid, _) in enumerate(request.varbinds):
+            value = device.mib_get(oid)
+            if value is None:
+                if request.version == VERSION_1:
+                    return request.varbinds, NO_SUCH_NAME, index + 1
+                value = (NO_SUCH_INSTANCE, None)
+            varbinds.append((oid, value))
+        return varbinds, 0, 0
+
+    if request.pdu_type == GET_NEXT_REQUEST:
+        varbinds = []
+        for index, (oid, _) in enumerate(request.varbinds):
+            oid, value = next_varbind(oid)
+            if value == end_of_mib and request.version == VERSION_1:
+                return request.varbinds, NO_SUCH_NAME, index + 1
+            varbinds.append((oid, value))
+        return varbinds, 0, 0
+
+    non_repeaters = min(request.error_status, len(request.varbinds))
+    max_repetitions = request.error_index
+    if device.snmp_max_repetitions:
+        max_repetitions = min(max_repetitions, device.snmp_max_repetitions)
+    varbinds = [next_varbind(oid) for oid, _ in request.varbinds[:non_repeaters]]
+    current = [oid for oid, _ in request.varbinds[non_repeaters:]]
+    for _ in range(max_repetitions):
+        row = [next_varbind(oid) for oid in current]
+        varbinds.extend(row)
+        if all(value == end_of_mib for _, value in row):
+            break
+        current = [oid for oid, _ in row]
+    return varbinds, 0, 0
+
+
+def generate_eos_device(hostname, interfaces=48, vlans=10, routes=50, mac_entries=0, **kwargs):
+    ''' SimulatedDevice for an Arista switch with the data the eos_get_* helpers collect, with mac_entries
+    MAC address table and ARP entries and an LLDP neighbor on each member of Port-Channel1 '''
+    members = ['Ethernet1', 'Ethernet2']
+    show_interfaces = {}
+    statuses = {}
+    for port in range(1, interfaces + 1):
+        name = f"Ethernet{port}"
+        show_interfaces[name] = {
+            'lineProtocolStatus': 'up' if port % 4 else 'down',
+            'interfaceStatus': 'connected' if port % 4 else 'notconnect',
+            'description': f"port {port}",
+            'mtu': 9214,
+            'bandwidth': 10000000000,
+            'physicalAddress': f"00:1c:73:00:{port // 256:02x}:{port % 256:02x}",
+        }
+        statuses[name] = {'interfaceType': '10GBASE-SR'}
+    show_interfaces['Port-Channel1'] = {
+        'lineProtocolStatus': 'up', 'interfaceStatus': 'connected', 'description': 'uplink', 'mtu': 9214,
+        'bandwidth': 20000000000, 'memberInterfaces': {member: {} for member in members},
+    }
+
+    vlan_table = {'1': {'name': 'default', 'interfaces': {f"Ethernet{port}": {} for port in range(3, interfaces + 1)}}}
+    ip_interfaces = {}
+    config = []
+    for vid in range(100, 100 + vlans):
+        vlan_table[str(vid)] = {'name': f"VLAN{vid}", 'interfaces': {'Cpu': {}, 'Port-Channel1': {}}}
+        show_interfaces[f"Vlan{vid}"] = {
+            'lineProtocolStatus': 'up', 'interfaceStatus': 'connected', 'description': '', 'mtu': 1500,
+            'bandwidth': 0,
+        }
+        ip_interfaces[f"Vlan{vid}"] = {
+            'interfaceAddress': {'primaryIp': {'address': f"10.{vid // 256}.{vid % 256}.2", 'maskLen': 24}},
+            'vrf': 'default',
+        }
+        config.append(f"interface Vlan{vid}\n   ip address 10.{vid // 256}.{vid % 256}.2/24\n"
+                      f"   ip virtual-router address 10.{vid // 256}.{vid % 256}.1\n!")
+
+    route_lines = [f"ip route 10.{200 + route // 256}.{route % 256}.0/24 10.0.100.254 name route{route}"
+                   for route in range(routes)]
+    responses = {
+        ('show version', 'json'): {'modelName': 'DCS-7050SX3-48YC8', 'version': '4.28.3M', 'hostname': hostname},
+        ('show interfaces', 'json'): {'interfaces': show_interfaces},
+        ('show interfaces status', 'json'): {'interfaceStatuses': statuses},
+        ('show interfaces description', 'json'): {'interfaceDescriptions': {
+            name: {'lineProtocolStatus': values['lineProtocolStatus'],
+                   'interfaceStatus': 'adminDown' if values['interfaceStatus'] == 'disabled' else
+                   'up' if values['lineProtocolStatus'] == 'up' else 'down',
+                   'description': values['description']}
+            for name, values in show_interfaces.items()}},
+        ('show interfaces trunk', 'json'): {'trunks': {'Port-Channel1': {
+            'nativeVlan': 1, 'allowedVlans': {'vlanIds': list(range(100, 100 + vlans))},
+            'activeVlans': {'vlanIds': list(range(100, 100 + vlans))}}}},
+        ('show vlan', 'json'): {'vlans': vlan_table},
+        ('show ip interface', 'json'): {'interfaces': ip_interfaces},
+        ('show ipv6 interface', 'json'): CommandFailure(1000, 'No IPv6 configured interfaces'),
+        ('show mpls interface', 'json'): CommandFailure(1002, "Invalid input (at token 1: 'mpls')"),
+        ('show running-config', 'json'): CommandFailure(1002, 'Command not supported in json format'),
+        ('show vrf | json', 'json'): {'vrfs': {'default': {'routeDistinguisher': '', 'interfaces': sorted(ip_interfaces)}}},
+        ('show ip virtual-router', 'json'): {'virtualRouters': [
+            {'interface': f"Vlan{vid}", 'vrf': 'default', 'virtualIps': [{'ip': f"10.{vid // 256}.{vid % 256}.1"}]}
+            for vid in range(100, 100 + vlans)]},
+        ('show ip access-lists summary', 'json'): {'aclList': []},
+        ('show running-config | section interface', 'text'): "\n".join(config) + "\n",
+        ('show running-config | section ip route', 'text'): "\n".join(route_lines) + "\n",
+        ('show running-config section patch', 'text'): "",
+        ('show mac address-table', 'json'): {'unicastTable': {'tableEntries': [
+            {'macAddress': mac.hex(':'), 'vlanId': vid, 'interface': f"Ethernet{port}", 'entryType': 'dynamic'}
+            for mac, port, vid, _ in _table_entries(mac_entries, interfaces, vlans)]}},
+        ('show ip arp', 'json'): {'ipV4Neighbors': [
+            {'address': address, 'hwAddress': mac.hex(), 'interface': f"Vlan{vid}, Ethernet{port}", 'age': 0}
+            for mac, port, vid, address in _table_entries(mac_entries, interfaces, vlans)]},
+        ('show ipv6 neighbors', 'json'): {'ipV6Neighbors': []},
+        ('show lldp neighbors detail', 'json'): {'lldpNeighbors': {member: {'lldpNeighborInfo': [{
+            'chassisId': '001c.7300.9999', 'chassisIdType': 'macAddress', 'systemName': f"{hostname}-peer",
+            'neighborInterfaceInfo': {'interfaceId': f'"{member}"', 'interfaceId_v2': member,
+                                      'interfaceDescription': 'uplink'}}]} for member in members}},
+    }
+    mib = _system_mib(hostname, 'Arista Networks EOS version 4.28.3M running on an Arista DCS-7050SX3-48YC8')
+    for index, name in enumerate(show_interfaces, start=1):
+        mib[MIB_OBJECTS['ifName'] + (index, )] = (OCTET_STRING, name.encode())
+    return SimulatedDevice(hostname, 'eos', responses, mib, **kwargs)
+
+
+def generate_procurve_device(hostname, ports=48, vlans=10, mac_entries=0, **kwargs):
+    ''' SimulatedDevice for a ProCurve switch with the data the procurve_get_* helpers collect, ports 1-2 are
+    members of Trk1, with mac_entries FDB and ARP entries and an LLDP neighbor on each member of Trk1 '''
+    vlan_rows = [(1, 'DEFAULT_VLAN')] + [(vid, f"VLAN{vid}") for vid in range(100, 100 + vlans)]
+    vlan_header = ("  VLAN ID Name                             | Status     Voice Jumbo\n"
+                   "  ------- -------------------------------- + ---------- ----- -----\n")
+
+    def vlan_lines(rows):
+        return "".join(f"  {vid:<7} {name:<32} | Port-based No    No\n" for vid, name in rows)
+
+    status_lines = []
+    type_lines = []
+    for port in range(1, ports + 1):
+        port_name = f"{port}-Trk1" if port <= 2 else str(port)
+        tagged, untagged = ('multi', '1') if port <= 2 else ('No', '1')
+        status_lines.append(f" {port_name:<8} {'':<10} Up      Auto          1000FDx  100/1000T  {tagged:<6} {untagged}\n")
+        type_lines.append(f"  {port_name:<10} {'SFP+SR' if port > ports - 4 else '100/1000T'}\n")
+    status_lines.append(f" {'Trk1':<8} {'':<10} Up      Auto          1000FDx  100/1000T  multi  1\n")
+
+    responses = {
+        'show vlans': (" Status and Counters - VLAN Information\n\n  Maximum VLANs to support : 256\n"
+                       "  Primary VLAN : DEFAULT_VLAN\n\n" + vlan_header + vlan_lines(vlan_rows)),
+        'show vlans ports Trk1': vlan_header + vlan_lines(vlan_rows),
+        'show interfaces status': (" Port     Name       Status  Config-mode   Speed    Type       Tagged Untagged\n"
+                                   " -------- ---------- ------- ------------- -------- ---------- ------ --------\n" +
+                                   "".join(status_lines)),
+        'show interfaces custom all port:10 type': (" Status and Counters\n\n  Port       Type\n"
+                                                    "  ---------- ----------\n" + "".join(type_lines)),
+        'show trunks': (" Load Balancing Method:  L3-based (default)\n\n"
+                        "  Port   | Name                             Type      | Group Type\n"
+                        "  ------ + -------------------------------- --------- + ----- --------\n"
+                        "  1      |                                  100/1000T | Trk1  LACP\n"
+                        "  2      |                                  100/1000T | Trk1  LACP\n"),
+        'show ip': (" Internet (IP) Service\n\n"
+                    "  VLAN                 | IP Config  IP Address      Subnet Mask\n"
+                    "  -------------------- + ---------- --------------- ---------------\n" +
+                    "".join(f"  {name:<20} | Manual     10.{vid // 256}.{vid % 256}.1{' ' * 6}255.255.255.0\n"
+                            for vid, name in vlan_rows)),
+    }
+    for port in (1, 2):
+        responses[f"show vlans ports {port}-Trk1"] = vlan_header + vlan_lines(vlan_rows)
+
+    mib = _system_mib(hostname, 'HP J9728A 2920-48G Switch, revision WB.16.10.0012, ROM WB.16.03 (/ws/swbuildm/'
+                      'rel_ukiah_qaoff/code/build/anm(swbuildm_rel_ukiah_qaoff_rel_ukiah)) (Formerly ProCurve)')
+    interfaces = [(port, str(port), 6) for port in range(1, ports + 1)] + [(289, 'Trk1', 161)]
+    interfaces += [(4096 + index, name, 53) for index, (vid, name) in enumerate(vlan_rows)]
+    for index, name, if_type in interfaces:
+        mib[MIB_OBJECTS['ifName'] + (index, )] = (OCTET_STRING, name.encode())
+        mib[MIB_OBJECTS['ifAlias'] + (index, )] = (OCTET_STRING, b'')
+        mib[MIB_OBJECTS['ifMtu'] + (index, )] = (INTEGER, 1500)
+        mib[MIB_OBJECTS['ifPhysAddress'] + (index, )] = (OCTET_STRING, bytes([0, 0x11, 0x22, 0x33, index // 256, index % 256]))
+        mib[MIB_OBJECTS['ifAdminStatus'] + (index, )] = (INTEGER, 1)
+        mib[MIB_OBJECTS['ifOperStatus'] + (index, )] = (INTEGER, 1)
+        mib[MIB_OBJECTS['ifSpeed'] + (index, )] = (GAUGE32, 1000000000)
+    for vid, name in vlan_rows:
+        mib[MIB_OBJECTS['dot1qVlanStaticName'] + (vid, )] = (OCTET_STRING, name.encode())
+
+    for port in range(1, ports + 1):
+        mib[MIB_OBJECTS['dot1dBasePortIfIndex'] + (port, )] = (INTEGER, port)
+        mib[MIB_OBJECTS['lldpLocPortId'] + (port, )] = (OCTET_STRING, str(port).encode())
+    for mac, port, vid, address in _table_entries(mac_entries, ports, vlans):
+        mib[MIB_OBJECTS['dot1qTpFdbPort'] + (vid, ) + tuple(mac)] = (INTEGER, port)
+        mib[MIB_OBJECTS['dot1qTpFdbStatus'] + (vid, ) + tuple(mac)] = (INTEGER, 3)
+        arp_index = (4096 + vid - 99, ) + tuple(int(n) for n in address.split('.'))
+        mib[MIB_OBJECTS['ipNetToMediaPhysAddress'] + arp_index] = (OCTET_STRING, mac)
+        mib[MIB_OBJECTS['ipNetToMediaType'] + arp_index] = (INTEGER, 3)
+    for port in (1, 2):
+        index = (0, port, 1)
+        mib[MIB_OBJECTS['lldpRemChassisId'] + index] = (OCTET_STRING, bytes([0, 0x1c, 0x73, 0, 0x99, 0x99]))
+        mib[MIB_OBJECTS['lldpRemPortId'] + index] = (OCTET_STRING, f"Ethernet{port}".encode())
+        mib[MIB_OBJECTS['lldpRemPortDesc'] + index] = (OCTET_STRING, b'uplink')
+        mib[MIB_OBJECTS['lldpRemSysName'] + index] = (OCTET_STRING, f"{hostname}-peer".encode())
+    return SimulatedDevice(hostname, 'procurve', responses, mib, **kwargs)
+
+
+def _table_entries(count, ports, vlans):
+    ''' (mac, port, vid, IPv4 address) for count generated hosts spread over the ports and VLANs from 100 '''
+    for host in range(count):
+        vid = 100 + host % max(vlans, 1)
+        address = f"10.{vid // 256}.{vid % 256}.{10 + host // max(vlans, 1) % 240}"
+        mac = bytes([0x02, 0]) + host.to_bytes(4, 'big')
+        yield mac, 3 + host % max(ports - 2, 1), vid, address
+
+
+def device_from_capture(path, **kwargs):
+    ''' SimulatedDevice serving what was recorded in a capture archive '''
+    header, entries = read_archive(path)
+    responses = {}
+    for entry in entries:
+        if entry['method'] == 'run_commands':
+            if 'error' in entry:
+                responses[(entry['commands'][-1], entry['encoding'])] = CommandFailure(**entry['error'])
+                continue
+            for command, response in zip(entry['commands'], entry['responses']):
+                if entry['encoding'] == 'text':
+                    response = response['output']
+                responses.setdefault((command, entry['encoding']), response)
+        elif entry['method'] == 'send_command':
+            responses.setdefault(entry['command'], entry['output'])
+        elif entry['method'] == 'send_commands':
+            for command, output in zip(entry['commands'], entry['outputs']):
+                responses.setdefault(command, output)
+
+    # Answer SNMP with what the CLI returned for walkMIB, and the CLI from the MIB
+    mib = {}
+    for command in [c for c in responses if isinstance(c, str) and c.split()[0] in ('walkMIB', 'getMIB')]:
+        for line in responses.pop(command).splitlines():
+            match = re.match(r"^(\w+)((?:\.\d+)*) =\s?(.*)$", line)
+            if match and match.group(1) in MIB_OBJECTS:
+                oid = MIB_OBJECTS[match.group(1)] + tuple(int(n) for n in match.group(2).split('.') if n)
+                mib[oid] = (OCTET_STRING, match.group(3).encode())
+    return SimulatedDevice(header['hostname'], header['vendor'], responses, mib, **kwargs)
+
+
+def _system_mib(hostname, description):
+    return {
+        MIB_OBJECTS['sysDescr'] + (0, ): (OCTET_STRING, description.encode()),
+        MIB_OBJECTS['sysObjectID'] + (0, ): (OBJECT_IDENTIFIER, (1, 3, 6, 1, 4, 1, 11, 2, 3, 7, 11, 160)),
+        MIB_OBJECTS['sysUpTime'] + (0, ): (TIMETICKS, 123456),
+        MIB_OBJECTS['sysName'] + (0, ): (OCTET_STRING, hostname.encode()),
+    }
@@ -0,0 +1,387 @@
+''' Minimal SNMP v1/v2c message codec
+
+Just enough BER to build and parse GET, GETNEXT, GETBULK, RESPONSE and TRAP messages, shared by the
+device simulator, the trap listener and the SNMP collectors, without pulling in a full SNMP stack.
+
+Values are (tag, value) tuples, i.e. (OCTET_STRING, b'switch1'), (INTEGER, 1) or (NULL, None), OIDs
+are tuples of ints.
+
+SnmpClient is a small blocking v2c client on top of it, walking table columns with GETBULK:
+
+    client = SnmpClient('switch1.example.com', 'public')
+    for index, (port, status) in client.walk_columns(['dot1qTpFdbPort', 'dot1qTpFdbStatus']):
+        ...
+'''
+import itertools
+import random
+import socket
+from collections import namedtuple
+
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE = 0x30
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+OPAQUE = 0x44
+COUNTER64 = 0x46
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+GET_RESPONSE = 0xA2
+SET_REQUEST = 0xA3
+TRAP_V1 = 0xA4
+GET_BULK_REQUEST = 0xA5
+INFORM_REQUEST = 0xA6
+TRAP_V2 = 0xA7
+
+VERSION_1 = 0
+VERSION_2C = 1
+
+NO_ERROR = 0
+TOO_BIG = 1
+NO_SUCH_NAME = 2
+GEN_ERR = 5
+
+UNSIGNED_TAGS = {COUNTER32, GAUGE32, TIMETICKS, COUNTER64}
+EXCEPTION_TAGS = {NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW}
+
+# Objects the helpers use, by the names ProCurve's walkMIB and getMIB accept
+MIB_OBJECTS = {
+    'sysDescr': (1, 3, 6, 1, 2, 1, 1, 1),
+    'sysObjectID': (1, 3, 6, 1, 2, 1, 1, 2),
+    'sysUpTime': (1, 3, 6, 1, 2, 1, 1, 3),
+    'sysName': (1, 3, 6, 1, 2, 1, 1, 5),
+    'ifIndex': (1, 3, 6, 1, 2, 1, 2, 2, 1, 1),
+    'ifDescr': (1, 3, 6, 1, 2, 1, 2, 2, 1, 2),
+    'ifMtu': (1, 3, 6, 1, 2, 1, 2, 2, 1, 4),
+    'ifSpeed': (1, 3, 6, 1, 2, 1, 2, 2, 1, 5),
+    'ifPhysAddress': (1, 3, 6, 1, 2, 1, 2, 2, 1, 6),
+    'ifAdminStatus': (1, 3, 6, 1, 2, 1, 2, 2, 1, 7),
+    'ifOperStatus': (1, 3, 6, 1, 2, 1, 2, 2, 1, 8),
+    'ifName': (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 1),
+    'ifAlias': (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 18),
+    'dot1dBasePortIfIndex': (1, 3, 6, 1, 2, 1, 17, 1, 4, 1, 2),
+    'dot1dTpFdbPort': (1, 3, 6, 1, 2, 1, 17, 4, 3, 1, 2),
+    'dot1qTpFdbPort': (1, 3, 6, 1, 2, 1, 17, 7, 1, 2, 2, 1, 2),
+    'dot1qTpFdbStatus': (1, 3, 6, 1, 2, 1, 17, 7, 1, 2, 2, 1, 3),
+    'dot1qVlanStaticName': (1, 3, 6, 1, 2, 1, 17, 7, 1, 4, 3, 1, 1),
+    'ipNetToMediaPhysAddress': (1, 3, 6, 1, 2, 1, 4, 22, 1, 2),
+    'ipNetToMediaType': (1, 3, 6, 1, 2, 1, 4, 22, 1, 4),
+    'lldpRemChassisId': (1, 0, 8802, 1, 1, 2, 1, 4, 1, 1, 5),
+    'lldpRemPortId': (1, 0, 8802, 1, 1, 2, 1, 4, 1, 1, 7),
+    'lldpRemPortDesc': (1, 0, 8802, 1, 1, 2, 1, 4, 1, 1, 8),
+    'lldpRemSysName': (1, 0, 8802, 1, 1, 2, 1, 4, 1, 1, 9),
+    'lldpLocPortId': (1, 0, 8802, 1, 1, 2, 1, 3, 7, 1, 3),
+    'snmpTrapOID': (1, 3, 6, 1, 6, 3, 1, 1, 4, 1),
+}
+
+# Objects holding MAC addresses, which walkMIB shows as hex whatever the bytes are
+HEX_OBJECTS = frozenset(['ifPhysAddress', 'ipNetToMediaPhysAddress'])
+
+Message = namedtuple('Message', ['version', 'community', 'pdu_type', 'request_id', 'error_status', 'error_index',
+                                 'varbinds'])
+TrapV1 = namedtuple('TrapV1', ['version', 'community', 'enterprise', 'agent_address', 'generic_trap', 'specific_trap',
+                               'timestamp', 'varbinds'])
+
+
+def parse_oid(oid):
+    ''' '1.3.6.1.2.1.1.1.0', 'sysDescr.0' or 'ifName' to a tuple of ints '''
+    if isinstance(oid, tuple):
+        return oid
+    name, _, rest = oid.partition('.')
+    if name in MIB_OBJECTS:
+        return MIB_OBJECTS[name] + tuple(int(n) for n in rest.split('.') if n)
+    return tuple(int(n) for n in oid.strip('.').split('.'))
+
+
+def format_oid(oid):
+    return '.'.join(str(n) for n in oid)
+
+
+def encode_message(community, pdu_type, request_id, varbinds, error_status=0, error_index=0, version=VERSION_2C):
+    ''' BER encoded SNMP message, for GETBULK error_status and error_index are non-repeaters and
+    max-repetitions '''
+    if isinstance(community, str):
+        community = community.encode()
+    pdu = _tlv(pdu_type, b''.join([
+        _encode_integer(INTEGER, request_id),
+        _encode_integer(INTEGER, error_status),
+        _encode_integer(INTEGER, error_index),
+        _encode_varbinds(varbinds),
+    ]))
+    return _tlv(SEQUENCE, _encode_integer(INTEGER, version) + _tlv(OCTET_STRING, community) + pdu)
+
+
+def decode_message(data):
+    ''' Message or TrapV1 from a BER encoded SNMP message, raises ValueError if it can't be parsed '''
+    try:
+        tag, message, _ = _read_tlv(data, 0)
+        if tag != SEQUENCE:
+            raise ValueError(f"SNMP message should be a sequence, not {tag:#x}")
+        _, version, offset = _read_tlv(message, 0)
+        _, community, offset = _read_tlv(message, offset)
+        pdu_type, pdu, _ = _read_tlv(message, offset)
+        version = _decode_integer(INTEGER, version)
+
+        if pdu_type == TRAP_V1:
+            _, enterprise, offset = _read_tlv(pdu, 0)
+            _, agent_address, offset = _read_tlv(pdu, offset)
+            fields = []
+            for _ in range(3):
+                tag, value, offset = _read_tlv(pdu, offset)
+                fields.append(_decode_integer(tag, value))
+            _, varbinds, _ = _read_tlv(pdu, offset)
+            return TrapV1(version, community, _decode_oid(enterprise), '.'.join(str(b) for b in agent_address),
+                          fields[0], fields[1], fields[2], _decode_varbinds(varbinds))
+
+        fields = []
+        offset = 0
+        for _ in range(3):
+            tag, value, offset = _read_tlv(pdu, offset)
+            fields.append(_decode_integer(tag, value))
+        _, varbinds, _ = _read_tlv(pdu, offset)
+        return Message(version, community, pdu_type, fields[0], fields[1], fields[2], _decode_varbinds(varbinds))
+    except (IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Truncated or malformed SNMP message: {e}") from e
+
+
+def encode_value(tag, value):
+    if tag in (INTEGER, ) or tag in UNSIGNED_TAGS:
+        return _encode_integer(tag, value)
+    if tag == OCTET_STRING or tag == OPAQUE:
+        return _tlv(tag, value.encode() if isinstance(value, str) else value)
+    if tag == OBJECT_IDENTIFIER:
+        return _tlv(tag, _encode_oid(parse_oid(value)))
+    if tag == IP_ADDRESS:
+        return _tlv(tag, bytes(int(n) for n in value.split('.')))
+    if tag == NULL or tag in EXCEPTION_TAGS:
+        return _tlv(tag, b'')
+    raise ValueError(f"Unsupported SNMP value type {tag:#x}")
+
+
+def decode_value(tag, payload):
+    if tag == INTEGER or tag in UNSIGNED_TAGS:
+        return _decode_integer(tag, payload)
+    if tag == OBJECT_IDENTIFIER:
+        return _decode_oid(payload)
+    if tag == IP_ADDRESS:
+        return '.'.join(str(b) for b in payload)
+    if tag == NULL or tag in EXCEPTION_TAGS:
+        return None
+    return bytes(payload)
+
+
+def display_value(tag, value, hex_octets=False):
+    ''' value as walkMIB would show it, octet strings as text or space separated hex
+
+    With hex_octets, i.e. for the MAC addresses of HEX_OBJECTS, octet strings are always shown as hex, even
+    if their bytes happen to be printable.
+    '''
+    if tag == OCTET_STRING:
+        if hex_octets:
+            return value.hex(' ')
+        try:
+            text = value.decode('ascii')
+            if text.isprintable():
+                return text
+        except UnicodeDecodeError:
+            pass
+        return value.hex(' ')
+    if tag == OBJECT_IDENTIFIER:
+        return format_oid(value)
+    if value is None:
+        return ''
+    return str(value)
+
+
+class SnmpError(Exception):
+    pass
+
+
+class SnmpClient:
+    ''' Blocking SNMP v2c client for GET and column walks
+
+    Requests are retried on timeout, and GETBULK max-repetitions is halved when the agent answers
+    tooBig.
+    '''
+
+    def __init__(self, host, community='public', port=161, timeout=2.0, retries=2, max_repetitions=25):
+        self.host = host
+        self.community = community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self._request_ids = itertools.count(random.randint(1, 1 << 30))
+
+    def request(self, pdu_type, varbinds, error_status=0, error_index=0):
+        ''' send a request PDU and return the response Message, raises SnmpError on timeout or error '''
+        request_id = next(self._request_ids) & 0x7FFFFFFF
+        data = encode_message(self.community, pdu_type, request_id, varbinds, error_status, error_index)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            for _ in range(self.retries + 1):
+                sock.sendto(data, (self.host, self.port))
+                try:
+                    response = self._receive(sock, request_id)
+                except socket.timeout:
+                    continue
+                if response.error_status not in (NO_ERROR, TOO_BIG):
+                    raise SnmpError(f"{self.host} answered error status {response.error_status} "
+                                    f"at varbind {response.error_index}")
+                return response
+        raise SnmpError(f"No response from {self.host}:{self.port} after {self.retries + 1} attempts")
+
+    def get(self, oids):
+        ''' {oid: (tag, value)} for oids, missing instances have the noSuchInstance tag '''
+        oids = [parse_oid(oid) for oid in oids]
+        response = self.request(GET_REQUEST, [(oid, (NULL, None)) for oid in oids])
+        return dict(response.varbinds)
+
+    def walk_columns(self, columns, max_repetitions=None):
+        ''' Yield (index, [value per column]) for the rows of table columns, in index order
+
+        The columns are walked in lockstep with GETBULK, so only the rows of the current response are
+        held in memory. Rows missing from a column have None for its value, rows missing from the first
+        column are skipped. Values are the decoded values without their tags.
+        '''
+        columns = [parse_oid(column) for column in columns]
+        max_repetitions = max_repetitions or self.max_repetitions
+        cursors = list(columns)
+        active = [True] * len(columns)
+        # Values a column returned ahead of the first one, by index
+        ahead = [{} for _ in columns]
+        last = None
+
+        while active[0] or ahead[0]:
+            requested = [position for position in range(len(columns)) if active[position]]
+            if requested:
+                response = self.request(GET_BULK_REQUEST, [(cursors[position], (NULL, None)) for position in requested],
+                                        0, max_repetitions)
+                if response.error_status == TOO_BIG and max_repetitions > 1:
+                    max_repetitions //= 2
+                    continue
+                varbinds = response.varbinds
+                if not varbinds:
+                    break
+                for row in range(len(varbinds) // len(requested)):
+                    for offset, position in enumerate(requested):
+                        if not active[position]:
+                            continue
+                        oid, (tag, value) = varbinds[row * len(requested) + offset]
+                        base = columns[position]
+                        if tag in EXCEPTION_TAGS or oid[:len(base)] != base or oid <= cursors[position]:
+                            active[position] = False
+                            continue
+                        ahead[position][oid[len(base):]] = value
+                        cursors[position] = oid
+
+            # A row is complete once every other column has walked past its index or finished
+            for index in sorted(ahead[0]):
+                if any(active[position] and cursors[position][len(columns[position]):] < index
+                       for position in range(1, len(columns))):
+                    break
+                yield index, [column.pop(index, None) for column in ahead]
+                last = index
+            if last is not None:
+                for column in ahead[1:]:
+                    for index in [index for index in column if index <= last]:
+                        del column[index]
+
+    def _receive(self, sock, request_id):
+        while True:
+            data, _ = sock.recvfrom(65535)
+            try:
+                response = decode_message(data)
+            except ValueError:
+                continue
+            if isinstance(response, Message) and response.request_id == request_id:
+                return response
+
+
+def _encode_length(length):
+    if length < 0x80:
+        return bytes([length])
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(encoded)]) + encoded
+
+
+def _tlv(tag, payload):
+    return bytes([tag]) + _encode_length(len(payload)) + payload
+
+
+def _read_tlv(data, offset):
+    ''' return (tag, payload, offset after the value) '''
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    if offset + length > len(data):
+        raise IndexError("value runs past the end of the message")
+    return tag, data[offset:offset + length], offset + length
+
+
+def _encode_integer(tag, value):
+    if tag in UNSIGNED_TAGS:
+        payload = value.to_bytes(max(1, (value.bit_length() + 8) // 8), 'big')
+    else:
+        payload = value.to_bytes(max(1, (value + (value < 0)).bit_length() // 8 + 1), 'big', signed=True)
+    return _tlv(tag, payload)
+
+
+def _decode_integer(tag, payload):
+    return int.from_bytes(payload, 'big', signed=tag == INTEGER)
+
+
+def _encode_oid(oid):
+    if len(oid) < 2:
+        oid = tuple(oid) + (0, ) * (2 - len(oid))
+    encoded = bytearray([oid[0] * 40 + oid[1]])
+    for sub_id in oid[2:]:
+        chunk = [sub_id & 0x7F]
+        sub_id >>= 7
+        while sub_id:
+            chunk.append(0x80 | (sub_id & 0x7F))
+            sub_id >>= 7
+        encoded.extend(reversed(chunk))
+    return bytes(encoded)
+
+
+def _decode_oid(payload):
+    if not payload:
+        return ()
+    oid = [payload[0] // 40, payload[0] % 40]
+    sub_id = 0
+    for byte in payload[1:]:
+        sub_id = (sub_id << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            oid.append(sub_id)
+            sub_id = 0
+    return tuple(oid)
+
+
+def _encode_varbinds(varbinds):
+    return _tlv(SEQUENCE, b''.join(
+        _tlv(SEQUENCE, _tlv(OBJECT_IDENTIFIER, _encode_oid(parse_oid(oid))) + encode_value(*value))
+        for oid, value in varbinds))
+
+
+def _decode_varbinds(payload):
+    varbinds = []
+    offset = 0
+    while offset < len(payload):
+        _, varbind, offset = _read_tlv(payload, offset)
+        _, oid, value_offset = _read_tlv(varbind, 0)
+        tag, value, _ = _read_tlv(varbind, value_offset)
+        varbinds.append((_decode_oid(oid), (tag, decode_value(tag, value))))
+    return varbinds
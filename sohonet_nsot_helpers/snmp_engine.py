@@ -0,0 +1,153 @@
+''' asyncio SNMP v2c engine for walking many devices at once
+
+One UDP socket serves every device on the event loop, responses are matched to requests by request
+ID. Table columns are walked with GETBULK, each column as its own chain of requests so the columns of
+a table are walked in parallel, with at most window requests in flight per device:
+
+    async with SnmpEngine(community='public', window=4) as engine:
+        columns = await engine.walk_columns('switch1.example.com', ['ifName', 'ifAlias', 'ifMtu'])
+
+max-repetitions starts at max_repetitions and is tuned per device, halved when a device answers tooBig
+or a request times out, and grown back towards max_repetitions as requests succeed.
+'''
+import asyncio
+import itertools
+import random
+
+from sohonet_nsot_helpers.snmp import (EXCEPTION_TAGS, GET_BULK_REQUEST, GET_REQUEST, NO_ERROR, NULL, TOO_BIG, Message,
+                                       SnmpError, decode_message, encode_message, parse_oid)
+
+
+class _SnmpProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def datagram_received(self, data, address):
+        self.engine._response_received(data)
+
+    def error_received(self, exc):
+        pass
+
+
+class SnmpEngine:
+    ''' Shared asyncio SNMP v2c client, use as an async context manager or call start() and close() '''
+
+    def __init__(self, community='public', port=161, timeout=2.0, retries=2, max_repetitions=50, window=4):
+        self.community = community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self.window = window
+        self.requests = 0
+        self.timeouts = 0
+        self._transport = None
+        self._pending = {}
+        self._windows = {}
+        self._repetitions = {}
+        self._request_ids = itertools.count(random.randint(1, 1 << 30))
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(lambda: _SnmpProtocol(self),
+                                                                 local_addr=('0.0.0.0', 0))
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending = {}
+
+    async def request(self, host, pdu_type, varbinds, error_status=0, error_index=0, port=None, community=None):
+        ''' send a request PDU to host and return the response Message, raises SnmpError on timeout or
+        error '''
+        target = (host, port or self.port)
+        window = self._windows.get(target)
+        if window is None:
+            window = self._windows[target] = asyncio.Semaphore(self.window)
+        async with window:
+            for _ in range(self.retries + 1):
+                request_id = next(self._request_ids) & 0x7FFFFFFF
+                future = asyncio.get_running_loop().create_future()
+                self._pending[request_id] = future
+                self._transport.sendto(
+                    encode_message(community or self.community, pdu_type, request_id, varbinds, error_status,
+                                   error_index), target)
+                self.requests += 1
+                try:
+                    response = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    self._tune(target, shrink=True)
+                    continue
+                finally:
+                    self._pending.pop(request_id, None)
+                if response.error_status not in (NO_ERROR, TOO_BIG):
+                    raise SnmpError(f"{host} answered error status {response.error_status} "
+                                    f"at varbind {response.error_index}")
+                return response
+        raise SnmpError(f"No response from {host}:{target[1]} after {self.retries + 1} attempts")
+
+    async def get(self, host, oids, port=None, community=None):
+        ''' {oid: (tag, value)} for oids, missing instances have the noSuchInstance tag '''
+        oids = [parse_oid(oid) for oid in oids]
+        response = await self.request(host, GET_REQUEST, [(oid, (NULL, None)) for oid in oids], port=port,
+                                      community=community)
+        return dict(response.varbinds)
+
+    async def walk(self, host, column, port=None, community=None):
+        ''' [(index, (tag, value))] of a table column, walked with GETBULK '''
+        column = parse_oid(column)
+        target = (host, port or self.port)
+        rows = []
+        cursor = column
+        while True:
+            repetitions = self._repetitions.get(target, self.max_repetitions)
+            response = await self.request(host, GET_BULK_REQUEST, [(cursor, (NULL, None))], 0, repetitions, port=port,
+                                          community=community)
+            self._tune(target, shrink=response.error_status == TOO_BIG)
+            if response.error_status == TOO_BIG:
+                if repetitions == 1:
+                    raise SnmpError(f"{host} answered tooBig for a single repetition of {cursor}")
+                continue
+            if not response.varbinds:
+                return rows
+            for oid, (tag, value) in response.varbinds:
+                if tag in EXCEPTION_TAGS or oid[:len(column)] != column or oid <= cursor:
+                    return rows
+                rows.append((oid[len(column):], (tag, value)))
+                cursor = oid
+
+    async def walk_columns(self, host, columns, port=None, community=None):
+        ''' {column: [(index, (tag, value))]} for table columns, walked in parallel '''
+        walks = await asyncio.gather(*(self.walk(host, column, port=port, community=community) for column in columns))
+        return dict(zip(columns, walks))
+
+    def _tune(self, target, shrink):
+        ''' halve max-repetitions for target on tooBig or a timeout, otherwise grow it back by a quarter '''
+        repetitions = self._repetitions.get(target, self.max_repetitions)
+        if shrink:
+            self._repetitions[target] = max(1, repetitions // 2)
+        elif repetitions < self.max_repetitions:
+            self._repetitions[target] = min(self.max_repetitions, repetitions + max(1, repetitions // 4))
+
+    def _response_received(self, data):
+        try:
+            response = decode_message(data)
+        except ValueError:
+            return
+        if not isinstance(response, Message):
+            return
+        future = self._pending.get(response.request_id)
+        if future is not None and not future.done():
+            future.set_result(response)
@@ -0,0 +1,256 @@
+''' Sharded, checkpointed collection sweeps across several worker processes
+
+Every worker gets the same list of DeviceJobs and a sweep ID. Devices are split between the live
+workers with a consistent hash ring, and each device is checkpointed when it finishes, so a sweep that
+is interrupted picks up where it left off when it is run again with the same sweep ID:
+
+    worker = SweepWorker('nightly-2024-06-01', socket.gethostname(), jobs)
+    for job, results, error in worker.run(collect):
+        ...  # sync results
+
+Workers heartbeat into the checkpoint store. When one joins or stops heartbeating the ring is rebuilt
+and its share of the remaining devices moves to the others, devices a departed worker had claimed are
+taken over once it is no longer live. run_local_sweep runs a sweep with several local worker processes.
+
+The store is a SQLite database, $SOHONET_SWEEP_CHECKPOINTS or ~/.cache/sohonet_nsot_helpers/sweeps.sqlite,
+so the workers of a sweep have to run on the same host. SQLite's locking can't be relied on over NFS or
+SMB, so don't put the database on a shared filesystem to spread workers across nodes. It uses a rollback
+journal rather than WAL, which needs memory shared between the processes using it.
+'''
+import bisect
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from sohonet_nsot_helpers.scheduler import FleetScheduler
+
+DONE = 'done'
+FAILED = 'failed'
+RUNNING = 'running'
+
+
+class HashRing:
+    ''' Consistent hash ring of workers, each placed at replicas points so devices spread evenly and only
+    the devices of a worker that joins or leaves change owner '''
+
+    def __init__(self, workers=(), replicas=64):
+        self.replicas = replicas
+        self._points = []
+        self._owners = {}
+        for worker in workers:
+            self.add(worker)
+
+    def add(self, worker):
+        for replica in range(self.replicas):
+            point = _ring_hash(f"{worker}#{replica}")
+            bisect.insort(self._points, point)
+            self._owners[point] = worker
+
+    def remove(self, worker):
+        for replica in range(self.replicas):
+            point = _ring_hash(f"{worker}#{replica}")
+            if self._owners.get(point) == worker:
+                del self._owners[point]
+                self._points.remove(point)
+
+    def owner(self, device):
+        ''' worker that device belongs to, None if the ring is empty '''
+        if not self._points:
+            return None
+        position = bisect.bisect(self._points, _ring_hash(device)) % len(self._points)
+        return self._owners[self._points[position]]
+
+    def workers(self):
+        return sorted(set(self._owners.values()))
+
+
+def _ring_hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class CheckpointStore:
+    ''' Per device checkpoints and worker heartbeats of sweeps, in a SQLite database on the local host '''
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get(
+            'SOHONET_SWEEP_CHECKPOINTS',
+            os.path.join(os.path.expanduser('~'), '.cache', 'sohonet_nsot_helpers', 'sweeps.sqlite'))
+        self._local = threading.local()
+
+    def heartbeat(self, sweep_id, worker):
+        with self._connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO workers (sweep, worker, heartbeat) VALUES (?, ?, ?)",
+                               (sweep_id, worker, time.time()))
+
+    def leave(self, sweep_id, worker):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM workers WHERE sweep = ? AND worker = ?", (sweep_id, worker))
+
+    def live_workers(self, sweep_id, timeout):
+        ''' workers of the sweep that have heartbeated within timeout seconds '''
+        rows = self._connection().execute("SELECT worker FROM workers WHERE sweep = ? AND heartbeat >= ?",
+                                          (sweep_id, time.time() - timeout)).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def checkpoints(self, sweep_id):
+        ''' {device: (status, worker, attempts)} '''
+        rows = self._connection().execute("SELECT device, status, worker, attempts FROM checkpoints WHERE sweep = ?",
+                                          (sweep_id, )).fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def claim(self, sweep_id, device, worker, heartbeat_timeout, max_attempts):
+        ''' mark device as running on worker, returns False if it is done, has failed max_attempts times or
+        is running on another worker that has heartbeated within heartbeat_timeout seconds '''
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT status, worker, attempts FROM checkpoints WHERE sweep = ? AND device = ?",
+                                     (sweep_id, device)).fetchone()
+            status, owner, attempts = row or (None, None, 0)
+            if status == DONE or attempts >= max_attempts and status == FAILED:
+                return False
+            if status == RUNNING and owner != worker:
+                # Checked within the transaction, the owner may have joined since this worker last looked
+                owner_live = connection.execute(
+                    "SELECT 1 FROM workers WHERE sweep = ? AND worker = ? AND heartbeat >= ?",
+                    (sweep_id, owner, time.time() - heartbeat_timeout)).fetchone()
+                if owner_live:
+                    return False
+            connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (sweep, device, status, worker, attempts, error, updated) "
+                "VALUES (?, ?, ?, ?, ?, NULL, ?)", (sweep_id, device, RUNNING, worker, attempts + 1, time.time()))
+            return True
+
+    def finish(self, sweep_id, device, worker, error=None):
+        ''' checkpoint device as done, or failed with error '''
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE checkpoints SET status = ?, worker = ?, error = ?, updated = ? WHERE sweep = ? AND device = ?",
+                (DONE if error is None else FAILED, worker, None if error is None else repr(error), time.time(),
+                 sweep_id, device))
+
+    def progress(self, sweep_id):
+        ''' Counter of device statuses in the sweep '''
+        return Counter(status for status, _, _ in self.checkpoints(sweep_id).values())
+
+    def reset(self, sweep_id):
+        ''' forget the sweep's checkpoints, so it runs from the start '''
+        with self._connection() as connection:
+            connection.execute("DELETE FROM checkpoints WHERE sweep = ?", (sweep_id, ))
+            connection.execute("DELETE FROM workers WHERE sweep = ?", (sweep_id, ))
+
+    def _connection(self):
+        connection, pid = getattr(self._local, 'connection', (None, None))
+        if connection is None or pid != os.getpid():
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Autocommit, transactions are started explicitly where they're needed
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # The journal mode is kept in the database, so this also takes one created in WAL mode out of it
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.execute("CREATE TABLE IF NOT EXISTS checkpoints (sweep TEXT, device TEXT, status TEXT, "
+                               "worker TEXT, attempts INTEGER, error TEXT, updated REAL, PRIMARY KEY (sweep, device))")
+            connection.execute("CREATE TABLE IF NOT EXISTS workers (sweep TEXT, worker TEXT, heartbeat REAL, "
+                               "PRIMARY KEY (sweep, worker))")
+            self._local.connection = (connection, os.getpid())
+        return connection
+
+
+class SweepWorker:
+    ''' One worker of a sweep, collecting the unfinished devices it owns on the hash ring
+
+    Devices are claimed and collected batch_size at a time with a FleetScheduler, and the ring is rebuilt
+    from the live workers before each batch. A worker keeps going until every device of the sweep is done
+    or has failed max_attempts times, waiting for devices other workers are running in case they leave.
+    '''
+
+    def __init__(self, sweep_id, name, jobs, store=None, scheduler=None, replicas=64, heartbeat_interval=5.0,
+                 heartbeat_timeout=30.0, max_attempts=3, batch_size=50, poll_interval=1.0):
+        self.sweep_id = sweep_id
+        self.name = name
+        self.jobs = jobs
+        self.store = store or CheckpointStore()
+        self.scheduler = scheduler or FleetScheduler()
+        self.replicas = replicas
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    def run(self, collect):
+        ''' Yield (job, {getter: result}, error) for each device this worker collects, see FleetScheduler.run '''
+        stop = threading.Event()
+        self.store.heartbeat(self.sweep_id, self.name)
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stop, ), daemon=True)
+        heartbeat.start()
+        try:
+            while True:
+                live = self.store.live_workers(self.sweep_id, self.heartbeat_timeout)
+                if self.name not in live:
+                    live.append(self.name)
+                unfinished = self.unfinished()
+                if not unfinished:
+                    return
+                ring = HashRing(live, self.replicas)
+                claimed = []
+                for job in unfinished:
+                    if len(claimed) >= self.batch_size:
+                        break
+                    if ring.owner(job.name) == self.name and self.store.claim(
+                            self.sweep_id, job.name, self.name, self.heartbeat_timeout, self.max_attempts):
+                        claimed.append(job)
+                if not claimed:
+                    # The rest belong to other workers, wait in case they leave and their devices move here
+                    time.sleep(self.poll_interval)
+                    continue
+                for job, results, error in self.scheduler.run(claimed, collect):
+                    self.store.finish(self.sweep_id, job.name, self.name, error)
+                    yield job, results, error
+        finally:
+            stop.set()
+            heartbeat.join()
+            self.store.leave(self.sweep_id, self.name)
+
+    def unfinished(self):
+        ''' jobs not yet done and not given up on after max_attempts failures '''
+        checkpoints = self.store.checkpoints(self.sweep_id)
+        unfinished = []
+        for job in self.jobs:
+            status, _, attempts = checkpoints.get(job.name, (None, None, 0))
+            if status == DONE or status == FAILED and attempts >= self.max_attempts:
+                continue
+            unfinished.append(job)
+        return unfinished
+
+    def _heartbeat(self, stop):
+        while not stop.wait(self.heartbeat_interval):
+            self.store.heartbeat(self.sweep_id, self.name)
+
+
+def run_local_sweep(sweep_id, jobs, collect, workers=4, store_path=None, **worker_kwargs):
+    ''' run a sweep with several local worker processes and return its progress Counter
+
+    collect and the jobs must be picklable, results are only checkpointed, not returned.
+    '''
+    processes = [
+        multiprocessing.Process(
+            target=_local_worker,
+            args=(sweep_id, f"local-{os.getpid()}-{number}", jobs, collect, store_path, worker_kwargs),
+        )
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return CheckpointStore(store_path).progress(sweep_id)
+
+
+def _local_worker(sweep_id, name, jobs, collect, store_path, worker_kwargs):
+    worker = SweepWorker(sweep_id, name, jobs, CheckpointStore(store_path), **worker_kwargs)
+    for _ in worker.run(collect):
+        pass
@@ -0,0 +1,29 @@
+import pytest
+from napalm_procurve.procurve import ProcurveDriver
+
+from sohonet_nsot_helpers.napalm import procurve_sessions
+from sohonet_nsot_helpers.napalm.capabilities import REGISTRY
+from sohonet_nsot_helpers.simulator import Simulator
+
+
+@pytest.fixture(autouse=True)
+def isolated_registry(tmp_path, monkeypatch):
+    ''' keep what tests learn out of the user's capability registry '''
+    monkeypatch.setattr(REGISTRY, 'path', str(tmp_path / 'capabilities.json'))
+    monkeypatch.setattr(REGISTRY, '_data', None)
+
+
+@pytest.fixture
+def simulator():
+    with Simulator() as simulator:
+        yield simulator
+    procurve_sessions.SESSION_POOL.close_all()
+
+
+@pytest.fixture
+def pooled_procurve(monkeypatch):
+    ''' ProcurveDriver with the pooled session helpers patched in '''
+    monkeypatch.setattr(ProcurveDriver, 'open', procurve_sessions.procurve_open)
+    monkeypatch.setattr(ProcurveDriver, 'close', procurve_sessions.procurve_close)
+    monkeypatch.setattr(ProcurveDriver, '_send_command', procurve_sessions.procurve_send_command)
+    return ProcurveDriver
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from sohonet_nsot_helpers.cache import MISSING, Cache, LocalRedis, LRUCache, RedisStore, SQLiteStore
+
+
+@pytest.fixture(params=['memory', 'tiered'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        return Cache([LRUCache()])
+    return Cache([LRUCache(), SQLiteStore(str(tmp_path / 'cache.sqlite')), RedisStore(LocalRedis())])
+
+
+def test_lru_add_evicts_to_max_entries():
+    lru = LRUCache(max_entries=3)
+    for key in 'abcde':
+        assert lru.add(key, key)
+    assert [key for key in 'abcde' if lru.get(key) is not MISSING] == ['c', 'd', 'e']
+    assert not lru.add('e', 'again')
+
+
+def test_compute_runs_once_for_concurrent_callers(cache):
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+
+def test_compute_can_wait_on_other_keys_computed_in_other_threads(cache):
+    ''' compute isn't run under a lock, so it may wait on threads computing keys of its own '''
+
+    def compute(depth):
+        if depth == 0:
+            return 0
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(cache.get_or_compute(f"key{depth - 1}", lambda: compute(depth - 1))))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+        return results[0] + 1
+
+    assert cache.namespace('nested').get_or_compute('key100', lambda: compute(100)) == 100
+
+
+def test_computing_the_same_key_within_compute_raises(cache):
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('key', lambda: cache.get_or_compute('key', lambda: 'value'))
+    assert cache.get_or_compute('key', lambda: 'value') == 'value'
+
+
+def test_waiters_get_the_computing_threads_error(cache):
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise ValueError('failed')
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_compute('key', compute)
+        except ValueError as e:
+            errors.append(e)
+
+    first = threading.Thread(target=call)
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=call)
+    second.start()
+    time.sleep(0.1)
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert len(errors) == 2
+    assert cache.get('key') is None
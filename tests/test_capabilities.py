@@ -0,0 +1,73 @@
+import json
+import time
+
+import pytest
+from napalm.eos.eos import EOSDriver
+
+from sohonet_nsot_helpers.napalm import eos_helpers
+from sohonet_nsot_helpers.napalm.capabilities import SUPPORTED, UNSUPPORTED, CapabilityRegistry
+from sohonet_nsot_helpers.simulator import CommandFailure, generate_eos_device
+
+KEY = 'DCS-7050SX3-48YC8|4.28.3M'
+
+
+def test_results_expire(tmp_path):
+    registry = CapabilityRegistry(tmp_path / 'capabilities.json', ttl=0.05)
+    registry.record(KEY, 'show mpls interface', UNSUPPORTED)
+    assert registry.status(KEY, 'show mpls interface') == UNSUPPORTED
+    assert registry.ordered(KEY, ['show mpls interface', 'show ip']) == ['show ip', 'show mpls interface']
+    time.sleep(0.06)
+    assert registry.status(KEY, 'show mpls interface') is None
+    assert CapabilityRegistry(tmp_path / 'capabilities.json').status(KEY, 'show mpls interface') == UNSUPPORTED
+
+
+def test_untimestamped_results_are_relearned(tmp_path):
+    path = tmp_path / 'capabilities.json'
+    path.write_text(json.dumps({'platforms': {KEY: {'show ip': 'truncated'}}, 'devices': {}}))
+    registry = CapabilityRegistry(path)
+    assert registry.status(KEY, 'show ip') is None
+    registry.record(KEY, 'show ip', SUPPORTED)
+    assert CapabilityRegistry(path).status(KEY, 'show ip') == SUPPORTED
+
+
+def test_most_recent_result_wins_across_processes(tmp_path):
+    path = tmp_path / 'capabilities.json'
+    first = CapabilityRegistry(path)
+    second = CapabilityRegistry(path)
+    first.record(KEY, 'show ip', UNSUPPORTED)
+    second.record(KEY, 'show ip', SUPPORTED)
+    first.record(KEY, 'show interfaces config', SUPPORTED)
+    assert CapabilityRegistry(path).status(KEY, 'show ip') == SUPPORTED
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = CapabilityRegistry(tmp_path / 'capabilities.json')
+    monkeypatch.setattr(eos_helpers, 'REGISTRY', registry)
+    return registry
+
+
+def eos_driver(simulator, device):
+    simulator.add_device(device)
+    driver = EOSDriver(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args(device.hostname))
+    driver.open()
+    return driver
+
+
+def test_mpls_failing_on_one_device_is_not_recorded(simulator, registry):
+    device = generate_eos_device('eos1', interfaces=4)
+    device.responses[('show mpls interface', 'json')] = CommandFailure(1000, 'MPLS is not configured')
+    interfaces = eos_helpers.eos_get_interfaces(eos_driver(simulator, device))
+    assert not any(values['mpls_enabled'] for values in interfaces.values())
+    assert registry.status(KEY, 'show mpls interface') is None
+
+
+def test_invalid_mpls_command_is_recorded(simulator, registry):
+    eos_helpers.eos_get_interfaces(eos_driver(simulator, generate_eos_device('eos1', interfaces=4)))
+    assert registry.status(KEY, 'show mpls interface') == UNSUPPORTED
+
+
+def test_running_config_support_is_recorded_on_first_contact(simulator, registry):
+    assert eos_helpers.get_running_config_tree(eos_driver(simulator, generate_eos_device('eos1'))) is None
+    assert registry.device_key('127.0.0.1') == KEY
+    assert registry.status(KEY, 'show running-config | json') == UNSUPPORTED
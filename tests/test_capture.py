@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+from napalm.eos.eos import EOSDriver
+
+from sohonet_nsot_helpers.napalm import eos_helpers, procurve_helpers
+from sohonet_nsot_helpers.napalm.capabilities import REGISTRY
+from sohonet_nsot_helpers.napalm.capture import capture, read_archive, replay_driver
+from sohonet_nsot_helpers.simulator import generate_eos_device, generate_procurve_device
+
+EOS_GETTERS = [eos_helpers.eos_get_interfaces, eos_helpers.eos_get_interfaces_ip, eos_helpers.eos_get_vlans,
+               eos_helpers.eos_get_interfaces_vlans, eos_helpers.eos_get_static_routes]
+PROCURVE_GETTERS = [procurve_helpers.procurve_get_interfaces, procurve_helpers.procurve_get_interfaces_ip,
+                    procurve_helpers.procurve_get_vlans, procurve_helpers.procurve_get_interfaces_vlans]
+LATENCY = 0.02
+
+
+def collect(driver, getters):
+    return {getter.__name__: getter(driver) for getter in getters}
+
+
+def replay(path, getters, speed=0):
+    ''' replay the getters as a device seen for the first time, so the commands it rejected while
+    capturing are tried again rather than skipped '''
+    if os.path.exists(REGISTRY.path):
+        os.remove(REGISTRY.path)
+    REGISTRY._data = None
+    return collect(replay_driver(path, speed=speed), getters)
+
+
+@pytest.fixture(params=['eos', 'procurve'])
+def recorded(request, simulator, pooled_procurve, tmp_path):
+    ''' (path, getters, output) of a run against a simulated device with LATENCY per request '''
+    if request.param == 'eos':
+        simulator.add_device(generate_eos_device('eos1', interfaces=8, vlans=3, routes=2, latency=LATENCY))
+        driver = EOSDriver(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('eos1'))
+        getters = EOS_GETTERS
+    else:
+        simulator.add_device(generate_procurve_device('sw1', ports=8, vlans=3, latency=LATENCY))
+        driver = pooled_procurve(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('sw1'))
+        getters = PROCURVE_GETTERS
+    driver.open()
+    try:
+        with capture(driver, str(tmp_path)) as archive:
+            output = collect(driver, getters)
+    finally:
+        driver.close()
+    return archive.path, getters, output
+
+
+def test_replay_matches_the_recorded_run(recorded, simulator):
+    path, getters, output = recorded
+    simulator.stop()
+    assert replay(path, getters) == output
+
+
+def test_replay_keeps_the_recorded_latencies(recorded):
+    path, getters, output = recorded
+    _, entries = read_archive(path)
+    recorded_seconds = sum(entry['duration'] for entry in entries)
+    assert recorded_seconds >= LATENCY
+
+    start = time.monotonic()
+    assert replay(path, getters, speed=1.0) == output
+    assert time.monotonic() - start >= recorded_seconds * 0.9
+
+    start = time.monotonic()
+    assert replay(path, getters) == output
+    assert time.monotonic() - start < recorded_seconds / 2
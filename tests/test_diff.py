@@ -0,0 +1,86 @@
+import pytest
+
+from sohonet_nsot_helpers.diff import diff_records, index_device_records
+from sohonet_nsot_helpers.napalm.deadlines import PartialResult, is_partial, keep_partial
+from sohonet_nsot_helpers.normalize import Interface, record_hash
+
+DEVICES = 250
+INTERFACES = 400
+
+
+def device_interfaces(device, interfaces=INTERFACES):
+    return {
+        f"Ethernet{port}": Interface(f"Ethernet{port}", True, True, f"{device} port {port}", 10000, 9214,
+                                     f"00:1c:73:{device % 256:02x}:{port // 256:02x}:{port % 256:02x}", '10gbase-t',
+                                     False, ())
+        for port in range(1, interfaces + 1)
+    }
+
+
+@pytest.fixture(scope='module')
+def fleet():
+    ''' 100k interface records, keyed by (device, interface) '''
+    records = {}
+    for device in range(DEVICES):
+        records.update(index_device_records(f"sw{device}", device_interfaces(device)))
+    assert len(records) == DEVICES * INTERFACES
+    return records
+
+
+def test_unchanged_fleet_has_no_diff(fleet):
+    assert not diff_records(fleet, dict(fleet))
+
+
+def test_fleet_diff(fleet):
+    collected = dict(fleet)
+    updated = [('sw1', f"Ethernet{port}") for port in range(1, 301)]
+    for key in updated:
+        collected[key] = collected[key]._replace(description='changed')
+    deleted = [('sw2', f"Ethernet{port}") for port in range(1, INTERFACES + 1)]
+    for key in deleted:
+        del collected[key]
+    created = index_device_records('sw-new', device_interfaces(DEVICES, 200))
+    collected.update(created)
+
+    diff = diff_records(collected, fleet)
+    assert [key for key, _ in diff.update] == updated
+    assert [key for key, _ in diff.delete] == deleted
+    assert [key for key, _ in diff.create] == list(created)
+    batches = list(diff.batches(batch_size=128))
+    assert sum(len(batch) for _, batch in batches) == 300 + INTERFACES + 200
+    assert all(len(batch) <= 128 for _, batch in batches)
+
+
+def test_fleet_diff_against_hashes(fleet):
+    existing = {key: record_hash(record) for key, record in fleet.items()}
+    collected = dict(fleet)
+    collected['sw3', 'Ethernet7'] = collected['sw3', 'Ethernet7']._replace(mtu=1500)
+    diff = diff_records(collected, existing)
+    assert diff.update == [(('sw3', 'Ethernet7'), collected['sw3', 'Ethernet7'])]
+    assert not diff.create and not diff.delete
+
+
+def test_partial_devices_keep_records_that_werent_collected(fleet):
+    records = keep_partial(PartialResult({}, ['children']), device_interfaces(4, 100))
+    assert is_partial(records) and records.missing == ['children']
+    collected = {key: record for key, record in fleet.items() if key[0] not in ('sw4', 'sw5')}
+    collected.update(index_device_records('sw4', records))
+
+    diff = diff_records(collected, fleet, partial={'sw4'})
+    assert {key[0] for key, _ in diff.delete} == {'sw5'}
+    assert len(diff.delete) == INTERFACES
+    assert not diff.create and not diff.update
+
+
+def test_fields_partial_devices_didnt_collect_are_kept(fleet):
+    collected = dict(fleet)
+    collected['sw6', 'Ethernet1'] = collected['sw6', 'Ethernet1']._replace(mpls_enabled=None)
+    collected['sw6', 'Ethernet2'] = collected['sw6', 'Ethernet2']._replace(mpls_enabled=None, mtu=1500)
+
+    diff = diff_records(collected, fleet, partial={'sw6'})
+    assert diff.update == [(('sw6', 'Ethernet2'), fleet['sw6', 'Ethernet2']._replace(mtu=1500))]
+    # None is a value for devices that were collected in full
+    assert len(diff_records(collected, fleet).update) == 2
+    # and can't be told apart from a hash, so those records wait for a full collection
+    existing = {key: record_hash(record) for key, record in fleet.items()}
+    assert not diff_records(collected, existing, partial={'sw6'})
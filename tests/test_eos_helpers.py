@@ -0,0 +1,165 @@
+import inspect
+
+import pytest
+from napalm.eos.eos import EOSDriver
+
+from sohonet_nsot_helpers.napalm import eos_helpers
+from sohonet_nsot_helpers.napalm.capabilities import REGISTRY, UNSUPPORTED
+from sohonet_nsot_helpers.diff import diff_records, index_device_records
+from sohonet_nsot_helpers.napalm.deadlines import DeadlineExceeded, getter_deadline, is_partial
+from sohonet_nsot_helpers.normalize import ArpEntry, LldpNeighbor, MacEntry
+from sohonet_nsot_helpers.simulator import generate_eos_device
+
+CONFIG_TREE = {'cmds': {
+    'interface Ethernet1.100': {'cmds': {'encapsulation dot1q vlan 300': None}, 'comments': []},
+    'interface Vlan100': {'cmds': {'ip access-group CUST-IN in': None}, 'comments': []},
+    'ip route 10.200.0.0/24 10.0.100.254 name route0': None,
+}}
+
+
+@pytest.fixture
+def driver(simulator):
+    device = generate_eos_device('eos1', interfaces=4, vlans=2, routes=1)
+    device.responses[('show interfaces', 'json')]['interfaces']['Ethernet1.100'] = {
+        'lineProtocolStatus': 'up', 'interfaceStatus': 'connected', 'description': 'sub', 'mtu': 1500,
+        'bandwidth': 0}
+    device.responses[('show running-config', 'json')] = CONFIG_TREE
+    simulator.add_device(device)
+    driver = EOSDriver(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('eos1'))
+    driver.open()
+    driver.commands = []
+    run_commands = driver.device.run_commands
+
+    def logged(commands, *args, **kwargs):
+        driver.commands.extend(commands)
+        return run_commands(commands, *args, **kwargs)
+
+    driver.device.run_commands = logged
+    return driver
+
+
+def test_interfaces_ip_uses_structured_commands(driver, simulator):
+    simulator.devices['eos1'].responses[('show ip access-lists summary', 'json')] = {'aclList': [
+        {'name': 'CUST-IN', 'configuredIngressIntfs': [{'name': 'Vlan100'}], 'configuredEgressIntfs': []}]}
+    interfaces_ip = eos_helpers.eos_get_interfaces_ip(driver)
+    assert interfaces_ip['Vlan100']['interfaceacl'] == 'CUST-IN'
+    assert interfaces_ip['Vlan100']['ipv4']['10.0.100.1'] == {'prefix_length': '32'}
+    assert 'show ip virtual-router' in driver.commands
+    assert not [command for command in driver.commands if command.startswith('show running-config')]
+
+
+def test_static_routes_come_from_the_config_tree(driver):
+    routes = eos_helpers.eos_get_static_routes(driver)
+    assert routes == [{'prefix': '10.200.0.0/24', 'nexthop': '10.0.100.254', 'name': 'route0', 'vrf': ''}]
+    assert 'show running-config' in driver.commands
+    assert 'show running-config | section ip route' not in driver.commands
+
+
+def test_text_sections_are_used_where_json_is_rejected(simulator):
+    device = generate_eos_device('eos2', interfaces=4, vlans=2, routes=1)
+    del device.responses[('show ip virtual-router', 'json')]
+    simulator.add_device(device)
+    driver = EOSDriver(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('eos2'))
+    driver.open()
+    for _ in range(2):
+        interfaces_ip = eos_helpers.eos_get_interfaces_ip(driver)
+        routes = eos_helpers.eos_get_static_routes(driver)
+    assert '10.0.100.1' in interfaces_ip['Vlan100']['ipv4']
+    assert routes[0]['name'] == 'route0'
+    # What the platform rejected is remembered so it isn't tried again
+    key = driver.capability_key
+    assert REGISTRY.status(key, 'show ip virtual-router') == UNSUPPORTED
+    assert REGISTRY.status(key, 'show running-config | json') == UNSUPPORTED
+
+
+def test_config_tree_is_fetched_once_and_shared(driver):
+    vlans = eos_helpers.eos_get_vlans(driver)
+    assert 'Ethernet1.100' in vlans['300']['interfaces']
+    eos_helpers.eos_get_interfaces_vlans(driver)
+    eos_helpers.eos_get_static_routes(driver)
+    interfaces_ip = eos_helpers.eos_get_interfaces_ip(driver)
+    assert driver.commands.count('show running-config') == 1
+    assert not [command for command in driver.commands if command.startswith('show running-config ')]
+    assert interfaces_ip['Vlan100']['interfaceacl'] == 'CUST-IN'
+
+
+def test_held_config_tree_expires(driver, monkeypatch):
+    monkeypatch.setattr(eos_helpers, 'RUNNING_CONFIG_TTL', 0)
+    eos_helpers.eos_get_vlans(driver)
+    eos_helpers.eos_get_static_routes(driver)
+    assert driver.commands.count('show running-config') == 2
+
+
+def test_mpls_flags_are_left_out_when_short_of_time(driver):
+    with getter_deadline(driver, 10, reserve=10):
+        interfaces = eos_helpers.eos_get_interfaces(driver)
+        records = eos_helpers.eos_get_interface_records(driver)
+    assert interfaces.missing == ['mpls_enabled']
+    assert 'show mpls interface' not in driver.commands
+    assert not [values for values in interfaces.values() if 'mpls_enabled' in values]
+    assert {record.mpls_enabled for record in records.values()} == {None}
+
+
+def test_commands_are_given_what_is_left_of_the_deadline(driver):
+    transport = driver.device.connection.transport
+    timeout = transport.timeout
+    timeouts = []
+    run_commands = driver.device.run_commands
+
+    def timed(commands, *args, **kwargs):
+        timeouts.append(transport.timeout)
+        return run_commands(commands, *args, **kwargs)
+
+    driver.device.run_commands = timed
+    with getter_deadline(driver, 5):
+        eos_helpers.eos_get_network_instances(driver)
+    assert 0 < timeouts[0] <= 5
+    assert transport.timeout == timeout
+
+    with getter_deadline(driver, 0), pytest.raises(DeadlineExceeded):
+        eos_helpers.eos_get_static_routes(driver)
+
+
+def test_projection_only_runs_the_commands_its_fields_need(driver):
+    records = eos_helpers.eos_get_interface_records(driver, fields={'description', 'is_up'})
+    assert driver.commands == ['show interfaces description']
+    assert records.missing == ['children', 'is_enabled', 'mac_address', 'mpls_enabled', 'mtu', 'speed', 'type']
+    assert records['Ethernet1'].description == 'port 1'
+    assert records['Ethernet1'].mtu is None
+
+    driver.commands = []
+    interfaces = eos_helpers.eos_get_interfaces(driver, fields={'mtu'})
+    assert driver.commands == ['show interfaces']
+    assert interfaces['Ethernet1'] == {'mtu': 9214}
+
+
+def test_projected_records_only_update_their_fields(driver, simulator):
+    existing = index_device_records('eos1', eos_helpers.eos_get_interface_records(driver))
+    descriptions = simulator.devices['eos1'].responses[('show interfaces description', 'json')]
+    descriptions['interfaceDescriptions']['Ethernet1']['description'] = 'changed'
+
+    records = eos_helpers.eos_get_interface_records(driver, fields={'description'})
+    partial = {'eos1'} if is_partial(records) else set()
+    diff = diff_records(index_device_records('eos1', records), existing, partial)
+    assert diff.update == [(('eos1', 'Ethernet1'), existing['eos1', 'Ethernet1']._replace(description='changed'))]
+    assert not diff.create and not diff.delete
+
+
+def test_record_getters_stream_large_tables(simulator):
+    hosts = 5000
+    simulator.add_device(generate_eos_device('eos3', interfaces=48, vlans=10, routes=1, mac_entries=hosts))
+    driver = EOSDriver(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('eos3'))
+    driver.open()
+
+    macs = eos_helpers.eos_get_mac_records(driver)
+    arps = eos_helpers.eos_get_arp_records(driver)
+    neighbors = eos_helpers.eos_get_lldp_records(driver)
+    assert all(inspect.isgenerator(records) for records in (macs, arps, neighbors))
+
+    # The simulator spreads host n over ports 3-48 and VLANs 100-109
+    mac = [f"02:00:{n.to_bytes(4, 'big').hex(':')}" for n in range(hosts)]
+    assert sorted(macs) == sorted(MacEntry(mac[n], f"Ethernet{3 + n % 46}", 100 + n % 10, False) for n in range(hosts))
+    assert sorted(arps) == sorted(
+        ArpEntry(f"Vlan{100 + n % 10}", f"10.0.{100 + n % 10}.{10 + n // 10 % 240}", mac[n], 0) for n in range(hosts))
+    assert list(neighbors) == [LldpNeighbor(f"Ethernet{port}", '00:1c:73:00:99:99', f"Ethernet{port}", 'uplink',
+                                            'eos3-peer') for port in (1, 2)]
@@ -0,0 +1,114 @@
+import socket
+
+import pytest
+
+from sohonet_nsot_helpers import snmp
+from sohonet_nsot_helpers.events import (CONFIG, EVENT_GETTERS, VENDOR_GETTERS, DeviceInfo, EventListener,
+                                         RecollectionQueue)
+from sohonet_nsot_helpers.snmp import (IP_ADDRESS, OBJECT_IDENTIFIER, TIMETICKS, TRAP_V1, TRAP_V2, VERSION_1,
+                                       encode_message)
+
+LINK_DOWN = (1, 3, 6, 1, 6, 3, 1, 1, 5, 3)
+ARISTA_CONFIG_MAN = (1, 3, 6, 1, 4, 1, 30065, 3, 12)
+LINEPROTO_DOWN = b"<187>Oct 19 12:00:00 switch1 Ebra: %LINEPROTO-5-UPDOWN: Line protocol on Interface Ethernet1, " \
+                 b"changed state to down"
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def trap_v2c(trap_oid, community='public'):
+    return encode_message(community, TRAP_V2, 1, [
+        (snmp.MIB_OBJECTS['sysUpTime'] + (0, ), (TIMETICKS, 100)),
+        (snmp.MIB_OBJECTS['snmpTrapOID'] + (0, ), (OBJECT_IDENTIFIER, trap_oid)),
+    ])
+
+
+def trap_v1(enterprise, agent_address, generic_trap, specific_trap, community='public'):
+    ''' SNMPv1 Trap-PDU, which encode_message doesn't build '''
+    pdu = snmp._tlv(TRAP_V1, b''.join([
+        snmp._tlv(OBJECT_IDENTIFIER, snmp._encode_oid(enterprise)),
+        snmp.encode_value(IP_ADDRESS, agent_address),
+        snmp._encode_integer(snmp.INTEGER, generic_trap),
+        snmp._encode_integer(snmp.INTEGER, specific_trap),
+        snmp._encode_integer(TIMETICKS, 100),
+        snmp._encode_varbinds([]),
+    ]))
+    return snmp._tlv(snmp.SEQUENCE,
+                     snmp._encode_integer(snmp.INTEGER, VERSION_1) + snmp._tlv(snmp.OCTET_STRING, community.encode()) +
+                     pdu)
+
+
+@pytest.fixture
+def listener():
+    devices = {'127.0.0.1': DeviceInfo('switch1', 'eos'), 'sw2': DeviceInfo('sw2', 'procurve')}
+    listener = EventListener(devices, RecollectionQueue(debounce=0.3, max_delay=5), host='127.0.0.1', syslog_port=0,
+                             trap_port=0)
+    listener.start()
+    yield listener
+    listener.stop()
+
+
+def send(port, data):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.sendto(data, ('127.0.0.1', port))
+
+
+def test_events_sent_to_the_listener_are_merged(listener):
+    send(listener.syslog_port, LINEPROTO_DOWN)
+    send(listener.trap_port, trap_v2c(LINK_DOWN))
+    send(listener.trap_port, trap_v1(ARISTA_CONFIG_MAN, '127.0.0.1', 6, 1))
+    send(listener.syslog_port, b"<14>Oct 19 12:00:01 sw2 ports: port 5 is now off-line")
+
+    due = [listener.queue.get(timeout=5), listener.queue.get(timeout=5)]
+    assert sorted(due) == [
+        ('sw2', ['procurve_get_interfaces']),
+        ('switch1', sorted(VENDOR_GETTERS['eos'][getter] for getter in EVENT_GETTERS[CONFIG])),
+    ]
+    assert len(listener.queue) == 0
+    assert listener.ignored == 0
+
+
+def test_recollections_are_debounced_up_to_max_delay():
+    clock = FakeClock()
+    queue = RecollectionQueue(debounce=10, max_delay=30, clock=clock)
+    queue.add('sw1', ['eos_get_interfaces'])
+    clock.now = 8
+    queue.add('sw1', ['eos_get_vlans'])
+    clock.now = 17
+    assert queue.due() == []
+    assert queue.get(timeout=0) is None
+    clock.now = 18
+    assert queue.get(timeout=0) == ('sw1', ['eos_get_interfaces', 'eos_get_vlans'])
+
+    # A device with events every 5 seconds is still collected max_delay after the first
+    for now in range(0, 30, 5):
+        clock.now = 100 + now
+        queue.add('sw2', ['eos_get_interfaces'])
+        assert queue.due() == []
+    clock.now = 130
+    assert queue.due() == [('sw2', ['eos_get_interfaces'])]
+    assert len(queue) == 0
+
+
+def test_events_that_dont_apply_are_ignored():
+    queue = RecollectionQueue(debounce=0, max_delay=0)
+    listener = EventListener({'10.0.0.1': DeviceInfo('switch1', 'eos')}, queue, community='secret')
+    unknown_source = LINEPROTO_DOWN.replace(b'switch1', b'switch9')
+    assert listener.handle_syslog(unknown_source, ('10.0.0.9', 514)) is None
+    assert listener.handle_syslog(b"<14>Oct 19 12:00:00 switch1 sshd: session opened", ('10.0.0.1', 514)) is None
+    assert listener.handle_syslog(b"not syslog", ('10.0.0.1', 514)) is None
+    assert listener.handle_trap(trap_v2c(LINK_DOWN, community='public'), ('10.0.0.1', 162)) is None
+    assert listener.handle_trap(trap_v2c((1, 3, 6, 1, 4, 1, 9, 9, 9)), ('10.0.0.1', 162)) is None
+    assert listener.handle_trap(b"\x30\x03\x02", ('10.0.0.1', 162)) is None
+    assert listener.ignored == 6
+    assert len(queue) == 0
+
+    assert listener.handle_trap(trap_v2c(LINK_DOWN, community='secret'), ('10.0.0.1', 162)) == (
+        'switch1', ['eos_get_interfaces'])
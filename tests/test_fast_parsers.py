@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from sohonet_nsot_helpers.napalm import eos_helpers, procurve_helpers
+from sohonet_nsot_helpers.napalm.fast_parsers import FAST_PARSERS, fast_parser_verify, set_fast_parser_verify
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'textfsm')
+CASES = [(template, name) for template in sorted(FAST_PARSERS)
+         for name in sorted(os.listdir(os.path.join(FIXTURES, template)))]
+
+
+def read_fixture(template, name):
+    with open(os.path.join(FIXTURES, template, name)) as f:
+        return f.read()
+
+
+@pytest.fixture
+def verifying():
+    previous = set_fast_parser_verify(True)
+    yield
+    set_fast_parser_verify(previous)
+
+
+def test_every_fast_parser_has_fixtures():
+    assert {template for template, _ in CASES} == set(FAST_PARSERS)
+
+
+@pytest.mark.parametrize('extractor', [eos_helpers._textfsm_extractor, procurve_helpers._textfsm_extractor])
+@pytest.mark.parametrize('template, name', CASES)
+def test_fast_parser_matches_textfsm(verifying, extractor, template, name):
+    raw_text = read_fixture(template, name)
+    # With verification on the extractor parses with TextFSM and raises if the fast parser differs
+    textfsm_data = extractor(template, raw_text)
+    assert FAST_PARSERS[template](raw_text) == textfsm_data
+    if name != 'empty.txt' and 'none' not in name:
+        assert textfsm_data
+
+
+def test_verification_can_be_switched_at_runtime(monkeypatch):
+    template = 'procurve_show_trunks'
+    raw_text = read_fixture(template, 'lacp.txt')
+    monkeypatch.setitem(FAST_PARSERS, template, lambda raw_text: [])
+
+    previous = set_fast_parser_verify(False)
+    try:
+        assert procurve_helpers._textfsm_extractor(template, raw_text) == []
+        set_fast_parser_verify(True)
+        assert fast_parser_verify()
+        with pytest.raises(ValueError):
+            procurve_helpers._textfsm_extractor(template, raw_text)
+    finally:
+        set_fast_parser_verify(previous)
@@ -0,0 +1,89 @@
+import pytest
+
+from sohonet_nsot_helpers.interface_names import (InterfaceNameIndex, netiron_config_name, split_interface_name,
+                                                  strip_trunk_suffix)
+
+
+def fresh(name):
+    ''' an equal string that isn't the same object, as names parsed from device output are '''
+    return "".join(list(name))
+
+
+@pytest.mark.parametrize('name, split', [
+    ('Ethernet3', ('Ethernet', '3')),
+    ('Ethernet3.100', ('Ethernet', '3.100')),
+    ('Ethernet50/1', ('Ethernet', '50/1')),
+    ('Port-Channel10', ('Port-Channel', '10')),
+    ('Vlan100', ('Vlan', '100')),
+])
+def test_split_interface_name(name, split):
+    assert split_interface_name(name) == split
+
+
+@pytest.mark.parametrize('normalized, config_name', [
+    ('GigabitEthernet1', 'ethernet 1'),
+    ('GigabitEthernet1/24', 'ethernet 1/24'),
+    ('10GigabitEthernet2/22', 'ethernet 2/22'),
+    ('Ve1732', 've 1732'),
+    ('Loopback1', 'loopback 1'),
+    ('Ethernetmgmt1', 'management 1'),
+    ('Tunnel1', 'Tunnel1'),
+    ('lag', 'lag'),
+])
+def test_netiron_config_name(normalized, config_name):
+    assert netiron_config_name(normalized) == config_name
+
+
+@pytest.mark.parametrize('port, stripped', [('4-Trk1', '4'), ('A12-Trk20', 'A12'), ('4', '4'), ('Trk1', 'Trk1')])
+def test_strip_trunk_suffix(port, stripped):
+    assert strip_trunk_suffix(port) == stripped
+
+
+def test_translations_are_interned():
+    assert split_interface_name(fresh('Ethernet3'))[0] is split_interface_name(fresh('Ethernet4'))[0]
+    assert netiron_config_name(fresh('GigabitEthernet1/1')) is netiron_config_name(fresh('10GigabitEthernet1/1'))
+    assert strip_trunk_suffix(fresh('4-Trk1')) is strip_trunk_suffix(fresh('4-Trk2'))
+
+
+def test_netiron_index_lookups():
+    index = InterfaceNameIndex.from_if_names('netiron', {'GigabitEthernet1/1': 1, 'Ve100': 100},
+                                             if_aliases={1: 'uplink', 100: 'uplink', 999: 'unknown'})
+    index.add('GigabitEthernet1/2')
+
+    for name in ('GigabitEthernet1/1', 'ethernet 1/1', 'uplink'):
+        assert index.normalized(name) == 'GigabitEthernet1/1'
+        assert index.config_name(name) == 'ethernet 1/1'
+        assert index.if_name(name) == 'GigabitEthernet1/1'
+        assert index.if_index(name) == 1
+    assert index.by_if_index(1) == 'GigabitEthernet1/1'
+    assert index.config_name('ve 100') == 've 100'
+    assert index.normalized('ve 100') == 'Ve100'
+
+    # Added without SNMP, so there is no ifName or ifIndex
+    assert index.normalized('ethernet 1/2') == 'GigabitEthernet1/2'
+    assert index.if_name('ethernet 1/2') is None
+    assert index.if_index('GigabitEthernet1/2') is None
+
+    assert 'ethernet 1/1' in index
+    assert 'uplink' not in index
+    assert index.normalized('unknown') is None
+    assert index.config_name('ethernet 9/9') is None
+    assert index.by_if_index(999) is None
+
+
+def test_procurve_index_with_trunk_suffixes():
+    index = InterfaceNameIndex.from_if_names('procurve', {'1': '1', '2': '2', 'Trk1': '289'})
+    # Names as show interfaces lists trunk members are only known once the suffix is stripped
+    assert index.normalized('1-Trk1') is None
+    assert index.normalized(strip_trunk_suffix('1-Trk1')) == '1'
+    assert index.if_index(strip_trunk_suffix('2-Trk1')) == '2'
+    assert index.by_if_index('289') == 'Trk1'
+    assert index.config_name('Trk1') == 'Trk1'
+
+
+def test_index_names_are_interned():
+    index = InterfaceNameIndex.from_if_names('netiron', {fresh('GigabitEthernet1/1'): 1})
+    other = InterfaceNameIndex.from_if_names('netiron', {fresh('GigabitEthernet1/1'): 1})
+    assert index.by_if_index(1) is other.by_if_index(1)
+    assert index.normalized(fresh('ethernet 1/1')) is other.normalized(fresh('ethernet 1/1'))
+    assert index.config_name(fresh('GigabitEthernet1/1')) is other.config_name(fresh('GigabitEthernet1/1'))
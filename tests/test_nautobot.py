@@ -0,0 +1,57 @@
+import multiprocessing
+import time
+
+import pytest
+
+from sohonet_nsot_helpers.nautobot import ComplianceCache
+
+RESULT = {'compliance': True, 'compliance_int': 1, 'ordered': True, 'missing': '', 'extra': ''}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ComplianceCache(str(tmp_path / 'compliance.sqlite'))
+
+
+def test_key_includes_the_compliance_version():
+    settings = {'compliance_include': None}
+    assert ComplianceCache.key(1, settings, 'a', 'b', '2:3.0.0') != ComplianceCache.key(1, settings, 'a', 'b', '2:3.1.0')
+    assert ComplianceCache.key(1, settings, 'a', 'b', '2:3.0.0') == ComplianceCache.key(1, settings, 'a', 'b', '2:3.0.0')
+
+
+def test_expired_results_are_not_used(cache):
+    cache.set('key', RESULT)
+    assert cache.get('key') == RESULT
+    cache.max_age = 0.01
+    time.sleep(0.02)
+    assert cache.get('key') is None
+    cache.prune()
+    assert len(cache) == 0
+
+
+def test_cache_is_pruned_to_max_entries(cache):
+    cache.max_entries = 5
+    cache.prune_every = 4
+    for index in range(10):
+        cache.set(f"key{index}", RESULT)
+    # Pruned after the 4th and 8th results
+    assert len(cache) == 7
+    cache.prune()
+    assert len(cache) == 5
+    assert cache.get('key9') == RESULT
+    assert cache.get('key0') is None
+
+
+def _store(cache, key):
+    cache.set(key, RESULT)
+
+
+def test_forked_workers_open_their_own_connection(cache):
+    cache.set('parent', RESULT)
+    context = multiprocessing.get_context('fork')
+    worker = context.Process(target=_store, args=(cache, 'child'))
+    worker.start()
+    worker.join(30)
+    assert worker.exitcode == 0
+    assert cache.get('child') == RESULT
+    assert cache.get('parent') == RESULT
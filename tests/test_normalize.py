@@ -0,0 +1,59 @@
+from sohonet_nsot_helpers.napalm.deadlines import PartialResult
+from sohonet_nsot_helpers.normalize import normalize_interfaces, normalize_interfaces_ip, normalize_interfaces_vlans
+
+
+def test_interface_macs_are_normalized():
+    interfaces = normalize_interfaces({
+        'Ethernet1': {'mac_address': '00:1C:73:00:00:01'},
+        '1': {'mac_address': '001c73-000002'},
+        'Vlan100': {'mac_address': '001c.7300.0003'},
+    })
+    assert [interface.mac_address for interface in interfaces.values()] == [
+        '00:1c:73:00:00:01', '00:1c:73:00:00:02', '00:1c:73:00:00:03'
+    ]
+
+
+def test_projected_and_missing_fields_are_none():
+    interfaces = normalize_interfaces({'Ethernet1': {'is_up': False, 'description': ''}}, {'is_up', 'description'})
+    interface = interfaces['Ethernet1']
+    assert interface.is_up is False
+    assert interface.description == ''
+    assert interface.is_enabled is None
+    assert interface.mac_address is None
+    assert interface.speed is None
+    assert interface.type is None
+    assert interface.children is None
+    assert interface.to_napalm_dict() == {'is_up': False, 'description': '', 'last_flapped': -1.0}
+
+
+def test_type_and_children_are_empty_where_they_dont_apply():
+    interfaces = normalize_interfaces({
+        'Port-Channel1': {'is_up': True, 'children': ['Ethernet2', 'Ethernet1']},
+        'Ethernet1': {'is_up': True},
+    })
+    assert interfaces['Port-Channel1'].children == ('Ethernet1', 'Ethernet2')
+    assert interfaces['Ethernet1'].children == ()
+    assert interfaces['Ethernet1'].type == ''
+    assert interfaces['Ethernet1'].mpls_enabled is None
+
+
+def test_enrichments_a_partial_result_is_missing_are_none():
+    interfaces = normalize_interfaces(PartialResult({'Port-Channel1': {'is_up': True}}, ['children', 'mpls_enabled']))
+    assert interfaces['Port-Channel1'].children is None
+    assert interfaces['Port-Channel1'].mpls_enabled is None
+    addresses = normalize_interfaces_ip(PartialResult({'Vlan100': {'ipv4': {'10.0.100.1': {'prefix_length': 24}}}},
+                                                      ['interfaceacl', 'virtual_ips']))
+    assert addresses['Vlan100', '10.0.100.1'].interface_acl is None
+    addresses = normalize_interfaces_ip({'Vlan100': {'ipv4': {'10.0.100.1': {'prefix_length': 24}}}})
+    assert addresses['Vlan100', '10.0.100.1'].interface_acl == ''
+
+
+def test_interface_vlans_left_out_are_none():
+    interfaces_vlans = normalize_interfaces_vlans({
+        'Trk1': {'mode': 'trunk', 'access-vlan': -1, 'native-vlan': -1, 'tagged-native-vlan': True},
+        'Ethernet3': {'access-vlan': -1, 'native-vlan': -1, 'tagged-native-vlan': False},
+    })
+    assert interfaces_vlans['Trk1'].trunk_vlans is None
+    assert interfaces_vlans['Ethernet3'].mode is None
+    assert interfaces_vlans['Trk1'].to_napalm_dict() == {'mode': 'trunk', 'access-vlan': -1, 'native-vlan': -1,
+                                                         'tagged-native-vlan': True}
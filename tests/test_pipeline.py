@@ -0,0 +1,123 @@
+import collections
+import threading
+import time
+
+import pytest
+
+from sohonet_nsot_helpers import pipeline
+from sohonet_nsot_helpers.napalm import procurve_helpers
+from sohonet_nsot_helpers.simulator import generate_procurve_device
+
+SWITCHES = ['sw1', 'sw2']
+
+
+@pytest.fixture
+def fleet(simulator, pooled_procurve):
+    sent = collections.Counter()
+    for name in SWITCHES:
+        device = generate_procurve_device(name, ports=12, vlans=3)
+        cli = device.cli
+
+        def logged(command, cli=cli, name=name):
+            sent[name, command] += 1
+            return cli(command)
+
+        device.cli = logged
+        simulator.add_device(device)
+
+    opened = []
+
+    def drivers():
+        drivers = [
+            pooled_procurve(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args(name))
+            for name in SWITCHES
+        ]
+        for driver in drivers:
+            driver.open()
+        opened.extend(drivers)
+        return drivers
+
+    yield drivers, sent
+    for driver in opened:
+        driver.close()
+
+
+@pytest.mark.parametrize('getter', sorted(pipeline.PROCURVE_GETTER_COMMANDS))
+def test_procurve_getters_run_through_the_pipeline(fleet, getter):
+    drivers, sent = fleet
+    expected = []
+    for driver in drivers():
+        expected.append(getattr(procurve_helpers, getter)(driver))
+        # Hand the session back for the pipelined drivers to reuse
+        driver.close()
+    sent.clear()
+
+    pipelined = drivers()
+    results = list(pipeline.procurve_get_many(pipelined, getter, collectors=2, parsers=2))
+
+    assert [driver for driver, _, _ in results] == pipelined
+    assert [result for _, result, _ in results] == expected
+    assert [error for _, _, error in results] == [None, None]
+    for name in SWITCHES:
+        for command in pipeline.PROCURVE_GETTER_COMMANDS[getter]:
+            assert sent[name, command] == 1
+    for driver in pipelined:
+        assert not driver.preparsed
+        assert not driver.prefetched
+
+
+def test_getter_errors_are_yielded_in_order(fleet, monkeypatch):
+    drivers, _ = fleet
+
+    def get_vlans(driver):
+        if driver.hostname == 'broken':
+            raise ValueError(driver.hostname)
+        return {}
+
+    monkeypatch.setattr(procurve_helpers, 'procurve_get_vlans', get_vlans)
+    pipelined = drivers()
+    pipelined[0].hostname = 'broken'
+    (broken, result, error), working = pipeline.procurve_get_many(pipelined, 'procurve_get_vlans')
+    assert (broken, result) == (pipelined[0], None)
+    assert isinstance(error, ValueError)
+    assert working == (pipelined[1], {}, None)
+    assert not pipelined[0].prefetched
+
+
+def collect_number(text):
+    if text == 'unreachable':
+        raise ConnectionError(text)
+    return text
+
+
+def test_collect_and_parse_errors_dont_end_the_stream():
+    assert pipeline.PARSE_CONTEXT.get_start_method() != 'fork'
+    results = list(pipeline.collect_and_parse(['1', 'unreachable', 'x', '4'], collect_number, int, parsers=2))
+    assert [(device, result) for device, result, _ in results] == [('1', 1), ('unreachable', None), ('x', None),
+                                                                    ('4', 4)]
+    assert [type(error) for _, _, error in results] == [type(None), ConnectionError, ValueError, type(None)]
+
+
+def test_devices_waiting_to_finish_count_towards_max_pending():
+    yielded = []
+    yielded_when_collected = {}
+    lock = threading.Lock()
+
+    def collect(device):
+        with lock:
+            yielded_when_collected[device] = len(yielded)
+        return str(device)
+
+    def finish(device, parsed):
+        time.sleep(0.01)
+        return parsed
+
+    for device, result, error in pipeline.collect_and_parse(range(20), collect, int, collectors=4, parsers=2,
+                                                             max_pending=3, finish=finish):
+        assert (result, error) == (device, None)
+        time.sleep(0.01)
+        with lock:
+            yielded.append(device)
+    assert yielded == list(range(20))
+    # A slot is handed back just before a device is yielded, so at most max_pending are ahead of the consumer
+    assert all(count >= device - 3 for device, count in yielded_when_collected.items())
@@ -0,0 +1,53 @@
+import pytest
+
+from sohonet_nsot_helpers.port_ranges import (compress, compress_interfaces, expand_interfaces, first_config_line,
+                                              intervals_to_config)
+
+
+def test_mrv_round_trip():
+    ports = [str(port) for port in list(range(1, 14)) + [15, 16]]
+    assert compress_interfaces(reversed(ports), 'mrv') == '1-13,15-16'
+    assert intervals_to_config(compress(int(port) for port in ports)) == '1-13,15-16'
+    assert expand_interfaces('1-13,15-16', 'mrv') == ports
+
+
+def test_netiron_round_trip():
+    ports = [f"ethernet 1/{port}" for port in range(1, 25)]
+    assert expand_interfaces('ethernet 1/1-1/24', 'netiron') == ports
+    assert compress_interfaces(ports, 'netiron') == 'ethernet 1/1 to 1/24'
+    assert expand_interfaces('ethernet 1/1 to 1/24', 'netiron') == ports
+    assert expand_interfaces('ethernet 1/1 to 1/2 ethernet 2/1', 'netiron') == [
+        'ethernet 1/1', 'ethernet 1/2', 'ethernet 2/1']
+
+
+def test_arista_round_trip():
+    ports = [f"Ethernet{port}" for port in range(1, 49)]
+    assert compress_interfaces(ports + ['Ethernet50/1'], 'arista') == 'Ethernet1-48,Ethernet50/1'
+    assert expand_interfaces('Ethernet1-48', 'arista') == ports
+    assert expand_interfaces('Ethernet1-2,4,Ethernet50/1-2', 'arista') == [
+        'Ethernet1', 'Ethernet2', 'Ethernet4', 'Ethernet50/1', 'Ethernet50/2']
+
+
+@pytest.mark.parametrize('config, vendor, bad', [
+    ('1-13,Trk', 'mrv', "'Trk'"),
+    ('1-13,15-', 'mrv', "'15-'"),
+    ('Ethernet', 'arista', "'Ethernet'"),
+    ('Ethernet1-Ethernet4', 'arista', "'Ethernet1-Ethernet4'"),
+    ('Ethernet1/1-2/4', 'arista', '1/1-2/4'),
+    ('Ethernet8-4', 'arista', '8-4'),
+    ('ethernet', 'netiron', "'ethernet'"),
+    ('ethernet 1/1 to', 'netiron', "'to'"),
+    ('ethernet 1/1 to 2/4', 'netiron', '1/1-2/4'),
+])
+def test_malformed_ranges_are_rejected(config, vendor, bad):
+    with pytest.raises(ValueError, match=f"{bad}.* in {config!r}"):
+        expand_interfaces(config, vendor)
+
+
+def test_first_config_line():
+    config = intervals_to_config(compress(range(1, 100, 2)))
+    assert first_config_line('1-13,15-16') == '1-13,15-16'
+    assert first_config_line(config) == '1,3,5,7,9,11,13,15,17,19,21,23,25,27,29,31,33,35'
+    assert len(first_config_line(config, first_line_len=20)) <= 20
+    with pytest.raises(ValueError, match="'Ethernet1/1-Ethernet1/48-and-more'"):
+        first_config_line('Ethernet1/1-Ethernet1/48-and-more', first_line_len=10)
@@ -0,0 +1,140 @@
+import inspect
+import time
+
+import pytest
+
+from sohonet_nsot_helpers.napalm import procurve_helpers
+from sohonet_nsot_helpers.napalm.deadlines import DeadlineExceeded, getter_deadline
+from sohonet_nsot_helpers.napalm.procurve_helpers import has_prefetched, hold_prefetched
+from sohonet_nsot_helpers.normalize import ArpEntry, LldpNeighbor, MacEntry, normalize_interfaces_vlans, normalize_vlans
+from sohonet_nsot_helpers.simulator import generate_procurve_device
+from sohonet_nsot_helpers.snmp import MIB_OBJECTS, SnmpClient
+
+
+@pytest.fixture
+def driver(simulator, pooled_procurve):
+    simulator.add_device(generate_procurve_device('sw1', ports=8, vlans=2))
+    driver = pooled_procurve(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('sw1'))
+    driver.open()
+    yield driver
+    driver.close()
+
+
+def test_unused_prefetched_outputs_are_dropped(driver):
+    vlans = procurve_helpers.procurve_get_vlans(driver)
+    assert set(vlans) == {'1', '100', '101'}
+    # sysDescr was prefetched with the batch but get_vlans doesn't use it
+    assert not has_prefetched(driver, "getMIB sysDescr.0")
+    assert driver.prefetched == {}
+
+
+def test_outputs_held_from_outside_a_getter_are_used_once(driver):
+    hold_prefetched(driver, {'walkMIB ifAlias': 'ifAlias.1 = held'})
+    ips = procurve_helpers.procurve_get_interfaces_ip(driver)
+    assert ips
+    assert not has_prefetched(driver, 'walkMIB ifAlias')
+
+
+def test_expired_outputs_are_not_used(driver):
+    hold_prefetched(driver, {'walkMIB ifAlias': 'ifAlias.1 = stale'}, ttl=0.01)
+    time.sleep(0.02)
+    assert not has_prefetched(driver, 'walkMIB ifAlias')
+    assert 'stale' not in procurve_helpers._procurve_command(driver, 'walkMIB ifAlias')
+
+
+def test_ips_of_unknown_vlan_names_are_left_out(simulator, pooled_procurve):
+    device = generate_procurve_device('sw2', ports=4, vlans=1)
+    device.responses['show ip'] += ("  Voice and Data...    | Manual     10.9.9.1        255.255.255.0\n"
+                                    "  VLAN100              | Manual     10.0.101.1      255.255.255.0\n")
+    simulator.add_device(device)
+    driver = pooled_procurve(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('sw2'))
+    driver.open()
+    try:
+        ips = procurve_helpers.procurve_get_interfaces_ip(driver)
+    finally:
+        driver.close()
+    assert None not in ips
+    assert set(ips) == {'DEFAULT_VLAN', 'VLAN100'}
+    assert set(ips['VLAN100']['ipv4']) == {'10.0.100.1', '10.0.101.1'}
+
+
+def test_tagged_vlans_are_left_out_when_short_of_time(driver):
+    with getter_deadline(driver, 10, reserve=10):
+        interfaces_vlans = procurve_helpers.procurve_get_interfaces_vlans(driver)
+        vlans = procurve_helpers.procurve_get_vlans(driver)
+    assert interfaces_vlans.missing == vlans.missing == ['tagged_vlans']
+    assert 'trunk-vlans' not in interfaces_vlans['Trk1']
+    assert normalize_interfaces_vlans(interfaces_vlans)['Trk1'].trunk_vlans is None
+    assert set(vlans) == {'1', '100', '101'}
+    assert {record.interfaces for record in normalize_vlans(vlans).values()} == {None}
+
+
+def test_commands_arent_run_once_the_deadline_has_run_out(driver):
+    with getter_deadline(driver, 0), pytest.raises(DeadlineExceeded):
+        procurve_helpers.procurve_get_interfaces_ip(driver)
+
+
+def test_projection_only_runs_the_walks_and_commands_its_fields_need(driver, simulator):
+    sent = []
+    device = simulator.devices['sw1']
+    cli = device.cli
+
+    def logged(command):
+        sent.append(command)
+        return cli(command)
+
+    device.cli = logged
+    records = procurve_helpers.procurve_get_interface_records(driver, fields={'description', 'is_up'})
+    assert {'walkMIB ifAlias', 'walkMIB ifOperStatus'} <= set(sent)
+    skipped = {'walkMIB ifPhysAddress', 'walkMIB ifMtu', 'walkMIB ifAdminStatus', 'show trunks', 'show vlans',
+               'getMIB sysDescr.0'}
+    assert not skipped & set(sent)
+    assert not [command for command in sent if command.startswith('show interfaces')]
+    assert records.missing == ['children', 'is_enabled', 'mac_address', 'mpls_enabled', 'mtu', 'speed', 'type']
+    assert records['3'].is_up is not None
+    assert records['3'].mtu is None
+
+
+@pytest.fixture(params=['cli', 'snmp'])
+def large_tables(request, simulator, pooled_procurve):
+    ''' switch with 2400 hosts in its FDB and ARP tables, walked with walkMIB or over SNMP '''
+    device = generate_procurve_device('sw3', ports=24, vlans=10, mac_entries=2400)
+    endpoints = simulator.add_device(device)
+    driver = pooled_procurve(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('sw3'))
+    driver.open()
+    if request.param == 'snmp':
+        driver.snmp = SnmpClient(simulator.host, 'public', port=endpoints.snmp)
+    yield driver
+    driver.close()
+
+
+def test_record_getters_stream_large_tables(large_tables):
+    hosts = 2400
+    macs = procurve_helpers.procurve_get_mac_records(large_tables)
+    arps = procurve_helpers.procurve_get_arp_records(large_tables)
+    neighbors = procurve_helpers.procurve_get_lldp_records(large_tables)
+    assert all(inspect.isgenerator(records) for records in (macs, arps, neighbors))
+
+    # The simulator spreads host n over ports 3-24 and VLANs 100-109
+    mac = [f"02:00:{n.to_bytes(4, 'big').hex(':')}" for n in range(hosts)]
+    assert sorted(macs) == sorted(MacEntry(mac[n], str(3 + n % 22), 100 + n % 10, False) for n in range(hosts))
+    assert sorted(arps) == sorted(ArpEntry(f"VLAN{100 + n % 10}", f"10.0.{100 + n % 10}.{10 + n // 10}", mac[n], None)
+                                  for n in range(hosts))
+    assert list(neighbors) == [
+        LldpNeighbor(str(port), '00:1c:73:00:99:99', f"Ethernet{port}", 'uplink', 'sw3-peer') for port in (1, 2)]
+
+
+def test_rows_missing_from_a_walked_column_are_none(simulator, pooled_procurve):
+    device = generate_procurve_device('sw4', ports=8, vlans=2, mac_entries=6)
+    for oid in [oid for oid in device.mib if oid[:-7] == MIB_OBJECTS['dot1qTpFdbStatus']][::2]:
+        del device.mib[oid]
+    simulator.add_device(device)
+    driver = pooled_procurve(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('sw4'))
+    driver.open()
+    try:
+        macs = sorted(procurve_helpers.procurve_get_mac_records(driver))
+    finally:
+        driver.close()
+    # Entries without a status aren't known to have been learned
+    assert [(entry.mac, entry.interface, entry.static) for entry in macs] == [
+        (f"02:00:00:00:00:0{n}", str(3 + n), static) for n, static in zip(range(6), [True, False] * 3)]
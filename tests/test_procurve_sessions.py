@@ -0,0 +1,112 @@
+import pytest
+from napalm.base.exceptions import ConnectionClosedException
+from netmiko.exceptions import ReadTimeout
+
+from sohonet_nsot_helpers.napalm import procurve_sessions
+from sohonet_nsot_helpers.napalm.procurve_sessions import SESSION_POOL, procurve_send_commands
+from sohonet_nsot_helpers.simulator import generate_procurve_device
+
+
+def open_driver(simulator, driver_class, hostname):
+    driver = driver_class(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args(hostname))
+    driver.open()
+    return driver
+
+
+@pytest.fixture
+def switch(simulator):
+    simulator.add_device(generate_procurve_device('sw1', ports=8, vlans=2))
+    return 'sw1'
+
+
+@pytest.fixture
+def stalled_switch(simulator):
+    ''' switch whose prompt only comes back well after the read timeout '''
+    device = generate_procurve_device('sw2', ports=8, vlans=2, latency=1.0)
+    simulator.add_device(device)
+    return device
+
+
+def test_send_command_reads_to_cached_prompt(simulator, pooled_procurve, switch):
+    driver = open_driver(simulator, pooled_procurve, switch)
+    assert driver.prompt == 'sw1#'
+    assert 'ifName.1 = 1' in driver._send_command('walkMIB ifName')
+    assert 'Invalid input' in driver._send_command('show bogus')
+    assert 'ifName.1 = 1' in driver._send_command(['show bogus', 'walkMIB ifName'])
+    driver.close()
+
+
+def test_closed_session_is_reused(simulator, pooled_procurve, switch):
+    driver = open_driver(simulator, pooled_procurve, switch)
+    connection = driver.device
+    driver.close()
+    assert driver.device is None
+
+    driver = open_driver(simulator, pooled_procurve, switch)
+    assert driver.device is connection
+    assert 'ifName.8 = 8' in driver._send_command('walkMIB ifName')
+    driver.close()
+
+
+def test_pipelined_batch_matches_single_commands(simulator, pooled_procurve, switch):
+    driver = open_driver(simulator, pooled_procurve, switch)
+    commands = ['walkMIB ifName', 'show vlans', 'show bogus', 'show trunks']
+    batch = procurve_send_commands(driver, commands)
+    assert list(batch) == commands
+    assert batch == {command: driver._send_command(command) for command in commands}
+    driver.close()
+
+
+def test_broken_session_is_dropped(simulator, pooled_procurve, switch):
+    driver = open_driver(simulator, pooled_procurve, switch)
+    driver.device.remote_conn.close()
+
+    with pytest.raises(ConnectionClosedException):
+        driver._send_command('show vlans')
+    assert driver.device is None
+    assert driver.prompt is None
+    driver.close()
+
+    # The next open logs in again rather than getting the broken session back
+    driver = open_driver(simulator, pooled_procurve, switch)
+    assert 'ifName.1 = 1' in driver._send_command('walkMIB ifName')
+    driver.close()
+    assert len(SESSION_POOL._idle) == 1
+
+
+def test_session_that_timed_out_is_not_reused(simulator, pooled_procurve, stalled_switch, monkeypatch):
+    monkeypatch.setattr(procurve_sessions, 'READ_TIMEOUT', 0.2)
+    driver = open_driver(simulator, pooled_procurve, 'sw2')
+    connection = driver.device
+    with pytest.raises(ReadTimeout):
+        driver._send_command('show vlans')
+    assert driver.device is None
+    assert driver.prompt is None
+    driver.close()
+    assert not SESSION_POOL._idle
+
+    # The late show vlans output went with the dropped session
+    stalled_switch.latency = 0
+    driver = open_driver(simulator, pooled_procurve, 'sw2')
+    assert driver.device is not connection
+    assert 'ifName.1 = 1' in driver._send_command('walkMIB ifName')
+    driver.close()
+
+
+def test_batch_that_timed_out_is_not_replayed(simulator, pooled_procurve, stalled_switch):
+    driver = open_driver(simulator, pooled_procurve, 'sw2')
+    sent = []
+    write_channel = driver.device.write_channel
+
+    def logged(data):
+        sent.append(data)
+        return write_channel(data)
+
+    driver.device.write_channel = logged
+    with pytest.raises(ReadTimeout):
+        procurve_send_commands(driver, ['walkMIB ifName', 'show vlans', 'show trunks'], read_timeout=0.3)
+    # Sent once as a batch, not again one command at a time on the same channel
+    assert [data for data in sent if 'show vlans' in data] == sent[:1]
+    assert driver.device is None
+    driver.close()
+    assert not SESSION_POOL._idle
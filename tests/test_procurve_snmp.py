@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from sohonet_nsot_helpers.napalm import procurve_helpers
+from sohonet_nsot_helpers.napalm.procurve_snmp import procurve_prefetch_with_snmp
+from sohonet_nsot_helpers.simulator import generate_procurve_device
+from sohonet_nsot_helpers.snmp import MIB_OBJECTS, OCTET_STRING, SnmpClient, display_value
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'walkmib')
+
+
+def walkmib_fixture(name):
+    with open(os.path.join(FIXTURES, f"{name}.txt")) as f:
+        return f.read().splitlines()
+
+
+def test_printable_octets_are_text_unless_hex():
+    assert display_value(OCTET_STRING, b'ABCDEF') == 'ABCDEF'
+    assert display_value(OCTET_STRING, b'ABCDEF', hex_octets=True) == '41 42 43 44 45 46'
+    assert display_value(OCTET_STRING, b'\x00\x1cs\x00\x00\x03') == '00 1c 73 00 00 03'
+
+
+@pytest.fixture
+def driver(simulator, pooled_procurve):
+    ''' switch whose first ports have the MACs of the ifPhysAddress fixture, several of them printable '''
+    device = generate_procurve_device('sw1', ports=4, vlans=1)
+    for line in walkmib_fixture('procurve_ifPhysAddress'):
+        name, value = line.split(' = ')
+        index = int(name.rpartition('.')[2])
+        device.mib[MIB_OBJECTS['ifPhysAddress'] + (index, )] = (OCTET_STRING, bytes.fromhex(value))
+    endpoints = simulator.add_device(device)
+    driver = pooled_procurve(simulator.host, 'admin', 'admin', optional_args=simulator.optional_args('sw1'))
+    driver.open()
+    driver.snmp = SnmpClient(simulator.host, 'public', port=endpoints.snmp)
+    yield driver
+    driver.close()
+
+
+def test_macs_walked_over_snmp_match_the_cli(driver):
+    fixture = walkmib_fixture('procurve_ifPhysAddress')
+    cli_lines = driver._send_command('walkMIB ifPhysAddress').splitlines()
+    assert cli_lines[:len(fixture)] == fixture
+
+    assert procurve_prefetch_with_snmp(driver, ['procurve_get_interfaces'], window=2) == {}
+    assert driver.prefetched['walkMIB ifPhysAddress'][0].splitlines() == cli_lines
+
+    records = procurve_helpers.procurve_get_interface_records(driver, ['mac_address'])
+    assert [records[port].mac_address for port in ['1', '2', '3', '4']] == [
+        '41:42:43:44:45:46', '30:30:31:63:37:33', '00:1c:73:00:00:03', '7e:20:3a:2d:2e:5f'
+    ]
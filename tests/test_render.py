@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from sohonet_nsot_helpers.render import RenderEngine, RenderJob
+
+TEMPLATES = {
+    'good.j2': "hostname {{ hostname }}\n",
+    'broken.j2': "hostname {{ hostname }\n",
+    'undefined.j2': "hostname {{ missing }}\n",
+}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    template_dir = tmp_path / 'templates'
+    template_dir.mkdir()
+    for name, text in TEMPLATES.items():
+        (template_dir / name).write_text(text)
+    return RenderEngine([str(template_dir)], bytecode_cache_dir=str(tmp_path / 'cache'), processes=2)
+
+
+def test_compile_templates_reports_each_failure(engine):
+    errors = engine.compile_templates()
+    assert list(errors) == ['broken.j2']
+    assert errors['broken.j2'].startswith('TemplateSyntaxError')
+    assert engine.compile_templates(['good.j2']) == {}
+
+
+def test_render_many_fails_only_the_devices_of_a_bad_template(engine, tmp_path):
+    jobs = [
+        RenderJob('sw1', 'good.j2', {'hostname': 'sw1'}),
+        RenderJob('sw2', 'broken.j2', {'hostname': 'sw2'}),
+        RenderJob('sw3', 'undefined.j2', {'hostname': 'sw3'}),
+        RenderJob('sw4', 'missing.j2', {'hostname': 'sw4'}),
+        RenderJob('sw5', 'good.j2', {'hostname': 'sw5'}),
+    ]
+    output_dir = str(tmp_path / 'configs')
+    results = {result.name: result for result in engine.render_many(iter(jobs), output_dir)}
+
+    assert set(results) == {'sw1', 'sw2', 'sw3', 'sw4', 'sw5'}
+    assert results['sw2'].error.startswith('TemplateSyntaxError')
+    assert results['sw3'].error.startswith('UndefinedError')
+    assert results['sw4'].error.startswith('TemplateNotFound')
+    for name in ['sw1', 'sw5']:
+        assert results[name].error is None
+        with open(results[name].path) as f:
+            assert f.read() == f"hostname {name}"
+    assert sorted(os.listdir(output_dir)) == ['sw1.cfg', 'sw5.cfg']
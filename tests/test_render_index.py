@@ -0,0 +1,28 @@
+import pytest
+
+from sohonet_nsot_helpers.render_index import NO_MANAGEMENT_MODE, IndexedList, index_render_data
+
+INTERFACES = [
+    {'name': 'Ethernet1', 'managementmode': {'mode': 'access'}},
+    {'name': 'Ethernet2', 'managementmode': None},
+    {'name': 'Ethernet3', 'managementmode': {'mode': 'trunk'}},
+    {'name': 'Ethernet4', 'managementmode': {'mode': 'access'}},
+]
+
+
+def test_interfaces_are_grouped_by_management_mode():
+    interfaces = index_render_data({'interfaces': INTERFACES})['interfaces']
+    assert interfaces == INTERFACES
+    assert [item['name'] for item in interfaces.lookup('access')] == ['Ethernet1', 'Ethernet4']
+    assert [item['name'] for item in interfaces.lookup('trunk', NO_MANAGEMENT_MODE)] == ['Ethernet2', 'Ethernet3']
+    assert [item['name'] for item in interfaces.exclude('access')] == ['Ethernet2', 'Ethernet3']
+
+
+def test_indexed_list_with_a_key_func():
+    items = IndexedList(INTERFACES, key_func=lambda item: item['name'][-1])
+    assert items.lookup('3') == [INTERFACES[2]]
+
+
+def test_indexed_list_needs_a_key_func():
+    with pytest.raises(TypeError):
+        IndexedList(INTERFACES)
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import Counter
+
+from sohonet_nsot_helpers.scheduler import DeviceJob, FleetScheduler, TimingHistory, simulated_collect
+
+
+class FakeClock:
+    ''' clock the collect function moves on, so durations don't depend on the machine '''
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def history_with(tmp_path, timings):
+    history = TimingHistory(str(tmp_path / 'timings.json'))
+    for (device, getter), seconds in timings.items():
+        history.record(device, getter, seconds)
+    return history
+
+
+def test_longest_devices_are_started_first(tmp_path):
+    history = history_with(tmp_path, {
+        ('sw1', 'get_interfaces'): 1.0,
+        ('sw2', 'get_interfaces'): 5.0,
+        ('sw2', 'get_vlans'): 1.0,
+        ('sw3', 'get_interfaces'): 3.0,
+    })
+    scheduler = FleetScheduler(history, workers=1)
+    jobs = [DeviceJob(name, 'site1', ['get_interfaces', 'get_vlans'], None) for name in ['sw1', 'sw2', 'sw3', 'sw4']]
+
+    # sw4 hasn't been timed, so is expected to take the fleet means, 3s and 1s, sw1 and sw3 haven't run
+    # get_vlans, which is expected to take its 1s mean
+    assert [(seconds, job.name) for seconds, job in scheduler.plan(jobs)] == [
+        (6.0, 'sw2'), (4.0, 'sw3'), (4.0, 'sw4'), (2.0, 'sw1')
+    ]
+    finished = [job.name for job, _, _ in scheduler.run(jobs, simulated_collect({}), save=False)]
+    assert finished == ['sw2', 'sw3', 'sw4', 'sw1']
+
+
+def test_site_concurrency_is_capped():
+    running = Counter()
+    most = Counter()
+    lock = threading.Lock()
+    sleep = simulated_collect({}, default_seconds=0.05)
+
+    def collect(job, getter):
+        with lock:
+            running[job.site] += 1
+            most[job.site] = max(most[job.site], running[job.site])
+        sleep(job, getter)
+        with lock:
+            running[job.site] -= 1
+
+    scheduler = FleetScheduler(TimingHistory('/nonexistent/timings.json'), workers=8, site_concurrency=2)
+    jobs = [DeviceJob(f"sw{n}", f"site{n % 2}", ['get_interfaces'], None) for n in range(12)]
+    results = list(scheduler.run(jobs, collect, save=False))
+    assert len(results) == 12
+    assert most == {'site0': 2, 'site1': 2}
+
+
+def test_site_rate_spaces_out_starts():
+    starts = []
+    lock = threading.Lock()
+
+    def collect(job, getter):
+        with lock:
+            starts.append(time.monotonic())
+
+    scheduler = FleetScheduler(TimingHistory('/nonexistent/timings.json'), workers=4, site_rate=20.0)
+    jobs = [DeviceJob(f"sw{n}", 'site1', ['get_interfaces'], None) for n in range(5)]
+    list(scheduler.run(jobs, collect, save=False))
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert len(gaps) == 4
+    assert min(gaps) >= 0.045
+
+
+def test_queue_is_replanned_from_this_runs_timings(tmp_path):
+    clock = FakeClock()
+    latencies = {('u1', 'get_interfaces'): 0.01, ('u2', 'get_interfaces'): 0.01, ('known', 'get_interfaces'): 0.5}
+
+    def collect(job, getter):
+        clock.now += latencies[job.name, getter]
+
+    def finished(replan_every):
+        history = history_with(tmp_path, {('known', 'get_interfaces'): 0.5, ('other', 'get_interfaces'): 0.5})
+        scheduler = FleetScheduler(history, workers=1, replan_every=replan_every, clock=clock)
+        jobs = [DeviceJob(name, 'site1', ['get_interfaces'], None) for name in ['u1', 'u2', 'known']]
+        return [job.name for job, _, _ in scheduler.run(jobs, collect, save=False)]
+
+    # Everything is expected to take the 0.5s mean until u1 turns out quick, which brings the mean
+    # for u2 down below the 0.5s known has taken
+    assert finished(replan_every=100) == ['u1', 'u2', 'known']
+    assert finished(replan_every=1) == ['u1', 'known', 'u2']
+
+
+def test_history_round_trip(tmp_path):
+    path = str(tmp_path / 'timings.json')
+    history = TimingHistory(path, alpha=0.5)
+    history.record('sw1', 'get_interfaces', 10.0)
+    history.record('sw1', 'get_interfaces', 4.0)
+    assert history.duration('sw1', 'get_interfaces') == 7.0
+
+    # Another process times a different device and saves first, both are kept
+    other = TimingHistory(path)
+    other.record('sw2', 'get_vlans', 2.0)
+    other.save()
+    history.save()
+
+    loaded = TimingHistory(path, default_seconds=3.0)
+    assert loaded.duration('sw1', 'get_interfaces') == 7.0
+    assert loaded.duration('sw2', 'get_vlans') == 2.0
+    assert loaded.duration('sw3', 'get_vlans') is None
+    assert loaded.estimate('sw3', ['get_interfaces', 'get_vlans', 'get_arp_records']) == 7.0 + 2.0 + 3.0
@@ -0,0 +1,36 @@
+import pytest
+
+from sohonet_nsot_helpers.nautobot import _original_lines, _restore_lines
+from sohonet_nsot_helpers.secret_codec import canonicalize_type7_secrets, decode_cisco_type7, encode_cisco_type7
+
+
+@pytest.mark.parametrize('salt', [0, 7, 52])
+def test_type7_round_trip(salt):
+    assert decode_cisco_type7(encode_cisco_type7('s3cret!', salt)) == 's3cret!'
+
+
+def test_type7_secrets_are_canonicalized():
+    config = "username admin secret 7 0822455D0A16\n key-string 7 110A1016141D"
+    assert canonicalize_type7_secrets(config) == "username admin secret 7 01100F175804\n key-string 7 01100F175804"
+
+
+@pytest.mark.parametrize('line', [
+    'key 7 1234',  # a single byte
+    'password 7 0822455D0A1',  # odd length
+    'password 7 5822455D0A16',  # salt past 52
+    'secret 7 0822455D0A16.example',  # part of a longer token
+    'authentication key 7',  # the key ID, with nothing after it on the line
+])
+def test_other_values_are_left_alone(line):
+    assert canonicalize_type7_secrets(line) == line
+    assert canonicalize_type7_secrets(line + "\n 0822455D0A16") == line + "\n 0822455D0A16"
+
+
+def test_compliance_lines_are_reported_as_configured():
+    actual = "interface Ethernet1\n   isis authentication key 7 0822455D0A16\nntp server 10.0.0.1"
+    canonical = canonicalize_type7_secrets(actual)
+    originals = _original_lines(actual, canonical)
+    assert originals == {'isis authentication key 7 01100F175804': 'isis authentication key 7 0822455D0A16'}
+    extra = "interface Ethernet1\n   isis authentication key 7 01100F175804"
+    assert _restore_lines(extra, originals) == "interface Ethernet1\n   isis authentication key 7 0822455D0A16"
+    assert _restore_lines('', originals) == ''
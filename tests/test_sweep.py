@@ -0,0 +1,50 @@
+import os
+
+from sohonet_nsot_helpers.scheduler import DeviceJob
+from sohonet_nsot_helpers.sweep import DONE, FAILED, CheckpointStore, run_local_sweep
+
+WORKER_KWARGS = {'heartbeat_interval': 0.2, 'poll_interval': 0.05, 'batch_size': 5, 'max_attempts': 2}
+
+
+def collect(job, getter):
+    ''' log which process collected the device, the target is the log's path '''
+    with open(job.target, 'a') as log:
+        log.write(f"{os.getpid()} {job.name}\n")
+    if job.name == 'broken':
+        raise ConnectionError(job.name)
+    return {}
+
+
+def test_local_sweep_collects_each_device_once(tmp_path, monkeypatch):
+    monkeypatch.setenv('SOHONET_TIMING_HISTORY', str(tmp_path / 'timings.json'))
+    log = str(tmp_path / 'collected.log')
+    store_path = str(tmp_path / 'sweeps.sqlite')
+    jobs = [DeviceJob(f"sw{number}", 'site1', ['get_facts'], log) for number in range(40)]
+    jobs.append(DeviceJob('broken', 'site1', ['get_facts'], log))
+
+    progress = run_local_sweep('sweep1', jobs, collect, workers=3, store_path=store_path, **WORKER_KWARGS)
+
+    assert progress == {DONE: 40, FAILED: 1}
+    with open(log) as f:
+        collected = [line.split() for line in f.read().splitlines()]
+    devices = [device for _, device in collected]
+    assert sorted(device for device in devices if device != 'broken') == sorted(f"sw{number}" for number in range(40))
+    assert devices.count('broken') == 2
+    assert len({pid for pid, _ in collected}) > 1
+    journal_mode = CheckpointStore(store_path)._connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal_mode == 'delete'
+
+
+def test_interrupted_sweep_picks_up_where_it_left_off(tmp_path, monkeypatch):
+    monkeypatch.setenv('SOHONET_TIMING_HISTORY', str(tmp_path / 'timings.json'))
+    log = str(tmp_path / 'collected.log')
+    store_path = str(tmp_path / 'sweeps.sqlite')
+    jobs = [DeviceJob(f"sw{number}", 'site1', ['get_facts'], log) for number in range(10)]
+    store = CheckpointStore(store_path)
+    for job in jobs[:6]:
+        store.claim('sweep2', job.name, 'earlier', 30, 2)
+        store.finish('sweep2', job.name, 'earlier')
+
+    assert run_local_sweep('sweep2', jobs, collect, workers=2, store_path=store_path, **WORKER_KWARGS) == {DONE: 10}
+    with open(log) as f:
+        assert sorted(line.split()[1] for line in f.read().splitlines()) == ['sw6', 'sw7', 'sw8', 'sw9']